@@ -1,14 +1,24 @@
 import streamlit as st
-import tensorflow as tf
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 from pathlib import Path
-from sklearn.preprocessing import StandardScaler
-from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+import os
 import warnings
+from utils import BatchEncoder, load_and_preprocess, load_preprocessing
+from forecasting import backtest, forecast_partitions, product_forecast
+from datastore import PartitionedStore, PrefixSumIndex
+from ingest import read_inventory_csv
+from analytics_cache import AnalyticsCache
+from reorder import fleet_reorder_suggestions, rollup_reorder_suggestions
+from rollup import LEVELS, RollupCube, open_rollup
+from datasources import open_source
+import charts
+from lstm_runtime import load_inference_model
+from retrain import RetrainJob, latest_model_path
+import instrumentation
+from instrumentation import span, timed
 warnings.filterwarnings('ignore')
 
 # Set page config
@@ -46,149 +56,190 @@ st.markdown("""
 BASE = Path(__file__).parent
 MODEL_PATH = BASE / 'model_lstm_100_100_1.keras'
 DATA_PATH = BASE / 'retail_store_inventory.csv'
+# Optional data source, e.g. 'sqlite:///inventory.db'. When set, every loader reads it
+# instead of DATA_PATH: product views fetch only the selected product's rows, the fleet
+# views, rollup and encoder are built from one full fetch, and retraining (which needs
+# the CSV) is disabled
+DATA_SOURCE = os.environ.get('FORECAST_DATA_SOURCE')
+
+@timed('app.load_and_warm_model')
+def _load_and_warm_model(path):
+    # Backend comes from FORECAST_BACKEND; tensorflow is only imported for 'keras'
+    model = load_inference_model(path)
+    # First call builds the Keras predict function; do it before a user is waiting on it
+    model.predict_on_batch(np.zeros((1, 1, model.input_shape[-1]), dtype=np.float32))
+    return model
 
 @st.cache_resource
+def start_model_warmup(path):
+    """Load and warm the model on a background thread while the data sections render"""
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='model-warmup')
+    return executor.submit(_load_and_warm_model, path)
+
 def load_model(path):
+    """Wait for the background model load started by start_model_warmup"""
     try:
-        return tf.keras.models.load_model(path)
+        return start_model_warmup(path).result()
     except Exception as e:
         st.error(f"Could not load model: {e}")
         return None
 
+@st.cache_resource
+def load_source():
+    """The DATA_SOURCE backend, opened once (None when reading DATA_PATH)"""
+    return open_source(DATA_SOURCE) if DATA_SOURCE else None
+
+@st.cache_resource
+def load_encoder():
+    """Batch encoder built from the cached preprocessing artifact (or fitted on DATA_SOURCE's rows)"""
+    if DATA_SOURCE:
+        _, feature_columns, scaler, _, _, _, _ = load_and_preprocess(load_data(), compact=True)
+    else:
+        feature_columns, scaler, _, _, _ = load_preprocessing(str(DATA_PATH))
+    return BatchEncoder(feature_columns, scaler)
+
 @st.cache_data
+@timed('app.load_data')
 def load_data():
-    """Load and prepare the data"""
-    df = pd.read_csv(DATA_PATH)
-    df['Date'] = pd.to_datetime(df['Date'])
-    return df
+    """Load and prepare the data (typed schema, Date parsed at read time), from DATA_SOURCE if set"""
+    if DATA_SOURCE:
+        return load_source().fetch()
+    return read_inventory_csv(DATA_PATH)
+
+@st.cache_resource
+@timed('app.load_store')
+def load_store():
+    """Inventory data partitioned by Product ID and pre-sorted by Date, or DATA_SOURCE if set"""
+    if DATA_SOURCE:
+        return load_source()
+    return PartitionedStore(load_data())
+
+@st.cache_resource
+@timed('app.load_rolling_index')
+def load_rolling_index():
+    """Per-product prefix sums of Units Sold (None when products come from a DATA_SOURCE)"""
+    store = load_store()
+    return PrefixSumIndex(store) if isinstance(store, PartitionedStore) else None
+
+@st.cache_resource
+@timed('app.load_sku_store')
+def load_sku_store():
+    """Inventory data partitioned by (Product ID, Store ID) for the fleet reorder engine"""
+    return PartitionedStore(load_data(), keys=('Product ID', 'Store ID'))
+
+@st.cache_resource
+@timed('app.load_rollup')
+def load_rollup(version):
+    """Daily rollup cube by product/store/region/category, built once and updated on append
+    (built in memory from DATA_SOURCE's rows when set)"""
+    if DATA_SOURCE:
+        return RollupCube().add(load_data())
+    return open_rollup(DATA_PATH)
+
+@st.cache_resource
+def load_analytics_cache():
+    """Per-product analytics shared across reruns and sessions (LRU, 256 MB budget)"""
+    return AnalyticsCache(max_entries=64, max_bytes=256 * 1024 * 1024)
+
+@st.cache_resource
+def load_retrain_state():
+    """Holds the background retraining job so every rerun and session sees the same one"""
+    return {'job': None}
+
+def data_version():
+    """Identifies the data the cached analytics were computed from"""
+    if DATA_SOURCE:
+        return load_source().version()
+    stat = DATA_PATH.stat()
+    return f"{stat.st_size}-{stat.st_mtime_ns}"
 
-def prepare_forecast_data(df, product_id, days_ahead=30):
-    """Prepare time series data for a specific product"""
-    product_data = df[df['Product ID'] == product_id].sort_values('Date').copy()
+@timed('app.prepare_forecast_data')
+def prepare_forecast_data(store, product_id, days_ahead=30):
+    """Prepare time series data for a specific product
     
-    if len(product_data) == 0:
+    `store` is a PartitionedStore or a datasources.DataSource; a source fetches only
+    this product's rows.
+    """
+    product_data = store.get(product_id)
+    
+    if product_data is None or len(product_data) == 0:
         return None, None, None
     
     # Get the last available date and create future dates
-    last_date = product_data['Date'].max()
+    last_date = product_data['Date'].iloc[-1]
     future_dates = [last_date + timedelta(days=i) for i in range(1, days_ahead + 1)]
     
     return product_data, future_dates, last_date
 
-def train_lstm_forecast(product_data, model, lookback=10):
-    """Generate forecasts using pre-trained LSTM model"""
-    from utils import load_and_preprocess, build_input_row, get_knn_defaults
-    
-    demand = product_data['Demand Forecast'].values
-    
-    if len(demand) < lookback + 1:
-        return None
-    
-    # Use demand forecast as target
-    scaler_demand = StandardScaler()
-    demand_scaled = scaler_demand.fit_transform(demand.reshape(-1, 1)).flatten()
-    
-    # Create simple sequences for visualization
-    X, y = [], []
-    for i in range(len(demand_scaled) - lookback):
-        X.append(demand_scaled[i:i+lookback])
-        y.append(demand_scaled[i+lookback])
-    
-    if len(X) < 10:
-        return None
-    
-    X = np.array(X)
-    y = np.array(y)
-    
-    # Split train/test
-    train_size = int(0.8 * len(X))
-    X_train, X_test = X[:train_size], X[train_size:]
-    y_train, y_test = y[:train_size], y[train_size:]
-    
-    # Generate predictions using model (use mean for now to avoid shape issues)
-    y_pred_train = np.full_like(y_train, demand_scaled.mean())
-    y_pred_test = np.full_like(y_test, demand_scaled.mean())
-    
-    # Add some variation based on trend
-    trend = np.linspace(-0.1, 0.1, len(demand_scaled))
-    for i in range(len(y_pred_train)):
-        y_pred_train[i] = demand_scaled.mean() + trend[i] * demand_scaled.std()
-    for i in range(len(y_pred_test)):
-        y_pred_test[i] = demand_scaled.mean() + trend[train_size + i] * demand_scaled.std()
-    
-    # Inverse transform
-    y_train_actual = scaler_demand.inverse_transform(y_train.reshape(-1, 1)).flatten()
-    y_train_pred = scaler_demand.inverse_transform(y_pred_train.reshape(-1, 1)).flatten()
-    y_test_actual = scaler_demand.inverse_transform(y_test.reshape(-1, 1)).flatten()
-    y_test_pred = scaler_demand.inverse_transform(y_pred_test.reshape(-1, 1)).flatten()
-    
-    # Calculate metrics
-    mae = mean_absolute_error(y_test_actual, y_test_pred)
-    mse = mean_squared_error(y_test_actual, y_test_pred)
-    rmse = np.sqrt(mse)
-    r2 = r2_score(y_test_actual, y_test_pred)
-    
-    return {
-        'y_train': y_train_actual,
-        'y_train_pred': y_train_pred,
-        'y_test': y_test_actual,
-        'y_test_pred': y_test_pred,
-        'mae': mae,
-        'mse': mse,
-        'rmse': rmse,
-        'r2': r2,
-        'scaler_demand': scaler_demand,
-        'scaler_sales': StandardScaler()
-    }
+def train_lstm_forecast(product_data, model, lookback=10, encoder=None):
+    """Backtest the pre-trained LSTM over the product's history (see forecasting.backtest)"""
+    if encoder is None:
+        encoder = load_encoder()
+    return backtest(product_data, model, encoder, lookback)
 
-def calculate_moving_averages(data, window_7=7, window_30=30):
-    """Calculate moving averages"""
+def calculate_moving_averages(data, window_7=7, window_30=30, rolling=None, product_id=None):
+    """Calculate moving averages (O(1) per point from the prefix-sum index when given)"""
+    if rolling is not None:
+        return rolling.rolling_mean(product_id, window_7), rolling.rolling_mean(product_id, window_30)
     ma_7 = data.rolling(window=window_7).mean()
     ma_30 = data.rolling(window=window_30).mean()
     return ma_7, ma_30
 
-def generate_forecasts(product_data, model, days=30, lookback=10):
-    """Generate future forecasts for multiple horizons"""
-    demand = product_data['Demand Forecast'].values
-    
-    if len(demand) < lookback:
+def generate_forecasts(product_data, model, days=30, lookback=10, encoder=None):
+    """Generate daily forecasts of the product's total demand for multiple horizons (per-store
+    LSTM rollouts summed, or each store's seasonal-naive baseline where its rollout fails its
+    check; 'source' says which)"""
+    if encoder is None:
+        encoder = load_encoder()
+    
+    result = product_forecast(product_data, model, encoder, days, lookback)
+    if result is None:
         return None
-    
-    scaler = StandardScaler()
-    demand_scaled = scaler.fit_transform(demand.reshape(-1, 1)).flatten()
-    
-    # Generate trend-based forecasts
-    mean_val = demand_scaled.mean()
-    std_val = demand_scaled.std()
-    
-    # Create forecasts with trend
-    trend = np.linspace(-0.15, 0.15, days)
-    seasonal = np.sin(np.linspace(0, 4*np.pi, days)) * 0.1
-    
-    forecasts_scaled = []
-    for i in range(days):
-        forecast_val = mean_val + trend[i] * std_val + seasonal[i] * std_val
-        forecasts_scaled.append(forecast_val)
-    
-    # Inverse transform all at once
-    forecasts_scaled = np.array(forecasts_scaled).reshape(-1, 1)
-    forecasts = scaler.inverse_transform(forecasts_scaled).flatten()
+    dates, forecasts, source = result
     
     return {
         '7': forecasts[:7],
         '14': forecasts[:14],
-        '30': forecasts[:days]
+        '30': forecasts[:days],
+        'dates': dates,
+        'source': source
     }
 
-def calculate_reorder_suggestions(product_data, forecasts, min_stock=20, lead_time=7):
-    """Calculate reorder recommendations"""
+@timed('app.compute_product_analytics')
+def compute_product_analytics(product_data, model, encoder, lookback=10, forecast_days=30, rolling=None,
+                              product_id=None):
+    """Everything the forecast tabs need for one product; cached by (product, parameters)"""
+    forecast_results = train_lstm_forecast(product_data, model, lookback, encoder)
+    future_forecasts = None
+    if forecast_results:
+        future_forecasts = generate_forecasts(product_data, model, forecast_days, lookback, encoder)
+    
+    if rolling is not None:
+        monthly_sales = rolling.monthly_mean(product_id)
+    else:
+        months = product_data['Date'].dt.to_period('M')
+        monthly_sales = product_data['Units Sold'].groupby(months).mean()
+    x = np.arange(len(product_data))
+    trend = np.poly1d(np.polyfit(x, product_data['Units Sold'].to_numpy(dtype=np.float64), 2))(x)
+    
+    return {
+        'forecast_results': forecast_results,
+        'future_forecasts': future_forecasts,
+        'monthly_sales': monthly_sales,
+        'trend': trend
+    }
+
+@timed('app.calculate_reorder_suggestions')
+def calculate_reorder_suggestions(product_data, forecasts, min_stock=20, lead_time=7, daily_avg=None):
+    """Calculate reorder recommendations (daily_avg: precomputed mean of Units Sold)"""
     current_inventory = product_data['Inventory Level'].iloc[-1]
     current_price = product_data['Price'].iloc[-1]
     
     forecast_14 = forecasts['14'].sum() if isinstance(forecasts, dict) else sum(forecasts[:14])
     
     # Safety stock calculation
-    daily_avg = product_data['Units Sold'].mean()
+    if daily_avg is None:
+        daily_avg = product_data['Units Sold'].mean()
     safety_stock = daily_avg * 2
     
     reorder_point = (daily_avg * lead_time) + safety_stock
@@ -221,25 +272,25 @@ def calculate_reorder_suggestions(product_data, forecasts, min_stock=20, lead_ti
         'daily_avg': daily_avg
     }
 
-def main():
+def render_dashboard():
     # ===== HEADER =====
     st.title("📊 Sales Forecasting Dashboard")
     st.markdown("#### Integrated LSTM-based Demand Forecasting & Intelligent Reorder Engine")
     
-    # Load data and model
-    df = load_data()
-    model = load_model(MODEL_PATH)
-    
-    if model is None:
-        st.error("⚠️ Model not found. Please ensure 'model_lstm_100_100_1.keras' exists.")
-        return
+    # Start loading the model in the background; only the forecasting sections wait for it
+    model_path = latest_model_path(default=MODEL_PATH)
+    start_model_warmup(model_path)
+    store = load_store()
+    rolling = load_rolling_index()
+    encoder = load_encoder()
+    analytics_cache = load_analytics_cache()
     
     # ===== SIDEBAR CONFIGURATION =====
     st.sidebar.title("⚙️ Configuration")
     st.sidebar.markdown("---")
     
     # Product selection
-    product_ids = sorted(df['Product ID'].unique().tolist())
+    product_ids = store.partition_keys()
     selected_product = st.sidebar.selectbox(
         "Select Product ID",
         product_ids,
@@ -249,7 +300,11 @@ def main():
     # Forecast parameters
     st.sidebar.markdown("**Forecast Settings**")
     forecast_days = st.sidebar.slider("Days to Forecast", 7, 90, 30)
-    lookback_window = st.sidebar.slider("LSTM Lookback Window", 5, 30, 10)
+    lookback_window = st.sidebar.slider(
+        "LSTM Lookback Window", 5, 30, 10,
+        help="History rows a product needs before it is scored; the model is fed the input length it was trained on")
+    ma_short = st.sidebar.slider("Short Moving Average (days)", 2, 30, 7)
+    ma_long = st.sidebar.slider("Long Moving Average (days)", 7, 180, 30)
     
     # Reorder parameters
     st.sidebar.markdown("**Reorder Engine Settings**")
@@ -259,10 +314,30 @@ def main():
     # Action buttons
     st.sidebar.markdown("**Actions**")
     col_retrain, col_download = st.sidebar.columns(2)
-    retrain_clicked = col_retrain.button("🔄 Retrain Model", use_container_width=True)
+    retrain_clicked = col_retrain.button("🔄 Retrain Model", use_container_width=True, disabled=bool(DATA_SOURCE),
+                                         help="Retraining reads the CSV; unset FORECAST_DATA_SOURCE to use it"
+                                         if DATA_SOURCE else None)
+    
+    retrain_state = load_retrain_state()
+    if retrain_clicked and not (retrain_state['job'] and retrain_state['job'].running):
+        retrain_state['job'] = RetrainJob(data_path=DATA_PATH).start()
+    retrain_job = retrain_state['job']
+    if retrain_job is not None:
+        if retrain_job.running:
+            st.sidebar.info(f"Retraining in the background: epoch {retrain_job.epoch}/{retrain_job.epochs} done")
+        elif retrain_job.state == 'done':
+            st.sidebar.success(f"Retrained model {retrain_job.result.name} is now in use")
+        elif retrain_job.state == 'failed':
+            st.sidebar.error(f"Retraining failed: {retrain_job.error}")
+    
+    cache_stats = analytics_cache.stats()
+    st.sidebar.caption(
+        f"Analytics cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses, "
+        f"{cache_stats['entries']} entries ({cache_stats['bytes'] / 1e6:.1f} MB)"
+    )
     
     # ===== MAIN CONTENT =====
-    product_data, future_dates, last_date = prepare_forecast_data(df, selected_product, forecast_days)
+    product_data, future_dates, last_date = prepare_forecast_data(store, selected_product, forecast_days)
     
     if product_data is None or len(product_data) == 0:
         st.error(f"No data found for Product ID: {selected_product}")
@@ -293,23 +368,34 @@ def main():
         st.metric(label="Current Price", value=f"${current_price:.2f}")
     
     with metrics_col5:
-        avg_daily_sales = product_data['Units Sold'].mean()
+        avg_daily_sales = rolling.mean(selected_product) if rolling is not None else product_data['Units Sold'].mean()
         st.metric(label="Avg Daily Sales", value=f"{avg_daily_sales:.2f} units")
     
     st.markdown("---")
     
     # ===== FORECASTS & VISUALIZATIONS =====
+    model = load_model(model_path)
+    
+    if model is None:
+        st.error("⚠️ Model not found. Please ensure 'model_lstm_100_100_1.keras' exists.")
+        return
+    
     col_forecast, col_reorder = st.columns([2, 1])
     
     with col_forecast:
         st.markdown("### 🔮 Demand Forecasting")
         
-        # Train LSTM and get results
-        forecast_results = train_lstm_forecast(product_data, model, lookback_window)
+        # Backtest + forecasts + tab analytics, reused across reruns with the same parameters
+        analytics_key = (selected_product, lookback_window, forecast_days, data_version(), str(model_path))
+        analytics = analytics_cache.get_or_compute(
+            analytics_key,
+            lambda: compute_product_analytics(product_data, model, encoder, lookback_window, forecast_days,
+                                              rolling, selected_product)
+        )
+        forecast_results = analytics['forecast_results']
+        future_forecasts = analytics['future_forecasts']
         
         if forecast_results:
-            # Generate future forecasts
-            future_forecasts = generate_forecasts(product_data, model, forecast_days, lookback_window)
             
             # Create tabs for different visualizations
             tab1, tab2, tab3, tab4, tab5 = st.tabs([
@@ -321,86 +407,48 @@ def main():
             ])
 
             # TAB 1: Historical Sales & Forecast
-            with tab1:
-                fig, ax = plt.subplots(figsize=(12, 5))
-                
-                # Historical data
-                ax.plot(product_data['Date'], product_data['Units Sold'], 
-                       label='Historical Sales', marker='o', linewidth=2, markersize=4)
-                ax.plot(product_data['Date'], product_data['Demand Forecast'], 
-                       label='Historical Forecast', linestyle='--', linewidth=2, alpha=0.7)
-                
-                # Future forecast
-                if future_forecasts:
-                    future_dates_list = [last_date + timedelta(days=i) for i in range(1, len(future_forecasts['30'])+1)]
-                    ax.plot(future_dates_list, future_forecasts['30'], 
-                           label='30-Day Forecast', marker='s', linewidth=2.5, color='red', markersize=5)
-                
-                ax.set_xlabel('Date', fontsize=11, fontweight='bold')
-                ax.set_ylabel('Units', fontsize=11, fontweight='bold')
-                ax.set_title(f'{selected_product} - Historical Sales vs LSTM Forecast', fontsize=13, fontweight='bold')
-                ax.legend(loc='best', fontsize=10)
-                ax.grid(True, alpha=0.3)
-                plt.xticks(rotation=45)
-                plt.tight_layout()
-                st.pyplot(fig)
+            with tab1, span('app.render.historical'):
+                def render_historical():
+                    future_dates_list, future_values = None, None
+                    if future_forecasts:
+                        future_values = future_forecasts['30']
+                        future_dates_list = list(future_forecasts['dates'][:len(future_values)])
+                    return charts.historical_chart(
+                        selected_product, product_data['Date'].to_numpy(), product_data['Units Sold'].to_numpy(),
+                        product_data['Demand Forecast'].to_numpy(), future_dates_list, future_values
+                    )
+                st.image(analytics_cache.get_or_compute(('chart_historical',) + analytics_key, render_historical),
+                         use_container_width=True)
+                if future_forecasts and future_forecasts.get('source') != 'model':
+                    st.caption("The forecast is the product's daily total over its stores. Where a store's LSTM "
+                               "rollout left the range of its recent inputs, that store's 7-day seasonal-naive "
+                               "baseline is used instead.")
             
             # TAB 2: Moving Averages
-            with tab2:
-                fig, ax = plt.subplots(figsize=(12, 5))
-                
-                ma_7, ma_30 = calculate_moving_averages(product_data['Units Sold'])
-                
-                ax.plot(product_data['Date'], product_data['Units Sold'], 
-                       label='Daily Sales', alpha=0.5, marker='o', markersize=3)
-                ax.plot(product_data['Date'], ma_7, 
-                       label='7-Day MA', linewidth=2.5)
-                ax.plot(product_data['Date'], ma_30, 
-                       label='30-Day MA', linewidth=2.5)
-                
-                ax.fill_between(product_data['Date'], ma_7, ma_30, alpha=0.2)
-                ax.set_xlabel('Date', fontsize=11, fontweight='bold')
-                ax.set_ylabel('Units Sold', fontsize=11, fontweight='bold')
-                ax.set_title(f'{selected_product} - Moving Averages Analysis', fontsize=13, fontweight='bold')
-                ax.legend(loc='best', fontsize=10)
-                ax.grid(True, alpha=0.3)
-                plt.xticks(rotation=45)
-                plt.tight_layout()
-                st.pyplot(fig)
+            with tab2, span('app.render.moving_averages'):
+                def render_moving_averages():
+                    ma_7, ma_30 = calculate_moving_averages(product_data['Units Sold'], ma_short, ma_long,
+                                                            rolling, selected_product)
+                    return charts.moving_average_chart(
+                        selected_product, product_data['Date'].to_numpy(), product_data['Units Sold'].to_numpy(),
+                        ma_7, ma_30, windows=(ma_short, ma_long)
+                    )
+                st.image(analytics_cache.get_or_compute(
+                    ('chart_moving_averages', ma_short, ma_long) + analytics_key, render_moving_averages
+                ), use_container_width=True)
             
             # TAB 3: Seasonality & Trend
-            with tab3:
-                fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(12, 8))
-                
-                # Seasonality by month
-                product_data['Month'] = product_data['Date'].dt.to_period('M')
-                monthly_sales = product_data.groupby('Month')['Units Sold'].mean()
-                
-                ax1.bar(range(len(monthly_sales)), monthly_sales.values, color='steelblue', alpha=0.7, edgecolor='black')
-                ax1.set_xlabel('Month', fontsize=11, fontweight='bold')
-                ax1.set_ylabel('Avg Units Sold', fontsize=11, fontweight='bold')
-                ax1.set_title('Seasonality Pattern (Monthly Average)', fontsize=12, fontweight='bold')
-                ax1.set_xticks(range(len(monthly_sales)))
-                ax1.set_xticklabels([str(m) for m in monthly_sales.index], rotation=45)
-                ax1.grid(alpha=0.3, axis='y')
-                
-                # Trend
-                ax2.plot(product_data['Date'], product_data['Units Sold'], alpha=0.5, label='Daily Sales')
-                z = np.polyfit(range(len(product_data)), product_data['Units Sold'].values, 2)
-                p = np.poly1d(z)
-                ax2.plot(product_data['Date'], p(range(len(product_data))), 'r-', linewidth=2.5, label='Trend')
-                ax2.set_xlabel('Date', fontsize=11, fontweight='bold')
-                ax2.set_ylabel('Units Sold', fontsize=11, fontweight='bold')
-                ax2.set_title('Sales Trend', fontsize=12, fontweight='bold')
-                ax2.legend()
-                ax2.grid(alpha=0.3)
-                plt.xticks(rotation=45)
-                
-                plt.tight_layout()
-                st.pyplot(fig)
+            with tab3, span('app.render.seasonality'):
+                st.image(analytics_cache.get_or_compute(
+                    ('chart_seasonality',) + analytics_key,
+                    lambda: charts.seasonality_chart(
+                        analytics['monthly_sales'], product_data['Date'].to_numpy(),
+                        product_data['Units Sold'].to_numpy(), analytics['trend']
+                    )
+                ), use_container_width=True)
             
             # TAB 4: Performance Metrics
-            with tab4:
+            with tab4, span('app.render.metrics'):
                 metrics_cols = st.columns(4)
                 
                 with metrics_cols[0]:
@@ -418,31 +466,19 @@ def main():
                 st.markdown("**Train vs Validation Loss Curves**")
                 
                 # Simulate train/val loss
-                fig, ax = plt.subplots(figsize=(10, 4))
-                
-                epochs = np.arange(1, 11)
-                train_loss = forecast_results['mse'] * (1 - np.linspace(0, 0.3, 10))
-                val_loss = forecast_results['mse'] * (1 - np.linspace(0, 0.25, 10))
-                
-                ax.plot(epochs, train_loss, marker='o', label='Training Loss', linewidth=2.5)
-                ax.plot(epochs, val_loss, marker='s', label='Validation Loss', linewidth=2.5)
-                ax.set_xlabel('Epoch', fontsize=11, fontweight='bold')
-                ax.set_ylabel('Loss (MSE)', fontsize=11, fontweight='bold')
-                ax.set_title('Model Training Progress', fontsize=12, fontweight='bold')
-                ax.legend(fontsize=10)
-                ax.grid(alpha=0.3)
-                
-                plt.tight_layout()
-                st.pyplot(fig)
+                st.image(analytics_cache.get_or_compute(
+                    ('chart_loss',) + analytics_key,
+                    lambda: charts.loss_chart(forecast_results['mse'])
+                ), use_container_width=True)
             
             # TAB 5: Data Export
-            with tab5:
+            with tab5, span('app.render.export'):
                 st.markdown("**Export Forecast Data as CSV**")
                 
                 if future_forecasts:
                     # Get actual forecast lengths and create matching dates
                     actual_days = len(future_forecasts['30'])
-                    future_dates_list = [last_date + timedelta(days=i) for i in range(1, actual_days + 1)]
+                    future_dates_list = list(future_forecasts['dates'][:actual_days])
                     
                     export_data = pd.DataFrame({
                         'Date': future_dates_list,
@@ -475,7 +511,8 @@ def main():
                 product_data, 
                 future_forecasts, 
                 min_stock=min_stock, 
-                lead_time=lead_time
+                lead_time=lead_time,
+                daily_avg=rolling.mean(selected_product) if rolling is not None else None
             )
             
             # Urgency indicator
@@ -514,6 +551,45 @@ def main():
                 - Lead Time: {lead_time} days
                 """)
     
+    # ===== FLEET REORDER LIST =====
+    st.markdown("---")
+    st.markdown("### 📦 Fleet Reorder List")
+    if st.checkbox("Compute reorder suggestions for every product and store", key="fleet_reorder"):
+        sku_store = load_sku_store()
+        forecast_14 = analytics_cache.get_or_compute(
+            ('fleet_forecast_14', lookback_window, data_version(), str(model_path)),
+            lambda: forecast_partitions(sku_store, model, encoder, 14, lookback_window).sum(axis=1, min_count=1)
+        )
+        with span('reorder.fleet_reorder_suggestions'):
+            fleet = fleet_reorder_suggestions(sku_store, forecast_14, min_stock=min_stock, lead_time=lead_time)
+        
+        st.dataframe(fleet.drop(columns=['color', 'tier']), use_container_width=True, height=400)
+        st.download_button(
+            label="📥 Download Fleet Reorder List",
+            data=fleet.to_csv(index=False),
+            file_name=f"fleet_reorder_{datetime.now().strftime('%Y%m%d')}.csv",
+            mime="text/csv"
+        )
+    
+    # ===== AGGREGATE VIEWS =====
+    st.markdown("---")
+    st.markdown("### 🏬 Store, Region & Category View")
+    if st.checkbox("Show daily rollups above product level", key="rollup_view"):
+        with span('app.render.rollup'):
+            cube = load_rollup(data_version())
+            level_col, member_col = st.columns(2)
+            level = level_col.selectbox("Level", [name for name in LEVELS if name != 'product'], key="rollup_level")
+            members = cube.members(level)
+            member = member_col.selectbox(
+                ' / '.join(LEVELS[level]), members, key="rollup_member",
+                format_func=lambda m: ' / '.join(m) if isinstance(m, tuple) else m) if members else None
+            daily = cube.daily(level, member)
+            st.line_chart(daily[['Units Sold', 'Demand Forecast']])
+            if LEVELS[level]:
+                st.markdown(f"**Reorder overview by {level}**")
+                level_reorder = rollup_reorder_suggestions(cube, level, min_stock=min_stock, lead_time=lead_time)
+                st.dataframe(level_reorder.drop(columns=['color', 'tier']), use_container_width=True, height=250)
+    
     # ===== FOOTER =====
     st.markdown("---")
     st.markdown(f"""
@@ -524,5 +600,31 @@ def main():
     </div>
     """, unsafe_allow_html=True)
 
+def render_performance_panel(rerun, analytics_cache):
+    """Sidebar breakdown of where the last rerun spent its time"""
+    stats = analytics_cache.stats()
+    for key in ('hits', 'misses', 'evictions', 'entries', 'bytes'):
+        instrumentation.set_gauge(f"analytics_cache_{key}", stats[key])
+    
+    with st.sidebar.expander("⏱️ Performance"):
+        st.caption(f"Last rerun: {rerun.seconds * 1000:.0f} ms")
+        breakdown = pd.DataFrame(rerun.breakdown(), columns=['Span', 'Calls', 'Total (ms)', 'Self (ms)', 'Share'])
+        breakdown['Share'] = (breakdown['Share'] * 100).round(1).astype(str) + '%'
+        st.dataframe(breakdown.round({'Total (ms)': 1, 'Self (ms)': 1}), hide_index=True, use_container_width=True)
+        histogram = instrumentation.REGISTRY.snapshot()['histograms'].get('predict_batch_rows')
+        if histogram:
+            _, _, calls, rows = histogram
+            st.caption(f"Predict calls: {calls} (mean batch {rows / calls:.1f} rows) since startup")
+    
+    metrics_file = os.environ.get('FORECAST_METRICS_FILE')
+    if metrics_file:
+        instrumentation.write_prometheus(metrics_file)
+
+def main():
+    instrumentation.configure_logging()
+    with instrumentation.profile('rerun'), instrumentation.trace('app.rerun') as rerun:
+        render_dashboard()
+    render_performance_panel(rerun, load_analytics_cache())
+
 if __name__ == "__main__":
     main()
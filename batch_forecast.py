@@ -0,0 +1,219 @@
+"""Headless nightly batch job: forecasts and reorder suggestions for every product x store.
+
+Products are split into shards and scored by a pool of worker processes. Each worker
+loads the model and the preprocessing artifact once. Every finished shard is written as
+its own part file and recorded in a progress manifest, so an interrupted run picks up
+where it stopped. The manifest is tied to the run configuration and the content hash of
+the data, and is marked finished at the end, so a changed CSV or a completed run always
+starts over.
+
+Example:
+    python batch_forecast.py --output-dir nightly --workers 8 --horizon 30
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from datastore import PartitionedStore
+from ingest import read_inventory_csv
+from lstm_runtime import DEFAULT_BACKEND, load_inference_model
+from reorder import fleet_reorder_suggestions
+from utils import BatchEncoder, DEFAULT_BATCH_SIZE, load_preprocessing, load_preprocessing_artifact
+
+BASE = Path(__file__).parent
+MODEL_PATH = BASE / 'model_lstm_100_100_1.keras'
+DATA_PATH = BASE / 'retail_store_inventory.csv'
+PROGRESS_FILE = 'progress.json'
+
+# Per-process state set up once by _init_worker
+_worker = {}
+
+
+def _init_worker(model_path, data_path, threads_per_worker, backend):
+    if backend == 'keras' and threads_per_worker:
+        import tensorflow as tf
+        tf.config.threading.set_intra_op_parallelism_threads(threads_per_worker)
+        tf.config.threading.set_inter_op_parallelism_threads(1)
+    feature_columns, scaler, _, _, _ = load_preprocessing(str(data_path))
+    _worker['encoder'] = BatchEncoder(feature_columns, scaler)
+    _worker['model'] = load_inference_model(model_path, backend)
+
+
+def _write_frame(df, path, fmt):
+    tmp_path = path.with_name(path.name + '.tmp')
+    if fmt == 'parquet':
+        df.to_parquet(tmp_path, index=False)
+    else:
+        df.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def score_shard(shard_id, shard_frame, output_dir, fmt, horizon, lookback, lead_time, min_stock, batch_size):
+    """Forecast and reorder every product x store in one shard; returns (shard_id, n_skus)."""
+    from forecasting import forecast_partitions
+
+    sku_store = PartitionedStore(shard_frame, keys=('Product ID', 'Store ID'))
+    forecasts = forecast_partitions(sku_store, _worker['model'], _worker['encoder'], horizon, lookback, batch_size)
+
+    _, stops = sku_store.boundaries()
+    last_dates = sku_store.frame['Date'].to_numpy()[stops - 1]
+    days = np.tile(np.arange(1, horizon + 1), len(forecasts))
+    long = pd.DataFrame({
+        'Product ID': np.repeat(forecasts.index.get_level_values('Product ID'), horizon),
+        'Store ID': np.repeat(forecasts.index.get_level_values('Store ID'), horizon),
+        'Forecast_Day': days,
+        'Date': np.repeat(last_dates, horizon) + pd.to_timedelta(days, unit='D').to_numpy(),
+        'Forecast_Value': forecasts.to_numpy().ravel(),
+    })
+
+    forecast_14 = forecasts.loc[:, :min(14, horizon)].sum(axis=1, min_count=1)
+    reorder = fleet_reorder_suggestions(sku_store, forecast_14, min_stock=min_stock, lead_time=lead_time)
+
+    name = f"part-{shard_id:05d}.{fmt}"
+    _write_frame(long, output_dir / 'forecasts' / name, fmt)
+    _write_frame(reorder, output_dir / 'reorder' / name, fmt)
+    return shard_id, len(sku_store)
+
+
+def _data_fingerprint(data_path):
+    """Content hash of the CSV, as recorded by its (current) preprocessing artifact."""
+    return load_preprocessing_artifact(str(data_path))['source'].get('sha256')
+
+
+def _load_progress(output_dir, run_config):
+    path = output_dir / PROGRESS_FILE
+    if path.exists():
+        with open(path) as f:
+            progress = json.load(f)
+        if progress.get('finished'):
+            print('The last run finished; starting a new one')
+        elif progress.get('config') == run_config:
+            return progress
+        else:
+            print('Run configuration or data changed since the last run; starting over')
+    return {'config': run_config, 'completed': [], 'finished': False}
+
+
+def _save_progress(output_dir, progress):
+    path = output_dir / PROGRESS_FILE
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(progress, f)
+    os.replace(tmp_path, path)
+
+
+def _read_parts(directory, fmt):
+    parts = sorted(directory.glob(f"part-*.{fmt}"))
+    if not parts:
+        return pd.DataFrame()
+    read = pd.read_parquet if fmt == 'parquet' else pd.read_csv
+    return pd.concat([read(p) for p in parts], ignore_index=True)
+
+
+def run(data_path=DATA_PATH, model_path=MODEL_PATH, output_dir='batch_output', workers=None,
+        shard_size=50, horizon=30, lookback=10, lead_time=7, min_stock=20, fmt=None,
+        batch_size=DEFAULT_BATCH_SIZE, backend=None):
+    """Score the whole catalogue and write forecasts/ and reorder/ part files plus a ranked
+    reorder list to `output_dir`. Shards already recorded in the progress file are skipped."""
+    backend = backend or os.environ.get('FORECAST_BACKEND', DEFAULT_BACKEND)
+    if fmt is None:
+        try:
+            import pyarrow  # noqa: F401
+            fmt = 'parquet'
+        except ImportError:
+            fmt = 'csv'
+    output_dir = Path(output_dir)
+    for sub in ('forecasts', 'reorder'):
+        (output_dir / sub).mkdir(parents=True, exist_ok=True)
+
+    # Compile/refresh the artifact (and the NumPy export) once here so workers only read them
+    load_preprocessing(str(data_path))
+    if backend == 'numpy':
+        load_inference_model(model_path, backend)
+
+    store = PartitionedStore(read_inventory_csv(data_path))
+    products = store.partition_keys()
+    shards = [products[i:i + shard_size] for i in range(0, len(products), shard_size)]
+
+    # Everything that changes the output; a resume with any other value starts over
+    run_config = {
+        'data': str(data_path), 'data_sha256': _data_fingerprint(data_path),
+        'model': str(model_path), 'backend': backend, 'batch_size': batch_size,
+        'shard_size': shard_size, 'horizon': horizon, 'lookback': lookback,
+        'lead_time': lead_time, 'min_stock': min_stock, 'format': fmt,
+    }
+    progress = _load_progress(output_dir, run_config)
+    if not progress['completed']:
+        # Fresh run: drop part files a previous run with another configuration left behind
+        for sub in ('forecasts', 'reorder'):
+            for part in (output_dir / sub).glob('part-*'):
+                part.unlink()
+    done = set(progress['completed'])
+    pending = [i for i in range(len(shards)) if i not in done]
+    workers = max(1, min(workers or os.cpu_count() or 1, len(pending)))
+    print(f"{len(products)} products in {len(shards)} shards; {len(pending)} to run on {workers} workers")
+
+    started = time.perf_counter()
+    threads_per_worker = max(1, (os.cpu_count() or 1) // workers)
+    ctx = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_worker,
+                             initargs=(model_path, data_path, threads_per_worker, backend)) as pool:
+        futures = []
+        for shard_id in pending:
+            first, last = shards[shard_id][0], shards[shard_id][-1]
+            start, stop = store.offsets[first][0], store.offsets[last][1]
+            futures.append(pool.submit(
+                score_shard, shard_id, store.frame.iloc[start:stop], output_dir, fmt,
+                horizon, lookback, lead_time, min_stock, batch_size))
+        for future in as_completed(futures):
+            shard_id, n_skus = future.result()
+            progress['completed'].append(shard_id)
+            _save_progress(output_dir, progress)
+            print(f"shard {shard_id}: {n_skus} SKUs ({len(progress['completed'])}/{len(shards)})")
+
+    reorder = _read_parts(output_dir / 'reorder', fmt)
+    if not reorder.empty:
+        reorder = reorder.sort_values(['tier', 'coverage', 'estimated_cost'], ascending=[True, True, False],
+                                      kind='stable')
+        reorder['rank'] = np.arange(1, len(reorder) + 1)
+        _write_frame(reorder, output_dir / f"reorder.{fmt}", fmt)
+    progress['finished'] = True
+    _save_progress(output_dir, progress)
+    print(f"Finished in {time.perf_counter() - started:.1f}s -> {output_dir}")
+    return output_dir
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--data', default=str(DATA_PATH), help='inventory CSV')
+    parser.add_argument('--model', default=str(MODEL_PATH), help='Keras model file')
+    parser.add_argument('--output-dir', default='batch_output')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: all cores)')
+    parser.add_argument('--shard-size', type=int, default=50, help='products per shard')
+    parser.add_argument('--horizon', type=int, default=30, help='days to forecast')
+    parser.add_argument('--lookback', type=int, default=10)
+    parser.add_argument('--lead-time', type=int, default=7)
+    parser.add_argument('--min-stock', type=int, default=20)
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='rows per model call')
+    parser.add_argument('--backend', choices=['numpy', 'keras'], default=None,
+                        help='inference runtime (default: FORECAST_BACKEND or numpy)')
+    parser.add_argument('--format', choices=['parquet', 'csv'], default=None,
+                        help='output format (default: parquet if pyarrow is installed, else csv)')
+    parser.add_argument('--restart', action='store_true', help='ignore saved progress and rerun every shard')
+    args = parser.parse_args()
+
+    if args.restart:
+        (Path(args.output_dir) / PROGRESS_FILE).unlink(missing_ok=True)
+    run(args.data, args.model, args.output_dir, args.workers, args.shard_size, args.horizon,
+        args.lookback, args.lead_time, args.min_stock, args.format, args.batch_size, args.backend)
+
+
+if __name__ == '__main__':
+    main()
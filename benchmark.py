@@ -0,0 +1,280 @@
+"""Benchmark suite for preprocessing, KNN defaults, inference and the dashboard helpers.
+
+Synthetic inventory data is generated at a chosen scale (and kept in --data-dir for
+later runs); the model benchmarks use a synthetic file with the 20 product x 5 store
+layout the model expects. Each benchmark reports p50/p99 latency per call, throughput
+in items per second and peak traced memory of one extra call. Results can be saved and compared
+against a stored baseline; a p50 slower than the baseline by more than --tolerance
+is flagged and makes the run exit with status 1.
+
+Example:
+    python benchmark.py --scale small
+    python benchmark.py --scale medium --save bench_baseline.json
+    python benchmark.py --scale medium --baseline bench_baseline.json --tolerance 0.2
+    python benchmark.py --scale small --only predict knn
+"""
+import argparse
+import json
+import time
+import tracemalloc
+import warnings
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+BASE = Path(__file__).parent
+MODEL_PATH = BASE / 'model_lstm_100_100_1.keras'
+
+# name -> (rows, products); stores fixed at 10, days follow from rows / (products * stores)
+SCALES = {
+    'tiny': (10_000, 100),
+    'small': (100_000, 500),
+    'medium': (1_000_000, 1_000),
+    'large': (10_000_000, 10_000),
+}
+N_STORES = 10
+PREDICT_BATCH_SIZES = (1, 32, 1024)
+# The shipped model was trained on 20 products x 5 stores (43 features); the model
+# benchmarks run on synthetic data with that layout whatever the --scale
+MODEL_LAYOUT = {'n_rows': 20 * 5 * 365, 'n_products': 20, 'n_stores': 5}
+
+CATEGORIES = ['Clothing', 'Electronics', 'Furniture', 'Groceries', 'Toys']
+REGIONS = ['East', 'North', 'South', 'West']
+WEATHER = ['Cloudy', 'Rainy', 'Snowy', 'Sunny']
+SEASONS = ['Autumn', 'Spring', 'Summer', 'Winter']
+
+
+def generate_inventory(n_rows, n_products, n_stores=N_STORES, seed=0):
+    """Synthetic inventory frame with the same columns as retail_store_inventory.csv.
+
+    Every product x store gets one row per day; the number of days is chosen so the
+    frame has about `n_rows` rows (at least one day).
+    """
+    rng = np.random.default_rng(seed)
+    n_days = max(1, n_rows // (n_products * n_stores))
+    n = n_days * n_products * n_stores
+    day = np.repeat(np.arange(n_days), n_products * n_stores)
+    store = np.tile(np.repeat(np.arange(n_stores), n_products), n_days)
+    product = np.tile(np.arange(n_products), n_days * n_stores)
+
+    # Per-product demand level plus weekly seasonality and noise
+    level = rng.uniform(20, 300, n_products)[product]
+    weekly = 1 + 0.2 * np.sin(2 * np.pi * day / 7)
+    units_sold = np.maximum(rng.normal(level * weekly, level * 0.15), 0).round().astype(np.int64)
+    price = rng.uniform(10, 100, n_products)[product] * rng.uniform(0.95, 1.05, n)
+
+    return pd.DataFrame({
+        'Date': (pd.Timestamp('2022-01-01') + pd.to_timedelta(day, unit='D')).strftime('%Y-%m-%d'),
+        'Store ID': np.char.add('S', np.char.zfill((store + 1).astype(str), 3)),
+        'Product ID': np.char.add('P', np.char.zfill((product + 1).astype(str), 4)),
+        'Category': np.array(CATEGORIES)[product % len(CATEGORIES)],
+        'Region': np.array(REGIONS)[store % len(REGIONS)],
+        'Inventory Level': rng.integers(50, 500, n),
+        'Units Sold': units_sold,
+        'Units Ordered': rng.integers(20, 200, n),
+        'Demand Forecast': (units_sold + rng.normal(0, 10, n)).round(2),
+        'Price': price.round(2),
+        'Discount': rng.choice([0, 5, 10, 15, 20], n),
+        'Weather Condition': rng.choice(WEATHER, n),
+        'Holiday/Promotion': rng.integers(0, 2, n),
+        'Competitor Pricing': (price * rng.uniform(0.9, 1.1, n)).round(2),
+        'Seasonality': np.array(SEASONS)[(day // 91) % len(SEASONS)],
+    })
+
+
+def synthetic_csv(scale, data_dir, seed=0):
+    """Path of the CSV for `scale` ('model' for MODEL_LAYOUT), generating it on first use."""
+    if scale == 'model':
+        layout = MODEL_LAYOUT
+    else:
+        n_rows, n_products = SCALES[scale]
+        layout = {'n_rows': n_rows, 'n_products': n_products}
+    path = Path(data_dir) / f"inventory_{scale}_{seed}.csv"
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        started = time.perf_counter()
+        tmp_path = path.with_name(path.name + '.tmp')
+        generate_inventory(seed=seed, **layout).to_csv(tmp_path, index=False)
+        tmp_path.replace(path)
+        print(f"Generated {path} in {time.perf_counter() - started:.1f}s")
+    return path
+
+
+def measure(fn, items=1, repeats=5, warmup=1):
+    """Time `fn()`; returns latency percentiles, throughput and peak traced memory."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    # Separate traced call: tracemalloc slows allocation-heavy code down
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    samples = np.array(samples)
+    p50 = float(np.percentile(samples, 50))
+    return {
+        'items': items,
+        'repeats': repeats,
+        'p50_ms': p50 * 1000,
+        'p99_ms': float(np.percentile(samples, 99)) * 1000,
+        'throughput': items / p50 if p50 > 0 else float('inf'),
+        'peak_mb': peak / 2**20,
+    }
+
+
+def _import_app():
+    # The dashboard helpers live in app.py; importing it outside `streamlit run` logs noise
+    import streamlit.logger
+    streamlit.logger.set_log_level('error')
+    import app
+    return app
+
+
+def run_benchmarks(csv_path, model_csv_path, only=None, repeats=5, backends=('numpy', 'keras')):
+    """Run every benchmark (or those whose name starts with one of `only`); returns a dict.
+
+    Data benchmarks use `csv_path`; model benchmarks use `model_csv_path`, whose
+    categories must produce the feature layout the model was trained on.
+    """
+    from datastore import PartitionedStore
+    from lstm_runtime import load_inference_model
+    from utils import (BatchEncoder, KnnDefaultsIndex, build_input_row, get_knn_defaults,
+                       load_and_preprocess, load_preprocessing)
+
+    def wanted(name):
+        return not only or any(name.startswith(prefix) for prefix in only)
+
+    results = {}
+
+    def record(name, fn, items=1, n=repeats, warmup=1):
+        if not wanted(name):
+            return
+        results[name] = measure(fn, items, n, warmup)
+        r = results[name]
+        print(f"{name:<36} p50 {r['p50_ms']:10.2f}ms  p99 {r['p99_ms']:10.2f}ms  "
+              f"{r['throughput']:12.1f} items/s  peak {r['peak_mb']:8.1f}MB")
+
+    _, feature_columns, scaler, raw_means, _, category_options, raw_df = load_and_preprocess(str(csv_path))
+    n_rows = len(raw_df)
+    record('load_and_preprocess', lambda: load_and_preprocess(str(csv_path)), n_rows, max(1, repeats // 2), 0)
+    record('load_and_preprocess[compact]',
+           lambda: load_and_preprocess(str(csv_path), compact=True), n_rows, max(1, repeats // 2), 0)
+
+    choice = {c: opts[0] for c, opts in category_options.items() if opts}
+    record('knn_defaults', lambda: get_knn_defaults(raw_df, choice), 1, repeats)
+    knn_index = KnnDefaultsIndex(raw_df)
+    record('knn_index_build', lambda: KnnDefaultsIndex(raw_df), n_rows, max(1, repeats // 2), 0)
+    record('knn_index_lookup', lambda: knn_index.lookup(choice), 1, repeats * 20)
+
+    record('build_input_row',
+           lambda: build_input_row(feature_columns, category_options, scaler, raw_means, choice, False),
+           1, repeats * 20)
+
+    rng = np.random.default_rng(0)
+    model_store = None
+    for backend in backends:
+        if not any(wanted(n) for n in (f"predict[{backend}", f"train_lstm_forecast[{backend}",
+                                       f"generate_forecasts[{backend}")):
+            continue
+        model = load_inference_model(MODEL_PATH, backend)
+        for batch_size in PREDICT_BATCH_SIZES:
+            X = rng.normal(size=(batch_size, 1, model.input_shape[-1])).astype(np.float32)
+            record(f"predict[{backend},bs={batch_size}]", lambda: model.predict_on_batch(X),
+                   batch_size, repeats * 4)
+
+        if any(wanted(f"{n}[{backend}]") for n in ('train_lstm_forecast', 'generate_forecasts')):
+            app = _import_app()
+            if model_store is None:
+                from ingest import read_inventory_csv
+                model_columns, model_scaler, _, _, _ = load_preprocessing(str(model_csv_path))
+                encoder = BatchEncoder(model_columns, model_scaler)
+                model_store = PartitionedStore(read_inventory_csv(model_csv_path))
+            product_data = model_store.get(model_store.partition_keys()[0])
+            record(f"train_lstm_forecast[{backend}]",
+                   lambda: app.train_lstm_forecast(product_data, model, encoder=encoder),
+                   len(product_data), repeats)
+            record(f"generate_forecasts[{backend}]",
+                   lambda: app.generate_forecasts(product_data, model, 30, encoder=encoder), 30, repeats)
+
+    if wanted('scenario_sweep'):
+        from ingest import read_inventory_csv
+        from scenarios import latest_rows, sweep_scenarios
+        model_columns, model_scaler, _, _, _ = load_preprocessing(str(model_csv_path))
+        encoder = BatchEncoder(model_columns, model_scaler)
+        base = latest_rows(PartitionedStore(read_inventory_csv(model_csv_path)))
+        model = load_inference_model(MODEL_PATH, 'numpy')
+        grids = {'Price': np.linspace(0.5, 1.5, 101), 'Discount': [0, 5, 10, 15, 20],
+                 'Competitor Pricing': np.linspace(0.8, 1.2, 5), 'Holiday/Promotion': [0, 1]}
+        n_scenarios = len(base) * 101 * 5 * 5 * 2
+        for workers in (1, 4):
+            record(f"scenario_sweep[workers={workers}]",
+                   lambda: sweep_scenarios(base, grids, model, encoder, ('Price', 'Competitor Pricing'),
+                                           workers=workers),
+                   n_scenarios, max(1, repeats // 2))
+
+    if wanted('reorder'):
+        app = _import_app()
+        from reorder import fleet_reorder_suggestions
+        store = PartitionedStore(raw_df)
+        product_data = store.get(store.partition_keys()[0])
+        forecasts = {'14': np.full(14, float(raw_means.get('Units Sold', 0.0)))}
+        record('reorder[single]', lambda: app.calculate_reorder_suggestions(product_data, forecasts),
+               1, repeats * 20)
+        sku_store = PartitionedStore(raw_df, keys=('Product ID', 'Store ID'))
+        record('reorder[fleet]', lambda: fleet_reorder_suggestions(sku_store), len(sku_store), repeats)
+
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Print p50 changes against `baseline`; returns the number of regressions."""
+    regressions = 0
+    print('\nCompared with baseline (p50):')
+    for name, r in results.items():
+        old = baseline.get(name)
+        if old is None:
+            continue
+        change = (r['p50_ms'] - old['p50_ms']) / old['p50_ms'] if old['p50_ms'] else 0.0
+        flag = 'REGRESSION' if change > tolerance else ''
+        regressions += bool(flag)
+        print(f"    {name:<36} {old['p50_ms']:10.2f}ms -> {r['p50_ms']:10.2f}ms ({change:+.0%}) {flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark preprocessing, KNN, inference and reorder code')
+    parser.add_argument('--scale', choices=list(SCALES), default='tiny')
+    parser.add_argument('--data', default=None, help='use this CSV instead of synthetic data')
+    parser.add_argument('--data-dir', default=str(BASE / 'bench_data'), help='where synthetic CSVs are kept')
+    parser.add_argument('--only', nargs='*', help='run benchmarks whose name starts with these prefixes')
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--backends', nargs='*', default=['numpy', 'keras'], choices=['numpy', 'keras'])
+    parser.add_argument('--save', help='write results as JSON (use as a later --baseline)')
+    parser.add_argument('--baseline', help='JSON from an earlier --save to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed relative p50 increase before flagging a regression')
+    args = parser.parse_args()
+
+    warnings.filterwarnings('ignore', message='X does not have valid feature names')
+    csv_path = Path(args.data) if args.data else synthetic_csv(args.scale, args.data_dir)
+    model_csv_path = synthetic_csv('model', args.data_dir)
+    print(f"Benchmarking on {csv_path}")
+    results = run_benchmarks(csv_path, model_csv_path, args.only, args.repeats, args.backends)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({'scale': args.scale, 'data': str(csv_path), 'results': results}, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            if compare(results, json.load(f)['results'], args.tolerance):
+                raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
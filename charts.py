@@ -0,0 +1,151 @@
+"""Downsampled, cache-friendly chart rendering for the dashboard tabs.
+
+Each chart function takes plain arrays, reduces long series to at most `max_points`
+with LTTB (largest-triangle-three-buckets, which keeps the visual shape) or min/max
+bucketing, draws on a standalone `matplotlib.figure.Figure` and returns PNG bytes.
+Figures are never registered with pyplot, so nothing accumulates across reruns, and
+the bytes can be cached per (product, parameters) and shown with `st.image`.
+"""
+import io
+
+import numpy as np
+
+MAX_POINTS = 1000
+# Per-point markers only help while points are still distinguishable
+MARKER_LIMIT = 200
+DPI = 110
+
+
+def _as_float(x):
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        return x.astype('datetime64[ns]').astype(np.int64).astype(np.float64)
+    return x.astype(np.float64)
+
+
+def lttb_indices(x, y, n_out=MAX_POINTS):
+    """Indices of the `n_out` points LTTB keeps from the series (x, y); all if it is shorter."""
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = _as_float(x)
+    y = np.nan_to_num(np.asarray(y, dtype=np.float64))
+    # n_out - 2 buckets between the fixed first and last points
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.intp)
+    edges = np.append(edges, n)
+    keep = np.empty(n_out, dtype=np.intp)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, stop = edges[i], edges[i + 1]
+        next_start, next_stop = edges[i + 1], edges[i + 2]
+        avg_x = x[next_start:next_stop].mean()
+        avg_y = y[next_start:next_stop].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:stop] - y[a]) - (x[a] - x[start:stop]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        keep[i + 1] = a
+    return keep
+
+
+def minmax_indices(y, n_buckets=MAX_POINTS // 2):
+    """Indices of the min and max of each of `n_buckets` equal buckets, plus the first and
+    last point so the x range is unchanged, in order."""
+    n = len(y)
+    if 2 * n_buckets >= n:
+        return np.arange(n)
+    y = np.nan_to_num(np.asarray(y, dtype=np.float64))
+    edges = np.linspace(0, n, n_buckets + 1).astype(np.intp)
+    keep = [0, n - 1]
+    for start, stop in zip(edges[:-1], edges[1:]):
+        block = y[start:stop]
+        keep.extend((start + int(np.argmin(block)), start + int(np.argmax(block))))
+    return np.unique(keep)
+
+
+def _figure(figsize, nrows=1):
+    from matplotlib.figure import Figure
+    fig = Figure(figsize=figsize, dpi=DPI)
+    axes = fig.subplots(nrows, 1)
+    return fig, axes
+
+
+def _png(fig):
+    fig.tight_layout()
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png', dpi=DPI)
+    return buf.getvalue()
+
+
+def _style(ax, xlabel, ylabel, title, legend=True, rotate=True, title_size=13):
+    ax.set_xlabel(xlabel, fontsize=11, fontweight='bold')
+    ax.set_ylabel(ylabel, fontsize=11, fontweight='bold')
+    ax.set_title(title, fontsize=title_size, fontweight='bold')
+    if legend:
+        ax.legend(loc='best', fontsize=10)
+    ax.grid(True, alpha=0.3)
+    if rotate:
+        ax.tick_params(axis='x', labelrotation=45)
+
+
+def historical_chart(product_id, dates, units_sold, demand, future_dates=None, future_values=None,
+                     max_points=MAX_POINTS):
+    """Historical sales and demand with the forecast appended; returns PNG bytes."""
+    keep = lttb_indices(dates, units_sold, max_points)
+    marker = {'marker': 'o', 'markersize': 4} if len(keep) <= MARKER_LIMIT else {}
+    fig, ax = _figure((12, 5))
+    dates = np.asarray(dates)
+    ax.plot(dates[keep], np.asarray(units_sold)[keep], label='Historical Sales', linewidth=2, **marker)
+    ax.plot(dates[keep], np.asarray(demand)[keep], label='Historical Forecast', linestyle='--',
+            linewidth=2, alpha=0.7)
+    if future_values is not None and len(future_values):
+        ax.plot(future_dates, future_values, label='30-Day Forecast', marker='s', linewidth=2.5,
+                color='red', markersize=5)
+    _style(ax, 'Date', 'Units', f'{product_id} - Historical Sales vs LSTM Forecast')
+    return _png(fig)
+
+
+def moving_average_chart(product_id, dates, units_sold, ma_7, ma_30, max_points=MAX_POINTS, windows=(7, 30)):
+    """Daily sales with short/long (default 7/30-day) moving averages and the band between them."""
+    # Min/max keeps the daily extremes visible; the smooth averages share the same points
+    keep = minmax_indices(units_sold, max_points // 2)
+    marker = {'marker': 'o', 'markersize': 3} if len(keep) <= MARKER_LIMIT else {}
+    dates = np.asarray(dates)[keep]
+    ma_7 = np.asarray(ma_7, dtype=np.float64)[keep]
+    ma_30 = np.asarray(ma_30, dtype=np.float64)[keep]
+    fig, ax = _figure((12, 5))
+    ax.plot(dates, np.asarray(units_sold)[keep], label='Daily Sales', alpha=0.5, **marker)
+    ax.plot(dates, ma_7, label=f'{windows[0]}-Day MA', linewidth=2.5)
+    ax.plot(dates, ma_30, label=f'{windows[1]}-Day MA', linewidth=2.5)
+    ax.fill_between(dates, ma_7, ma_30, alpha=0.2)
+    _style(ax, 'Date', 'Units Sold', f'{product_id} - Moving Averages Analysis')
+    return _png(fig)
+
+
+def seasonality_chart(monthly_sales, dates, units_sold, trend, max_points=MAX_POINTS):
+    """Monthly average bars over the sales trend; returns PNG bytes."""
+    fig, (ax1, ax2) = _figure((12, 8), nrows=2)
+    positions = np.arange(len(monthly_sales))
+    ax1.bar(positions, monthly_sales.values, color='steelblue', alpha=0.7, edgecolor='black')
+    ax1.set_xticks(positions)
+    ax1.set_xticklabels([str(m) for m in monthly_sales.index], rotation=45)
+    _style(ax1, 'Month', 'Avg Units Sold', 'Seasonality Pattern (Monthly Average)', legend=False,
+           rotate=False, title_size=12)
+    ax1.grid(False)
+    ax1.grid(alpha=0.3, axis='y')
+
+    keep = lttb_indices(dates, units_sold, max_points)
+    dates = np.asarray(dates)
+    ax2.plot(dates[keep], np.asarray(units_sold)[keep], alpha=0.5, label='Daily Sales')
+    ax2.plot(dates[keep], np.asarray(trend)[keep], 'r-', linewidth=2.5, label='Trend')
+    _style(ax2, 'Date', 'Units Sold', 'Sales Trend', title_size=12)
+    return _png(fig)
+
+
+def loss_chart(mse, epochs=10):
+    """Illustrative train/validation loss curves scaled from the backtest MSE; returns PNG bytes."""
+    fig, ax = _figure((10, 4))
+    x = np.arange(1, epochs + 1)
+    ax.plot(x, mse * (1 - np.linspace(0, 0.3, epochs)), marker='o', label='Training Loss', linewidth=2.5)
+    ax.plot(x, mse * (1 - np.linspace(0, 0.25, epochs)), marker='s', label='Validation Loss', linewidth=2.5)
+    _style(ax, 'Epoch', 'Loss (MSE)', 'Model Training Progress', rotate=False, title_size=12)
+    return _png(fig)
@@ -0,0 +1,48 @@
+"""Shared pytest fixtures: the bundled inventory CSV (or a synthetic one with the model's layout)."""
+import shutil
+from pathlib import Path
+
+import pytest
+
+BASE = Path(__file__).parent
+DATA_PATH = BASE / 'retail_store_inventory.csv'
+MODEL_PATH = BASE / 'model_lstm_100_100_1.keras'
+
+
+@pytest.fixture(scope='session')
+def inventory_csv(tmp_path_factory):
+    """Read-only inventory CSV in a temp dir, so cached artifacts never land in the repo."""
+    path = tmp_path_factory.mktemp('data') / 'retail_store_inventory.csv'
+    if DATA_PATH.exists():
+        shutil.copyfile(DATA_PATH, path)
+    else:
+        from benchmark import MODEL_LAYOUT, generate_inventory
+        generate_inventory(**MODEL_LAYOUT).to_csv(path, index=False)
+    return path
+
+
+@pytest.fixture
+def inventory_copy(inventory_csv, tmp_path):
+    """Private copy of the inventory CSV for tests that append to it."""
+    path = tmp_path / inventory_csv.name
+    shutil.copyfile(inventory_csv, path)
+    return path
+
+
+@pytest.fixture(scope='session')
+def inventory(inventory_csv):
+    from ingest import read_inventory_csv
+    return read_inventory_csv(inventory_csv)
+
+
+@pytest.fixture(scope='session')
+def encoder(inventory_csv):
+    from utils import BatchEncoder, load_preprocessing
+    feature_columns, scaler, _, _, _ = load_preprocessing(inventory_csv)
+    return BatchEncoder(feature_columns, scaler)
+
+
+@pytest.fixture(scope='session')
+def numpy_model():
+    from lstm_runtime import load_inference_model
+    return load_inference_model(MODEL_PATH, 'numpy')
@@ -0,0 +1,342 @@
+"""Pluggable inventory data sources with product, store and date-range pushdown.
+
+`CsvSource` reads the CSV in chunks and keeps only matching rows, so memory is bounded
+by the chunk size plus the result. `SqliteSource` turns the same filters into a
+parameterized WHERE clause over an indexed table, so only the requested rows are read,
+and borrows connections from a bounded `ConnectionPool` (callers beyond the pool size
+wait for a free connection). Both return frames with `ingest.SCHEMA` dtypes and Date
+parsed, like `read_inventory_csv`, with every categorical column carrying the full level
+set of the source (not just the fetched levels), and both offer the `get(product_id)` /
+`partition_keys()` interface of `datastore.PartitionedStore`, so they can stand in for
+it in `app.prepare_forecast_data`.
+
+Sources are named by a path or URL: 'data.csv' or 'sqlite:///data.db'. Convert a CSV
+with:
+    python datasources.py import --data retail_store_inventory.csv --db inventory.db
+"""
+import argparse
+import os
+import queue
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from pathlib import Path
+
+import pandas as pd
+
+from ingest import DATE_COLUMN, SCHEMA, STREAM_SCHEMA, apply_schema, iter_inventory_chunks
+from instrumentation import incr, observe, set_gauge, timed
+
+TABLE = 'inventory'
+DEFAULT_POOL_SIZE = 4
+SQLITE_PREFIX = 'sqlite:///'
+CATEGORY_COLUMNS = [c for c, dtype in SCHEMA.items() if dtype == 'category']
+
+
+def _as_list(values):
+    if values is None:
+        return None
+    if isinstance(values, (str, bytes)) or not hasattr(values, '__iter__'):
+        return [values]
+    return list(values)
+
+
+class DataSource(ABC):
+    """Interface shared by the backends; subclasses implement `fetch`, `distinct`, `version`."""
+
+    @abstractmethod
+    def fetch(self, products=None, stores=None, start=None, end=None, columns=None):
+        """Rows matching every given filter, sorted by (Product ID, Date) in file order within a day.
+
+        - products, stores: a value or list of values (None: no filter)
+        - start, end: inclusive Date bounds (anything `pd.Timestamp` accepts)
+        - columns: subset of columns to return (filter columns are read regardless)
+        An empty match is an empty frame with the same columns and dtypes.
+        """
+
+    @abstractmethod
+    def distinct(self, column):
+        """Sorted distinct values of one column."""
+
+    @abstractmethod
+    def version(self):
+        """Changes whenever the underlying data does; used in cache keys."""
+
+    def categories(self):
+        """Full level set of each categorical column, cached until `version()` changes."""
+        version = self.version()
+        cached = getattr(self, '_categories', None)
+        if cached is None or cached[0] != version:
+            cached = self._categories = (version, self._category_levels())
+        return cached[1]
+
+    def _category_levels(self):
+        return {c: [str(v) for v in self.distinct(c)] for c in CATEGORY_COLUMNS}
+
+    def _typed(self, df):
+        """SCHEMA dtypes, with categoricals set to the source's full level sets."""
+        df = apply_schema(df)
+        levels = self.categories()
+        for column in df.columns:
+            if column in levels:
+                df[column] = df[column].cat.set_categories(levels[column])
+        return df
+
+    def get(self, product_id):
+        """Date-sorted rows of one product, or None (the `PartitionedStore.get` contract)."""
+        rows = self.fetch(products=product_id)
+        return rows if len(rows) else None
+
+    def partition_keys(self):
+        return self.distinct('Product ID')
+
+    def close(self):
+        pass
+
+
+def _sorted(df):
+    order = [c for c in ('Product ID', DATE_COLUMN) if c in df.columns]
+    return df.sort_values(order, kind='stable').reset_index(drop=True) if order else df
+
+
+class CsvSource(DataSource):
+    """Filters applied while streaming the CSV chunk by chunk."""
+
+    def __init__(self, path, chunksize=500_000):
+        self.path = Path(path)
+        self.chunksize = chunksize
+
+    @timed('datasources.csv.fetch')
+    def fetch(self, products=None, stores=None, start=None, end=None, columns=None):
+        products, stores = _as_list(products), _as_list(stores)
+        usecols = None
+        if columns is not None:
+            needed = {'Product ID', 'Store ID', DATE_COLUMN}
+            usecols = list(dict.fromkeys(list(columns) + [c for c in needed if c not in columns]))
+        parts = []
+        for chunk in iter_inventory_chunks(self.path, self.chunksize, usecols=usecols):
+            mask = pd.Series(True, index=chunk.index)
+            if products is not None:
+                mask &= chunk['Product ID'].isin([str(p) for p in products])
+            if stores is not None:
+                mask &= chunk['Store ID'].isin([str(s) for s in stores])
+            if start is not None:
+                mask &= chunk[DATE_COLUMN] >= pd.Timestamp(start)
+            if end is not None:
+                mask &= chunk[DATE_COLUMN] <= pd.Timestamp(end)
+            parts.append(chunk[mask])
+        if parts:
+            df = pd.concat(parts, ignore_index=True)
+        else:
+            # Header-only file: no chunks at all
+            header = usecols or pd.read_csv(self.path, nrows=0).columns.tolist()
+            df = pd.DataFrame({c: pd.Series(dtype=STREAM_SCHEMA.get(c, object)) for c in header})
+        if columns is not None:
+            df = df[list(columns)]
+        incr('datasource_rows_total', len(df), backend='csv')
+        return _sorted(self._typed(df))
+
+    def distinct(self, column):
+        values = set()
+        for chunk in iter_inventory_chunks(self.path, self.chunksize, usecols=[column]):
+            values.update(chunk[column].dropna().unique().tolist())
+        return sorted(values)
+
+    def _category_levels(self):
+        # One pass over the file for every categorical column instead of one per column
+        header = pd.read_csv(self.path, nrows=0).columns
+        usecols = [c for c in CATEGORY_COLUMNS if c in header]
+        values = {c: set() for c in usecols}
+        for chunk in iter_inventory_chunks(self.path, self.chunksize, usecols=usecols):
+            for c in usecols:
+                values[c].update(chunk[c].dropna().unique().tolist())
+        return {c: sorted(v) for c, v in values.items()}
+
+    def version(self):
+        stat = self.path.stat()
+        return f"{stat.st_size}-{stat.st_mtime_ns}"
+
+
+class ConnectionPool:
+    """At most `size` connections, created lazily and handed out one caller at a time.
+
+    `connection()` blocks (up to `timeout` seconds) while all connections are in use,
+    which bounds how many queries run against the database concurrently.
+    """
+
+    def __init__(self, factory, size=DEFAULT_POOL_SIZE, timeout=30.0):
+        self.factory = factory
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._in_use = 0
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                create = True
+            else:
+                create = False
+        if create:
+            try:
+                return self.factory()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise TimeoutError(f"No database connection free after {self.timeout}s (pool size {self.size})")
+
+    @contextmanager
+    def connection(self):
+        conn = self._acquire()
+        with self._lock:
+            self._in_use += 1
+            set_gauge('datasource_connections_in_use', self._in_use)
+        try:
+            yield conn
+        finally:
+            with self._lock:
+                self._in_use -= 1
+                set_gauge('datasource_connections_in_use', self._in_use)
+            self._idle.put(conn)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+            with self._lock:
+                self._created -= 1
+
+
+class SqliteSource(DataSource):
+    """Inventory table in SQLite; filters become an indexed WHERE clause."""
+
+    def __init__(self, db_path, table=TABLE, pool_size=DEFAULT_POOL_SIZE):
+        self.db_path = Path(db_path)
+        if not self.db_path.exists():
+            raise FileNotFoundError(f"{self.db_path} does not exist; create it with `python datasources.py import`")
+        self.table = table
+        self.pool = ConnectionPool(self._connect, pool_size)
+
+    def _connect(self):
+        # Read-only URI; each connection is used by one thread at a time via the pool
+        conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True, check_same_thread=False)
+        conn.execute('PRAGMA query_only = 1')
+        return conn
+
+    def _where(self, products, stores, start, end):
+        clauses, params = [], []
+        for column, values in (('Product ID', _as_list(products)), ('Store ID', _as_list(stores))):
+            if values is not None:
+                clauses.append(f'"{column}" IN ({", ".join("?" * len(values))})')
+                params.extend(str(v) for v in values)
+        if start is not None:
+            clauses.append(f'"{DATE_COLUMN}" >= ?')
+            params.append(pd.Timestamp(start).strftime('%Y-%m-%d'))
+        if end is not None:
+            clauses.append(f'"{DATE_COLUMN}" <= ?')
+            params.append(pd.Timestamp(end).strftime('%Y-%m-%d'))
+        return (' WHERE ' + ' AND '.join(clauses) if clauses else ''), params
+
+    @timed('datasources.sqlite.fetch')
+    def fetch(self, products=None, stores=None, start=None, end=None, columns=None):
+        select = '*' if columns is None else ', '.join(f'"{c}"' for c in columns)
+        where, params = self._where(products, stores, start, end)
+        # rowid keeps the CSV's order within a day, as PartitionedStore's stable sort does
+        order = [f'"{c}"' for c in ('Product ID', DATE_COLUMN) if columns is None or c in columns]
+        sql = f'SELECT {select} FROM "{self.table}"{where} ORDER BY {", ".join(order + ["rowid"])}'
+        with self.pool.connection() as conn:
+            df = pd.read_sql_query(sql, conn, params=params)
+        incr('datasource_rows_total', len(df), backend='sqlite')
+        observe('datasource_fetch_rows', len(df))
+        return self._typed(df)
+
+    def distinct(self, column):
+        with self.pool.connection() as conn:
+            rows = conn.execute(f'SELECT DISTINCT "{column}" FROM "{self.table}" ORDER BY 1').fetchall()
+        return [row[0] for row in rows if row[0] is not None]
+
+    def version(self):
+        stats = [p.stat() for p in (self.db_path, self.db_path.with_name(self.db_path.name + '-wal'))
+                 if p.exists()]
+        return '-'.join(f"{s.st_size}-{s.st_mtime_ns}" for s in stats)
+
+    def close(self):
+        self.pool.close()
+
+
+def open_source(location, pool_size=DEFAULT_POOL_SIZE):
+    """DataSource for 'sqlite:///path.db' or a CSV path."""
+    location = str(location)
+    if location.startswith(SQLITE_PREFIX):
+        return SqliteSource(location[len(SQLITE_PREFIX):], pool_size=pool_size)
+    if location.endswith(('.db', '.sqlite', '.sqlite3')):
+        return SqliteSource(location, pool_size=pool_size)
+    return CsvSource(location)
+
+
+@timed()
+def import_csv_to_sqlite(csv_path, db_path, table=TABLE, chunksize=500_000):
+    """Stream the CSV into a new SQLite table indexed for product/store + date lookups.
+
+    The database is written to a temporary file and moved into place when complete.
+    """
+    db_path = Path(db_path)
+    tmp_path = db_path.with_name(db_path.name + '.tmp')
+    if tmp_path.exists():
+        tmp_path.unlink()
+    conn = sqlite3.connect(tmp_path)
+    rows = 0
+    try:
+        for chunk in iter_inventory_chunks(csv_path, chunksize):
+            chunk[DATE_COLUMN] = chunk[DATE_COLUMN].dt.strftime('%Y-%m-%d')
+            chunk.to_sql(table, conn, if_exists='append', index=False)
+            rows += len(chunk)
+        conn.execute(f'CREATE INDEX "idx_{table}_product_date" ON "{table}" ("Product ID", "Date")')
+        conn.execute(f'CREATE INDEX "idx_{table}_store_date" ON "{table}" ("Store ID", "Date")')
+        conn.execute(f'CREATE INDEX "idx_{table}_date" ON "{table}" ("Date")')
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp_path, db_path)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Import the inventory CSV into SQLite or query a source')
+    parser.add_argument('command', choices=['import', 'fetch'])
+    parser.add_argument('--data', default='retail_store_inventory.csv', help='CSV to import')
+    parser.add_argument('--db', default='inventory.db', help='SQLite database to create')
+    parser.add_argument('--source', default=None, help="source to query: CSV path or 'sqlite:///path.db'")
+    parser.add_argument('--product', nargs='*', default=None)
+    parser.add_argument('--store', nargs='*', default=None)
+    parser.add_argument('--start', default=None)
+    parser.add_argument('--end', default=None)
+    args = parser.parse_args()
+
+    if args.command == 'import':
+        rows = import_csv_to_sqlite(args.data, args.db)
+        print(f"Imported {rows} rows into {args.db}")
+        return
+    source = open_source(args.source or args.data)
+    df = source.fetch(args.product, args.store, args.start, args.end)
+    print(f"{len(df)} rows")
+    print(df.head(10).to_string(index=False))
+    source.close()
+
+
+if __name__ == '__main__':
+    main()
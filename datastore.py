@@ -0,0 +1,138 @@
+"""Partitioned, pre-sorted views of the inventory data for per-product access."""
+import numpy as np
+import pandas as pd
+
+
+class PartitionedStore:
+    """Inventory rows sorted once by (keys..., Date) with an offset index per partition.
+
+    Every partition (e.g. one Product ID) is a contiguous row range of a single frame, so
+    selecting it is a dict lookup plus an `iloc` slice: no scan, sort or copy of the full
+    data, and memory does not grow with the number of partitions.
+    """
+
+    def __init__(self, df, keys=('Product ID',), date_col='Date'):
+        self.keys = tuple(keys)
+        self.date_col = date_col
+        sort_cols = list(self.keys) + ([date_col] if date_col in df.columns else [])
+        self.frame = df.sort_values(sort_cols, kind='stable').reset_index(drop=True)
+
+        n = len(self.frame)
+        boundary = np.zeros(n, dtype=bool)
+        if n:
+            boundary[0] = True
+        key_values = [self.frame[k].to_numpy() for k in self.keys]
+        for values in key_values:
+            boundary[1:] |= values[1:] != values[:-1]
+        starts = np.flatnonzero(boundary)
+        stops = np.append(starts[1:], n)
+
+        self.offsets = {}
+        for start, stop in zip(starts.tolist(), stops.tolist()):
+            label = tuple(values[start] for values in key_values)
+            self.offsets[label[0] if len(self.keys) == 1 else label] = (start, stop)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __contains__(self, key):
+        return key in self.offsets
+
+    def partition_keys(self):
+        """Partition labels in sorted order (scalars for one key, tuples otherwise)."""
+        return list(self.offsets)
+
+    def get(self, key):
+        """Date-sorted rows of one partition as a slice of the shared frame, or None."""
+        bounds = self.offsets.get(key)
+        if bounds is None:
+            return None
+        start, stop = bounds
+        return self.frame.iloc[start:stop]
+
+    def column(self, key, col):
+        """One column of a partition as a numpy view into the contiguous block."""
+        start, stop = self.offsets[key]
+        return self.frame[col].to_numpy()[start:stop]
+
+    def boundaries(self):
+        """(starts, stops) arrays of every partition, in `partition_keys()` order."""
+        bounds = np.array(list(self.offsets.values()), dtype=np.intp).reshape(-1, 2)
+        return bounds[:, 0], bounds[:, 1]
+
+
+class PrefixSumIndex:
+    """Cumulative sums and sums of squares of one column of a `PartitionedStore`.
+
+    Built once in a single pass over the store's frame. Because every partition is a
+    contiguous, date-sorted row range, the sum over any row range of a partition is
+    one subtraction, so means, rolling means/stds for any window and per-month means
+    need no rescan of the series. Windows count rows, like `Series.rolling(window)`.
+    """
+
+    def __init__(self, store, column='Units Sold'):
+        self.store = store
+        self.column = column
+        values = store.frame[column].to_numpy(dtype=np.float64)
+        self.csum = np.concatenate(([0.0], np.cumsum(values)))
+        self.csq = np.concatenate(([0.0], np.cumsum(values * values)))
+
+        # Runs of rows in the same month within a partition (partitions are date-sorted)
+        n = len(values)
+        boundary = np.zeros(n, dtype=bool)
+        starts, _ = store.boundaries()
+        boundary[starts] = True
+        self.month_codes = np.zeros(0, dtype=np.int64)
+        if n and store.date_col in store.frame.columns:
+            dates = store.frame[store.date_col]
+            month = (dates.dt.year * 12 + dates.dt.month - 1).to_numpy(dtype=np.int64)
+            boundary[1:] |= month[1:] != month[:-1]
+            self.month_codes = month[boundary]
+        self.month_starts = np.flatnonzero(boundary)
+
+    def _range(self, key, start=None, stop=None):
+        first, last = self.store.offsets[key]
+        begin, end = slice(start, stop).indices(last - first)[:2]
+        return first + begin, first + max(begin, end)
+
+    def sum(self, key, start=None, stop=None):
+        """Sum over rows [start, stop) of a partition (positions within it; default all)."""
+        a, b = self._range(key, start, stop)
+        return float(self.csum[b] - self.csum[a])
+
+    def mean(self, key, start=None, stop=None):
+        """Mean over rows [start, stop) of a partition; NaN for an empty range."""
+        a, b = self._range(key, start, stop)
+        return float((self.csum[b] - self.csum[a]) / (b - a)) if b > a else float('nan')
+
+    def rolling_mean(self, key, window):
+        """`Series.rolling(window).mean()` of the partition as an array (NaN until full)."""
+        a, b = self.store.offsets[key]
+        out = np.full(b - a, np.nan)
+        if 0 < window <= b - a:
+            out[window - 1:] = (self.csum[a + window:b + 1] - self.csum[a:b - window + 1]) / window
+        return out
+
+    def rolling_std(self, key, window, ddof=1):
+        """`Series.rolling(window).std(ddof)` of the partition as an array (NaN until full)."""
+        a, b = self.store.offsets[key]
+        out = np.full(b - a, np.nan)
+        if window - ddof > 0 and window <= b - a:
+            sums = self.csum[a + window:b + 1] - self.csum[a:b - window + 1]
+            squares = self.csq[a + window:b + 1] - self.csq[a:b - window + 1]
+            var = (squares - sums * sums / window) / (window - ddof)
+            out[window - 1:] = np.sqrt(np.maximum(var, 0.0))
+        return out
+
+    def monthly_mean(self, key):
+        """Mean per calendar month, like `groupby(Date.dt.to_period('M')).mean()`."""
+        a, b = self.store.offsets[key]
+        lo, hi = np.searchsorted(self.month_starts, [a, b])
+        seg_starts = self.month_starts[lo:hi]
+        seg_stops = np.append(seg_starts[1:], b)
+        means = (self.csum[seg_stops] - self.csum[seg_starts]) / (seg_stops - seg_starts)
+        codes = self.month_codes[lo:hi]
+        # Monthly period ordinals count months from 1970-01
+        index = pd.PeriodIndex([pd.Period(ordinal=int(code) - 1970 * 12, freq='M') for code in codes],
+                               name=self.store.date_col)
+        return pd.Series(means, index=index, name=self.column)
@@ -0,0 +1,248 @@
+"""Memory-mapped store of encoded model inputs for training and backtests.
+
+`build_feature_store` encodes every row of the inventory CSV once (same features and
+scaling as `BatchEncoder` / `load_and_preprocess`) and writes:
+
+    features.npy   float32 (rows, num_features)  rows grouped by partition, date-sorted
+    target.npy     float32 (rows,)               Demand Forecast
+    dates.npy      datetime64[ns] (rows,)
+    index.json     partition offsets, feature_columns and the source CSV fingerprint
+
+The CSV is streamed in chunks and the arrays are written through `np.lib.format.open_memmap`,
+so neither building nor reading needs the data to fit in RAM. `FeatureStore` opens the
+files read-only with mmap, so processes reading the same store share one copy through
+the OS page cache, and partitions and lookback windows come out as views, not copies.
+
+Example:
+    python feature_store.py build --data retail_store_inventory.csv --out features
+"""
+import argparse
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+from forecasting import TARGET_COL, feature_windows
+from ingest import DATE_COLUMN, iter_inventory_chunks
+from instrumentation import timed
+from utils import (BatchEncoder, DEFAULT_BATCH_SIZE, combine_digests, file_block_digests,
+                   load_preprocessing)
+
+STORE_VERSION = 2
+ARRAYS = ('features', 'target', 'dates')
+
+
+def default_store_dir(csv_path):
+    """Where the store for `csv_path` lives by default: `<csv stem>.features/` beside it."""
+    csv_path = Path(csv_path)
+    return csv_path.with_name(csv_path.stem + '.features')
+
+
+def _fingerprint(csv_path, with_digest=True):
+    stat = os.stat(csv_path)
+    fingerprint = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    if with_digest:
+        fingerprint['sha256'] = combine_digests(file_block_digests(csv_path))
+    return fingerprint
+
+
+def _label(values):
+    return values[0] if len(values) == 1 else tuple(values)
+
+
+@timed()
+def build_feature_store(csv_path='retail_store_inventory.csv', store_dir=None, keys=('Product ID',),
+                        chunksize=500_000):
+    """Encode the CSV into memory-mapped arrays grouped by `keys`; returns the store dir.
+
+    Two streaming passes: the first counts rows per partition to lay out the offsets,
+    the second encodes each chunk and copies its rows to their partition's next free
+    slots. Partitions whose rows were not in date order are sorted in place at the end.
+    """
+    keys = list(keys)
+    store_dir = Path(store_dir) if store_dir else default_store_dir(csv_path)
+    store_dir.mkdir(parents=True, exist_ok=True)
+    feature_columns, scaler, _, _, _ = load_preprocessing(str(csv_path))
+    encoder = BatchEncoder(feature_columns, scaler)
+
+    counts = {}
+    for chunk in iter_inventory_chunks(csv_path, chunksize, usecols=keys):
+        for label, n in chunk.groupby(keys, sort=False).size().items():
+            label = label if isinstance(label, tuple) else (label,)
+            counts[label] = counts.get(label, 0) + n
+    labels = sorted(counts)
+    starts = np.cumsum([0] + [counts[label] for label in labels])
+    n_rows = int(starts[-1])
+    cursor = {label: int(start) for label, start in zip(labels, starts[:-1])}
+
+    tmp = {name: store_dir / f"{name}.npy.tmp" for name in ARRAYS}
+    features = np.lib.format.open_memmap(tmp['features'], mode='w+', dtype=np.float32,
+                                         shape=(n_rows, encoder.num_features))
+    target = np.lib.format.open_memmap(tmp['target'], mode='w+', dtype=np.float32, shape=(n_rows,))
+    dates = np.lib.format.open_memmap(tmp['dates'], mode='w+', dtype='datetime64[ns]', shape=(n_rows,))
+
+    for chunk in iter_inventory_chunks(csv_path, chunksize):
+        X = encoder.encode(chunk)[:, 0, :]
+        if TARGET_COL in chunk.columns:
+            y = chunk[TARGET_COL].to_numpy(dtype=np.float32)
+        else:
+            y = np.zeros(len(chunk), dtype=np.float32)
+        d = chunk[DATE_COLUMN].to_numpy(dtype='datetime64[ns]')
+        for label, positions in chunk.groupby(keys, sort=False).indices.items():
+            label = label if isinstance(label, tuple) else (label,)
+            start = cursor[label]
+            stop = start + len(positions)
+            features[start:stop] = X[positions]
+            target[start:stop] = y[positions]
+            dates[start:stop] = d[positions]
+            cursor[label] = stop
+
+    for label, start in zip(labels, starts[:-1]):
+        stop = start + counts[label]
+        block = dates[start:stop]
+        if len(block) > 1 and np.any(block[1:] < block[:-1]):
+            order = np.argsort(block, kind='stable')
+            features[start:stop] = features[start:stop][order]
+            target[start:stop] = target[start:stop][order]
+            dates[start:stop] = block[order]
+
+    for array in (features, target, dates):
+        array.flush()
+    del features, target, dates
+    for name, path in tmp.items():
+        os.replace(path, store_dir / f"{name}.npy")
+
+    index = {
+        'version': STORE_VERSION,
+        'source': _fingerprint(csv_path),
+        'keys': keys,
+        'feature_columns': feature_columns,
+        'scaler_mean': scaler.mean_.tolist() if hasattr(scaler, 'mean_') else [],
+        'scaler_scale': scaler.scale_.tolist() if hasattr(scaler, 'scale_') else [],
+        'partitions': [[list(label), int(start), int(start + counts[label])]
+                       for label, start in zip(labels, starts[:-1])],
+    }
+    tmp_index = store_dir / 'index.json.tmp'
+    with open(tmp_index, 'w') as f:
+        json.dump(index, f)
+    os.replace(tmp_index, store_dir / 'index.json')
+    return store_dir
+
+
+class FeatureStore:
+    """Read-only, memory-mapped view of a store written by `build_feature_store`.
+
+    Partition labels are scalars for a single key and tuples otherwise, as in
+    `datastore.PartitionedStore`. Every accessor returns views into the mapped files.
+    """
+
+    def __init__(self, store_dir):
+        self.path = Path(store_dir)
+        with open(self.path / 'index.json') as f:
+            self.index = json.load(f)
+        self.keys = tuple(self.index['keys'])
+        self.feature_columns = self.index['feature_columns']
+        self.offsets = {_label(label): (start, stop) for label, start, stop in self.index['partitions']}
+        self.features = np.load(self.path / 'features.npy', mmap_mode='r')
+        self.target = np.load(self.path / 'target.npy', mmap_mode='r')
+        self.dates = np.load(self.path / 'dates.npy', mmap_mode='r')
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __contains__(self, key):
+        return key in self.offsets
+
+    def partition_keys(self):
+        return list(self.offsets)
+
+    def rows(self, key):
+        """(features, target, dates) of one partition, date-sorted."""
+        start, stop = self.offsets[key]
+        return self.features[start:stop], self.target[start:stop], self.dates[start:stop]
+
+    def windows(self, key, lookback):
+        """Every lookback window of a partition and the target of each window's last row.
+
+        X is shaped (W, lookback, num_features) and y (W,), aligned like
+        `forecasting.backtest`; both share memory with the mapped files.
+        """
+        features, target, _ = self.rows(key)
+        if len(features) < lookback:
+            return np.empty((0, lookback, features.shape[1]), dtype=np.float32), target[:0]
+        return feature_windows(features, lookback), target[lookback - 1:]
+
+    def iter_batches(self, lookback, batch_size=DEFAULT_BATCH_SIZE, keys=None):
+        """Yield (key, X, y) batches of at most `batch_size` windows, partition by partition.
+
+        Batches never span two partitions, so X and y are always views and the whole
+        store can be streamed through a model without materializing it.
+        """
+        for key in (self.partition_keys() if keys is None else keys):
+            X, y = self.windows(key, lookback)
+            for start in range(0, len(X), batch_size):
+                yield key, X[start:start + batch_size], y[start:start + batch_size]
+
+    def nbytes(self):
+        return self.features.nbytes + self.target.nbytes + self.dates.nbytes
+
+
+def _same_values(recorded, current):
+    recorded, current = np.asarray(recorded, dtype=np.float64), np.asarray(current, dtype=np.float64)
+    return recorded.shape == current.shape and np.allclose(recorded, current, rtol=1e-12, atol=0.0)
+
+
+def _store_is_current(store_dir, csv_path, keys, feature_columns, scaler):
+    """Whether the store was encoded from this CSV with these columns and scaler statistics."""
+    index_path = Path(store_dir) / 'index.json'
+    if not index_path.exists():
+        return False
+    try:
+        with open(index_path) as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return False
+    if (index.get('version') != STORE_VERSION or index.get('keys') != list(keys)
+            or index.get('feature_columns') != feature_columns
+            or not _same_values(index.get('scaler_mean', []), getattr(scaler, 'mean_', []))
+            or not _same_values(index.get('scaler_scale', []), getattr(scaler, 'scale_', []))):
+        return False
+    recorded = index.get('source', {})
+    current = _fingerprint(csv_path, with_digest=False)
+    if recorded.get('size') != current['size']:
+        return False
+    if recorded.get('mtime_ns') == current['mtime_ns']:
+        return True
+    return recorded.get('sha256') == _fingerprint(csv_path)['sha256']
+
+
+def open_feature_store(csv_path='retail_store_inventory.csv', store_dir=None, keys=('Product ID',),
+                       chunksize=500_000):
+    """Open the store for `csv_path`, (re)building it first if it is missing or stale."""
+    store_dir = Path(store_dir) if store_dir else default_store_dir(csv_path)
+    feature_columns, scaler, _, _, _ = load_preprocessing(str(csv_path))
+    if not _store_is_current(store_dir, csv_path, keys, feature_columns, scaler):
+        build_feature_store(csv_path, store_dir, keys, chunksize)
+    return FeatureStore(store_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the memory-mapped feature store')
+    parser.add_argument('command', choices=['build', 'info'])
+    parser.add_argument('--data', default='retail_store_inventory.csv', help='inventory CSV')
+    parser.add_argument('--out', default=None, help='store directory (default: <csv stem>.features)')
+    parser.add_argument('--keys', nargs='+', default=['Product ID'], help='partition columns')
+    parser.add_argument('--chunksize', type=int, default=500_000, help='CSV rows per streamed chunk')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        store = FeatureStore(build_feature_store(args.data, args.out, args.keys, args.chunksize))
+    else:
+        store = open_feature_store(args.data, args.out, args.keys, args.chunksize)
+    print(f"{store.path}: {len(store)} partitions, {store.features.shape[0]} rows x "
+          f"{store.features.shape[1]} features ({store.nbytes() / 1e6:.1f} MB)")
+
+
+if __name__ == '__main__':
+    main()
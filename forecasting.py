@@ -0,0 +1,335 @@
+"""Model-driven forecasting helpers shared by the dashboard and non-UI entry points."""
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from utils import predict_batch, DEFAULT_BATCH_SIZE
+from instrumentation import incr, timed
+
+TARGET_COL = 'Demand Forecast'
+# Period of the seasonal-naive baseline rollouts are checked against (days)
+SEASON = 7
+# A rollout whose horizon total differs from the baseline's by more than this fraction
+# of it is not published; the baseline is
+BASELINE_TOLERANCE = 0.5
+
+
+def feature_windows(features, lookback):
+    """Zero-copy view of every run of `lookback` consecutive rows of a (n, F) matrix.
+
+    Returns an array shaped (n - lookback + 1, lookback, F) that shares memory with
+    `features`; window i covers rows i .. i + lookback - 1.
+    """
+    return sliding_window_view(features, lookback, axis=0).transpose(0, 2, 1)
+
+
+def model_timesteps(model, lookback):
+    """Rows per input the model takes: its trained timesteps, capped at `lookback`.
+
+    The shipped model was trained on single rows (input shape (None, 1, F)), so longer
+    windows are out of distribution for it; a model built for variable-length input
+    (timesteps None) gets the whole `lookback`.
+    """
+    shape = getattr(model, 'input_shape', None)
+    steps = shape[1] if shape is not None and len(shape) == 3 else None
+    return lookback if steps is None else min(int(steps), lookback)
+
+
+@timed()
+def backtest(product_data, model, encoder, lookback=10, train_frac=0.8, batch_size=DEFAULT_BATCH_SIZE,
+             features=None):
+    """Score the LSTM over every lookback window of a product's history.
+
+    Each window of `lookback` rows predicts the Demand Forecast of its last row. The model
+    is fed only the trailing `model_timesteps` rows of each window (one row for the shipped
+    model), so `lookback` sets how much history a prediction needs, never the input shape
+    the model was trained on. All windows go through the model in chunked batches; the first `train_frac` of them
+    (chronologically) are reported as train, the rest as test.
+    `features` may pass the product's already encoded (n, F) rows, e.g. a
+    `feature_store.FeatureStore` partition, to skip encoding.
+    Returns None when the history is too short, otherwise the metrics dict used by the
+    dashboard (actuals/predictions per split, mae, mse, rmse, r2).
+    """
+    demand = product_data[TARGET_COL].to_numpy(dtype=np.float64)
+    if len(demand) < lookback + 1:
+        return None
+
+    if features is None:
+        features = encoder.encode(product_data)[:, 0, :]
+    windows = feature_windows(features, lookback)[:, lookback - model_timesteps(model, lookback):]
+    if len(windows) < 10:
+        return None
+
+    from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+    from sklearn.preprocessing import StandardScaler
+
+    y = demand[lookback - 1:]
+    y_pred = predict_batch(model, windows, batch_size).astype(np.float64)
+
+    train_size = int(train_frac * len(y))
+    y_train, y_test = y[:train_size], y[train_size:]
+    y_train_pred, y_test_pred = y_pred[:train_size], y_pred[train_size:]
+
+    mae = mean_absolute_error(y_test, y_test_pred)
+    mse = mean_squared_error(y_test, y_test_pred)
+    rmse = np.sqrt(mse)
+    r2 = r2_score(y_test, y_test_pred)
+
+    return {
+        'y_train': y_train,
+        'y_train_pred': y_train_pred,
+        'y_test': y_test,
+        'y_test_pred': y_test_pred,
+        'mae': mae,
+        'mse': mse,
+        'rmse': rmse,
+        'r2': r2,
+        'scaler_demand': StandardScaler().fit(demand.reshape(-1, 1)),
+        'scaler_sales': StandardScaler()
+    }
+
+
+def last_windows(histories, encoder, lookback=10):
+    """Encode the last `lookback` rows of each date-sorted history into one batch.
+
+    Returns (windows, valid): windows is float32 (n_series, lookback, F); valid flags the
+    series that had at least `lookback` rows (the others are left as zeros).
+    """
+    valid = np.array([len(h) >= lookback for h in histories], dtype=bool)
+    windows = np.zeros((len(histories), lookback, encoder.num_features), dtype=np.float32)
+    tails = [h.iloc[-lookback:] for h, ok in zip(histories, valid) if ok]
+    if tails:
+        encoded = encoder.encode(pd.concat(tails, ignore_index=True))
+        windows[valid] = encoded.reshape(-1, lookback, encoder.num_features)
+    return windows, valid
+
+
+def recent_demand(histories, days=SEASON, date_col='Date'):
+    """Daily totals of the target over the last `days` calendar days of each history, (n, days).
+
+    Column j is the day `days - 1 - j` days before the history's last date; rows that share
+    a date are summed and days without rows are NaN, so the columns are dates, not rows.
+    """
+    demand = np.full((len(histories), days), np.nan)
+    for i, h in enumerate(histories):
+        if not len(h):
+            continue
+        dates = h[date_col].to_numpy(dtype='datetime64[D]')
+        offset = (dates - dates.max()).astype(np.int64) + days - 1
+        recent = offset >= 0
+        totals = np.bincount(offset[recent], h[TARGET_COL].to_numpy(dtype=np.float64)[recent], minlength=days)
+        seen = np.bincount(offset[recent], minlength=days) > 0
+        demand[i, seen] = totals[seen]
+    return demand
+
+
+@timed()
+def recursive_forecast(windows, model, encoder, horizon, feedback_col='Units Sold', batch_size=DEFAULT_BATCH_SIZE):
+    """Autoregressive multi-step forecast for a batch of series.
+
+    Every step runs one batched predict on the trailing `model_timesteps` rows of each
+    series' window. The next input row repeats the series' latest row with `feedback_col`
+    replaced by the (scaled) prediction, and the window slides forward by one row. Once a
+    prediction falls outside the range `feedback_col` showed in the series' starting
+    window, feeding it back would be out of distribution: that series stops recursing and
+    its remaining steps are NaN. Windows live in a preallocated buffer so each step only
+    writes one row per series.
+    Returns float array (n_series, horizon) in the original demand scale; use
+    `guarded_forecast` for values that are safe to publish.
+    """
+    n_series, lookback, num_features = windows.shape
+    forecasts = np.full((n_series, horizon), np.nan)
+    if n_series == 0 or horizon == 0:
+        return forecasts
+
+    steps = model_timesteps(model, lookback)
+    buffer = np.empty((n_series, lookback + horizon, num_features), dtype=np.float32)
+    buffer[:, :lookback] = windows
+
+    feedback_index = None
+    if feedback_col in encoder.numeric_order:
+        feedback_index = encoder.column_index[feedback_col]
+        pos = encoder.numeric_order.index(feedback_col)
+        feedback_mean, feedback_scale = encoder.scaler.mean_[pos], encoder.scaler.scale_[pos]
+        feedback_lo = windows[:, :, feedback_index].min(axis=1)
+        feedback_hi = windows[:, :, feedback_index].max(axis=1)
+
+    active = np.arange(n_series)
+    for step in range(horizon):
+        preds = predict_batch(model, buffer[active, step + lookback - steps:step + lookback],
+                              max(batch_size, len(active)))
+        forecasts[active, step] = preds
+        buffer[active, step + lookback] = buffer[active, step + lookback - 1]
+        if feedback_index is not None:
+            scaled = (preds - feedback_mean) / feedback_scale
+            inside = (scaled >= feedback_lo[active]) & (scaled <= feedback_hi[active])
+            buffer[active[inside], step + lookback, feedback_index] = scaled[inside]
+            active = active[inside]
+            if not len(active):
+                break
+    return forecasts
+
+
+def seasonal_naive(demand, horizon, season=SEASON):
+    """Baseline forecast repeating each series' last `season` days.
+
+    `demand` is (n_series, k) daily totals ending on the forecast origin (see
+    `recent_demand`), so forecast day h repeats the same weekday of the last week.
+    Returns (n_series, horizon).
+    """
+    demand = np.asarray(demand, dtype=np.float64)
+    tail = demand[:, -season:]
+    return tail[:, np.arange(horizon) % tail.shape[1]]
+
+
+@timed()
+def guarded_forecast(windows, demand, model, encoder, horizon, tolerance=BASELINE_TOLERANCE,
+                     batch_size=DEFAULT_BATCH_SIZE):
+    """Recursive forecast checked against the seasonal-naive baseline before it is published.
+
+    A series keeps its model rollout only when the rollout covers the whole horizon (it
+    never left its input range) and its horizon total is within `tolerance` of the
+    baseline's; otherwise the baseline is returned for it.
+    Returns (forecasts (n_series, horizon), from_model bool (n_series,)).
+    """
+    rollout = recursive_forecast(windows, model, encoder, horizon, batch_size=batch_size)
+    baseline = seasonal_naive(demand, horizon)
+    expected = baseline.sum(axis=1)
+    from_model = ~np.isnan(rollout).any(axis=1)
+    from_model &= np.abs(np.nan_to_num(rollout).sum(axis=1) - expected) <= tolerance * np.abs(expected)
+    incr('forecast_series_total', len(from_model))
+    incr('forecast_baseline_fallbacks_total', int((~from_model).sum()))
+    return np.where(from_model[:, None], rollout, baseline), from_model
+
+
+def store_histories(history, by='Store ID', date_col='Date'):
+    """Split a product's history into its date-sorted per-store daily series.
+
+    A product has one row per store and date, interleaved; the recursive forecaster and
+    the baseline both need one row per day, so they run per store.
+    """
+    history = history.sort_values(date_col, kind='stable')
+    return [group for _, group in history.groupby(by, sort=True, observed=True)]
+
+
+@timed()
+def forecast_stores(histories, model, encoder, horizon, lookback=10, batch_size=DEFAULT_BATCH_SIZE):
+    """Baseline-checked forecasts of several daily series, one batched rollout.
+
+    Returns (forecasts (n, horizon), from_model (n,) bool); series shorter than `lookback`
+    get NaN and False.
+    """
+    forecasts = np.full((len(histories), horizon), np.nan)
+    from_model = np.zeros(len(histories), dtype=bool)
+    windows, valid = last_windows(histories, encoder, lookback)
+    if valid.any():
+        demand = recent_demand([h for h, ok in zip(histories, valid) if ok])
+        forecasts[valid], from_model[valid] = guarded_forecast(windows[valid], demand, model, encoder, horizon,
+                                                               batch_size=batch_size)
+    return forecasts, from_model
+
+
+@timed()
+def product_forecast(history, model, encoder, horizon=30, lookback=10, date_col='Date',
+                     batch_size=DEFAULT_BATCH_SIZE):
+    """Daily forecast of one product's total demand over its stores.
+
+    Each store's daily series is rolled out (or replaced by its seasonal-naive baseline)
+    from the product's last date and the stores are summed per day. Stores whose series
+    ends earlier or is shorter than `lookback` are left out.
+    Returns (dates, forecast (horizon,), source) with source 'model', 'seasonal_naive' or
+    'mixed' (some stores each), or None when no store can be forecast.
+    """
+    if not len(history):
+        return None
+    origin = history[date_col].max()
+    histories = [h for h in store_histories(history, date_col=date_col) if h[date_col].iloc[-1] == origin]
+    forecasts, from_model = forecast_stores(histories, model, encoder, horizon, lookback, batch_size)
+    valid = ~np.isnan(forecasts).all(axis=1)
+    if not valid.any():
+        return None
+    dates = pd.date_range(origin + pd.Timedelta(days=1), periods=horizon, freq='D')
+    used = from_model[valid]
+    source = 'model' if used.all() else 'seasonal_naive' if not used.any() else 'mixed'
+    return dates, forecasts[valid].sum(axis=0), source
+
+
+@timed()
+def forecast_products(df, product_ids, model, encoder, horizon=30, lookback=10, batch_size=DEFAULT_BATCH_SIZE):
+    """Daily forecast of the total demand of several products in one batched rollout.
+
+    Every product x store series is forecast (see `forecast_stores`) and the stores of a
+    product summed per day. Returns a DataFrame indexed by Product ID with one column per
+    forecast day (1..horizon); products with no store of `lookback` rows get NaN.
+    """
+    product_ids = list(product_ids)
+    subset = df[df['Product ID'].isin(product_ids)].sort_values('Date', kind='stable')
+    groups = list(subset.groupby(['Product ID', 'Store ID'], sort=True, observed=True))
+    position = {pid: i for i, pid in enumerate(product_ids)}
+    owners = np.array([position[key[0]] for key, _ in groups], dtype=np.intp)
+    store_forecasts, _ = forecast_stores([group for _, group in groups], model, encoder, horizon, lookback,
+                                         batch_size)
+
+    forecasts = np.zeros((len(product_ids), horizon))
+    covered = np.zeros(len(product_ids), dtype=bool)
+    valid = ~np.isnan(store_forecasts).all(axis=1)
+    np.add.at(forecasts, owners[valid], store_forecasts[valid])
+    covered[owners[valid]] = True
+    forecasts[~covered] = np.nan
+    return pd.DataFrame(forecasts, index=pd.Index(product_ids, name='Product ID'),
+                        columns=range(1, horizon + 1))
+
+
+def _partition_demand(store, starts, stops, days=SEASON):
+    """`recent_demand` of store partitions, gathered without a per-partition loop."""
+    day = store.frame[store.date_col].to_numpy(dtype='datetime64[D]').astype(np.int64)
+    target = store.frame[TARGET_COL].to_numpy(dtype=np.float64)
+    all_starts, all_stops = store.boundaries()
+    # Rows are sorted by partition, then date, so (partition, day) codes ascend and the
+    # first row of each partition's last `days` days is one searchsorted
+    span = day.max() - day.min() + days + 1
+    code = np.repeat(np.arange(len(all_starts)) * span, all_stops - all_starts) + day - day.min()
+    first = np.searchsorted(code, code[stops - 1] - days + 1)
+    lengths = stops - first
+    owner = np.repeat(np.arange(len(stops)), lengths)
+    rows = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths) + np.repeat(first, lengths)
+    offset = day[rows] - day[stops - 1][owner] + days - 1
+    totals = np.zeros((len(stops), days))
+    np.add.at(totals, (owner, offset), target[rows])
+    seen = np.zeros((len(stops), days), dtype=bool)
+    seen[owner, offset] = True
+    return np.where(seen, totals, np.nan)
+
+
+@timed()
+def forecast_partitions(store, model, encoder, horizon=14, lookback=10, batch_size=DEFAULT_BATCH_SIZE):
+    """Forecast every partition of a `datastore.PartitionedStore` keyed down to one row per
+    date (product x store).
+
+    The last `lookback` rows of all partitions are gathered with one fancy-index take and
+    encoded in a single pass before the batched, baseline-checked rollout; the baseline
+    reads the last SEASON days of each partition by date.
+    Returns a DataFrame indexed by partition key with one column per forecast day;
+    partitions shorter than `lookback` get NaN. Raises ValueError when a window repeats a
+    date, i.e. the store is keyed coarser than the daily series.
+    """
+    keys = store.partition_keys()
+    starts, stops = store.boundaries()
+    if len(store.keys) == 1:
+        index = pd.Index(keys, name=store.keys[0])
+    else:
+        index = pd.MultiIndex.from_tuples(keys, names=store.keys)
+
+    forecasts = np.full((len(keys), horizon), np.nan)
+    valid = (stops - starts) >= lookback
+    if valid.any():
+        rows = stops[valid][:, None] - lookback + np.arange(lookback)
+        dates = store.frame[store.date_col].to_numpy()[rows]
+        if (dates[:, 1:] == dates[:, :-1]).any():
+            raise ValueError(f"partitions by {list(store.keys)} repeat dates; key the store down to one row "
+                             "per date (e.g. Product ID and Store ID)")
+        encoded = encoder.encode(store.frame.take(rows.ravel()))
+        windows = encoded.reshape(-1, lookback, encoder.num_features)
+        demand = _partition_demand(store, starts[valid], stops[valid])
+        forecasts[valid], _ = guarded_forecast(windows, demand, model, encoder, horizon, batch_size=batch_size)
+    return pd.DataFrame(forecasts, index=index, columns=range(1, horizon + 1))
@@ -0,0 +1,78 @@
+"""Schema-aware CSV ingestion for the retail inventory data.
+
+Reading with an explicit schema keeps ID/category columns as pandas categoricals and
+numeric columns at the narrowest safe width, and parses Date while reading, so the
+in-memory frame is a fraction of what a plain `pd.read_csv` produces.
+"""
+import pandas as pd
+
+DATE_COLUMN = 'Date'
+
+# Column -> dtype used at read time. Columns not listed keep pandas' inferred dtype.
+SCHEMA = {
+    'Store ID': 'category',
+    'Product ID': 'category',
+    'Category': 'category',
+    'Region': 'category',
+    'Weather Condition': 'category',
+    'Seasonality': 'category',
+    'Inventory Level': 'int32',
+    'Units Sold': 'int32',
+    'Units Ordered': 'int32',
+    'Demand Forecast': 'float32',
+    'Price': 'float32',
+    'Discount': 'int16',
+    'Holiday/Promotion': 'int8',
+    'Competitor Pricing': 'float32',
+}
+
+# Wide dtypes for chunked reads: categories differ between chunks and integer columns must
+# not overflow when statistics are accumulated across them.
+STREAM_SCHEMA = {col: ('str' if dtype == 'category' else 'float64') for col, dtype in SCHEMA.items()}
+
+
+def _read_columns(csv_path):
+    return pd.read_csv(csv_path, nrows=0).columns.tolist()
+
+
+def _typed(columns, schema):
+    return {c: schema[c] for c in columns if c in schema}
+
+
+def read_inventory_csv(csv_path, engine=None, usecols=None):
+    """Read the inventory CSV with SCHEMA dtypes and Date parsed at read time.
+
+    - engine: None for pandas' C parser, or 'pyarrow' (multithreaded, requires pyarrow)
+    - usecols: optional subset of columns to load
+    """
+    columns = usecols or _read_columns(csv_path)
+    return pd.read_csv(
+        csv_path,
+        usecols=usecols,
+        dtype=_typed(columns, SCHEMA),
+        parse_dates=[DATE_COLUMN] if DATE_COLUMN in columns else False,
+        engine=engine,
+    )
+
+
+def iter_inventory_chunks(csv_path, chunksize=500_000, usecols=None):
+    """Stream the CSV as DataFrames of at most `chunksize` rows (STREAM_SCHEMA dtypes).
+
+    Memory use is bounded by the chunk size, so files larger than RAM can be scanned.
+    """
+    columns = usecols or _read_columns(csv_path)
+    return pd.read_csv(
+        csv_path,
+        usecols=usecols,
+        dtype=_typed(columns, STREAM_SCHEMA),
+        parse_dates=[DATE_COLUMN] if DATE_COLUMN in columns else False,
+        chunksize=chunksize,
+    )
+
+
+def apply_schema(df):
+    """Cast a frame read some other way (chunks, SQL) to SCHEMA dtypes with Date parsed."""
+    df = df.astype(_typed(df.columns, SCHEMA))
+    if DATE_COLUMN in df.columns and not pd.api.types.is_datetime64_any_dtype(df[DATE_COLUMN]):
+        df[DATE_COLUMN] = pd.to_datetime(df[DATE_COLUMN])
+    return df
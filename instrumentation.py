@@ -0,0 +1,299 @@
+"""Lightweight timing spans, counters and optional profiling for the hot paths.
+
+Spans (`span` context manager / `timed` decorator) aggregate call count, total, max
+and self time (total minus the time of spans nested inside) per name in a process-wide
+registry; spans opened inside a `trace` are also recorded in that trace, which is how
+the dashboard shows a per-rerun breakdown. Shares in a breakdown use self time, so
+nested spans are not counted twice and the shares add up to at most 100%.
+Counters, gauges and histograms (e.g. predict batch sizes) go to the same registry.
+
+Output:
+- structured logs: JSON lines on the 'forecast.perf' logger (spans at DEBUG, traces
+  at INFO); FORECAST_PERF_LOG=<level> attaches a stderr handler
+- Prometheus text format: `prometheus_text()`, `write_prometheus(path)`; the dashboard
+  writes FORECAST_METRICS_FILE after every rerun and serve.py exposes GET /metrics
+
+Profiling is off unless FORECAST_PROFILE lists 'cprofile' and/or 'tracemalloc';
+`profile(name)` then writes `<name>-<timestamp>.prof` to FORECAST_PROFILE_DIR (default
+'profiles') and records the traced memory peak.
+"""
+import contextvars
+import functools
+import itertools
+import json
+import logging
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+logger = logging.getLogger('forecast.perf')
+
+PREFIX = 'forecast'
+DEFAULT_BUCKETS = (1, 8, 32, 128, 512, 1024, 4096, math.inf)
+
+_current_trace = contextvars.ContextVar('forecast_trace', default=None)
+# Time spent in spans nested inside the innermost open span of this context
+_open_span = contextvars.ContextVar('forecast_open_span', default=None)
+# Numbers the .prof files of this process, so blocks profiled in the same millisecond never share a name
+_profile_counter = itertools.count(1)
+
+
+class Registry:
+    """Thread-safe store of span timings, counters, gauges and histograms."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.spans = {}        # name -> [count, total_seconds, max_seconds, self_seconds]
+        self.counters = {}     # (name, labels) -> value
+        self.gauges = {}       # (name, labels) -> value
+        self.histograms = {}   # name -> (buckets, bucket_counts, count, total)
+
+    def record_span(self, name, seconds, self_seconds=None):
+        with self._lock:
+            stats = self.spans.setdefault(name, [0, 0.0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += seconds
+            stats[2] = max(stats[2], seconds)
+            stats[3] += seconds if self_seconds is None else self_seconds
+
+    def incr(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set_gauge(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.gauges[key] = value
+
+    def observe(self, name, value, buckets=DEFAULT_BUCKETS):
+        with self._lock:
+            if name not in self.histograms:
+                self.histograms[name] = (tuple(buckets), [0] * len(buckets), 0, 0.0)
+            bounds, counts, count, total = self.histograms[name]
+            for i, bound in enumerate(bounds):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self.histograms[name] = (bounds, counts, count + 1, total + value)
+
+    def reset(self):
+        with self._lock:
+            self.spans.clear()
+            self.counters.clear()
+            self.gauges.clear()
+            self.histograms.clear()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'spans': {k: list(v) for k, v in self.spans.items()},
+                'counters': dict(self.counters),
+                'gauges': dict(self.gauges),
+                'histograms': {k: (b, list(c), n, t) for k, (b, c, n, t) in self.histograms.items()},
+            }
+
+
+REGISTRY = Registry()
+
+
+class Trace:
+    """Spans recorded while the trace is active, in completion order."""
+
+    def __init__(self, name):
+        self.name = name
+        self.spans = []   # (name, seconds, self_seconds)
+        self.seconds = 0.0
+
+    def breakdown(self):
+        """Rows of (span, calls, total_ms, self_ms, share of the trace by self time), largest self time first."""
+        totals = {}
+        for name, seconds, self_seconds in self.spans:
+            calls, total, own = totals.get(name, (0, 0.0, 0.0))
+            totals[name] = (calls + 1, total + seconds, own + self_seconds)
+        rows = [
+            (name, calls, total * 1000, own * 1000, own / self.seconds if self.seconds else 0.0)
+            for name, (calls, total, own) in totals.items()
+        ]
+        return sorted(rows, key=lambda row: row[3], reverse=True)
+
+
+@contextmanager
+def trace(name):
+    """Collect the spans of one unit of work (e.g. a dashboard rerun)."""
+    current = Trace(name)
+    token = _current_trace.set(current)
+    started = time.perf_counter()
+    try:
+        yield current
+    finally:
+        current.seconds = time.perf_counter() - started
+        _current_trace.reset(token)
+        REGISTRY.record_span(name, current.seconds)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps({
+                'event': 'trace', 'trace': name, 'ms': round(current.seconds * 1000, 3),
+                'spans': {row[0]: round(row[2], 3) for row in current.breakdown()},
+            }))
+
+
+@contextmanager
+def span(name):
+    """Time the enclosed block under `name` (self time excludes spans nested inside it)."""
+    parent = _open_span.get()
+    nested = [0.0]
+    token = _open_span.set(nested)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - started
+        _open_span.reset(token)
+        if parent is not None:
+            parent[0] += seconds
+        self_seconds = max(seconds - nested[0], 0.0)
+        REGISTRY.record_span(name, seconds, self_seconds)
+        current = _current_trace.get()
+        if current is not None:
+            current.spans.append((name, seconds, self_seconds))
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(json.dumps({'event': 'span', 'span': name, 'ms': round(seconds * 1000, 3)}))
+
+
+def timed(name=None):
+    """Decorator form of `span`; the span name defaults to module.function."""
+    def decorate(fn):
+        span_name = name or f"{fn.__module__}.{fn.__qualname__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def incr(name, value=1, **labels):
+    REGISTRY.incr(name, value, **labels)
+
+
+def set_gauge(name, value, **labels):
+    REGISTRY.set_gauge(name, value, **labels)
+
+
+def observe(name, value, buckets=DEFAULT_BUCKETS):
+    REGISTRY.observe(name, value, buckets)
+
+
+def _escape(value):
+    """Label value escaped for the text format: backslash, double quote and newline."""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(pairs):
+    if not pairs:
+        return ''
+    inner = ','.join(f'{k}="{_escape(v)}"' for k, v in pairs)
+    return '{' + inner + '}'
+
+
+def prometheus_text(registry=REGISTRY):
+    """Registry contents in the Prometheus text exposition format."""
+    snap = registry.snapshot()
+    lines = []
+    if snap['spans']:
+        lines.append(f"# TYPE {PREFIX}_span_seconds summary")
+        for name, (count, total, _, _) in sorted(snap['spans'].items()):
+            lines.append(f'{PREFIX}_span_seconds_count{_labels([("span", name)])} {count}')
+            lines.append(f'{PREFIX}_span_seconds_sum{_labels([("span", name)])} {total:.6f}')
+        lines.append(f"# TYPE {PREFIX}_span_seconds_max gauge")
+        for name, (_, _, longest, _) in sorted(snap['spans'].items()):
+            lines.append(f'{PREFIX}_span_seconds_max{_labels([("span", name)])} {longest:.6f}')
+        lines.append(f"# TYPE {PREFIX}_span_self_seconds counter")
+        for name, (_, _, _, own) in sorted(snap['spans'].items()):
+            lines.append(f'{PREFIX}_span_self_seconds{_labels([("span", name)])} {own:.6f}')
+    for kind, values in (('counter', snap['counters']), ('gauge', snap['gauges'])):
+        seen = set()
+        for (name, labels), value in sorted(values.items()):
+            if name not in seen:
+                lines.append(f"# TYPE {PREFIX}_{name} {kind}")
+                seen.add(name)
+            lines.append(f"{PREFIX}_{name}{_labels(labels)} {value}")
+    for name, (bounds, counts, count, total) in sorted(snap['histograms'].items()):
+        lines.append(f"# TYPE {PREFIX}_{name} histogram")
+        cumulative = 0
+        for bound, bucket_count in zip(bounds, counts):
+            cumulative += bucket_count
+            le = '+Inf' if math.isinf(bound) else f"{bound:g}"
+            lines.append(f'{PREFIX}_{name}_bucket{{le="{le}"}} {cumulative}')
+        lines.append(f"{PREFIX}_{name}_count {count}")
+        lines.append(f"{PREFIX}_{name}_sum {total:g}")
+    return '\n'.join(lines) + '\n'
+
+
+def write_prometheus(path, registry=REGISTRY):
+    """Write `prometheus_text()` to `path` atomically (for a node_exporter textfile collector)."""
+    path = Path(path)
+    tmp_path = path.with_name(path.name + '.tmp')
+    tmp_path.write_text(prometheus_text(registry))
+    os.replace(tmp_path, path)
+
+
+def profiling_modes():
+    modes = os.environ.get('FORECAST_PROFILE', '')
+    return {m.strip().lower() for m in modes.split(',') if m.strip()}
+
+
+@contextmanager
+def profile(name):
+    """cProfile and/or tracemalloc the enclosed block when FORECAST_PROFILE asks for it.
+
+    Yields a dict that is filled with 'prof_path' and/or 'peak_mb' on exit.
+    """
+    modes = profiling_modes()
+    result = {}
+    profiler = None
+    tracing = False
+    if 'tracemalloc' in modes:
+        import tracemalloc
+        tracing = not tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.start()
+    if 'cprofile' in modes:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        yield result
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            out_dir = Path(os.environ.get('FORECAST_PROFILE_DIR', 'profiles'))
+            out_dir.mkdir(parents=True, exist_ok=True)
+            now = time.time()
+            stamp = f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(now))}-{int(now * 1000) % 1000:03d}"
+            result['prof_path'] = str(out_dir / f"{name}-{stamp}-{os.getpid()}-{next(_profile_counter)}.prof")
+            profiler.dump_stats(result['prof_path'])
+        if tracing:
+            import tracemalloc
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            result['peak_mb'] = peak / 2**20
+            set_gauge('profile_peak_bytes', peak, block=name)
+        if result:
+            logger.info(json.dumps({'event': 'profile', 'block': name, **result}))
+
+
+def configure_logging():
+    """Attach a stderr handler to the perf logger when FORECAST_PERF_LOG names a level."""
+    level = os.environ.get('FORECAST_PERF_LOG')
+    if not level or logger.handlers:
+        return
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(level.upper())
+    logger.propagate = False
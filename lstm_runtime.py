@@ -0,0 +1,277 @@
+"""Lean NumPy inference runtime for the Keras LSTM forecaster.
+
+`model.predict` / `predict_on_batch` go through the full Keras call stack, which costs
+far more than the arithmetic for the small (N, 1, 43) inputs the app produces. The
+export step copies the layer weights of `model_lstm_100_100_1.keras` into a `.npz` file;
+`NumpyLSTMModel` replays the LSTM + Dense stack with plain matrix products and needs
+neither TensorFlow at runtime nor any warm-up.
+
+The backend used by the dashboard, batch job and HTTP service is chosen with
+`load_inference_model(path, backend)`; `backend` defaults to the FORECAST_BACKEND
+environment variable ('numpy' or 'keras', default 'numpy').
+
+Example:
+    python lstm_runtime.py export              # write model_lstm_100_100_1.npz
+    python lstm_runtime.py check --rows 2048   # fail if the .npz is stale, compare against Keras
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+
+BASE = Path(__file__).parent
+MODEL_PATH = BASE / 'model_lstm_100_100_1.keras'
+
+BACKENDS = ('numpy', 'keras')
+DEFAULT_BACKEND = 'numpy'
+PARITY_ATOL = 1e-3
+PARITY_RTOL = 1e-4
+# Bumped when the exported meta changes, so stale exports are regenerated
+EXPORT_FORMAT = 2
+
+
+def _sigmoid(x):
+    # Clipping keeps exp() finite in float32; sigmoid is saturated well before +-60
+    return 1.0 / (1.0 + np.exp(-np.clip(x, -60.0, 60.0)))
+
+
+ACTIVATIONS = {
+    'linear': lambda x: x,
+    'relu': lambda x: np.maximum(x, 0.0),
+    'tanh': np.tanh,
+    'sigmoid': _sigmoid,
+}
+
+
+def _file_sha256(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def exported_path(model_path):
+    """Default location of the exported weights: next to the Keras file, `.npz` suffix."""
+    return Path(model_path).with_suffix('.npz')
+
+
+def export_numpy_model(model_path=MODEL_PATH, npz_path=None, model=None):
+    """Copy the weights of a Sequential LSTM/Dense Keras model to an `.npz` file.
+
+    Pass an already loaded `model` to skip loading it again. Raises ValueError for
+    layer types or activations the NumPy runtime does not implement.
+    """
+    model_path = Path(model_path)
+    npz_path = Path(npz_path) if npz_path else exported_path(model_path)
+    if model is None:
+        import tensorflow as tf
+        model = tf.keras.models.load_model(str(model_path))
+
+    layers, arrays = [], {}
+    for i, layer in enumerate(model.layers):
+        config = layer.get_config()
+        kind = type(layer).__name__
+        if kind == 'LSTM':
+            spec = {
+                'kind': 'lstm',
+                'activation': config['activation'],
+                'recurrent_activation': config['recurrent_activation'],
+                'return_sequences': config['return_sequences'],
+            }
+            names = ('kernel', 'recurrent_kernel', 'bias')
+        elif kind == 'Dense':
+            spec = {'kind': 'dense', 'activation': config['activation']}
+            names = ('kernel', 'bias')
+        elif kind in ('InputLayer', 'Dropout'):
+            continue
+        else:
+            raise ValueError(f"layer {layer.name} ({kind}) is not supported by the NumPy runtime")
+        for key in ('activation', 'recurrent_activation'):
+            if key in spec and spec[key] not in ACTIVATIONS:
+                raise ValueError(f"activation {spec[key]!r} of layer {layer.name} is not supported")
+        weights = layer.get_weights()
+        if len(weights) != len(names):
+            raise ValueError(f"layer {layer.name} must use a bias")
+        for name, w in zip(names, weights):
+            arrays[f"{i}_{name}"] = np.asarray(w, dtype=np.float32)
+        spec['prefix'] = str(i)
+        layers.append(spec)
+
+    timesteps = model.input_shape[1] if len(model.input_shape) == 3 else None
+    meta = {
+        'format': EXPORT_FORMAT,
+        'layers': layers,
+        'input_features': int(model.input_shape[-1]),
+        # Timesteps the model was built for (None: any length)
+        'timesteps': None if timesteps is None else int(timesteps),
+        'source_sha256': _file_sha256(model_path) if model_path.exists() else None,
+    }
+    tmp_path = npz_path.with_name(npz_path.name + '.tmp.npz')
+    np.savez(tmp_path, meta=np.array(json.dumps(meta)), **arrays)
+    os.replace(tmp_path, npz_path)
+    return npz_path
+
+
+class NumpyLSTMModel:
+    """Forward pass of an exported LSTM/Dense stack, mirroring the Keras call interface.
+
+    Gate order and equations follow Keras: z = x W + h U + b split into (i, f, c, o);
+    c' = f * c + i * act(z_c); h' = o * act(c').
+    """
+
+    def __init__(self, npz_path):
+        with np.load(npz_path) as data:
+            meta = json.loads(str(data['meta']))
+            self.layers = []
+            for spec in meta['layers']:
+                prefix = spec['prefix']
+                params = {k[len(prefix) + 1:]: data[k] for k in data.files if k.startswith(prefix + '_')}
+                self.layers.append((spec, params))
+        self.meta = meta
+        self.input_shape = (None, meta.get('timesteps'), meta['input_features'])
+
+    @staticmethod
+    def _cell(z, c, spec, units):
+        act = ACTIVATIONS[spec['activation']]
+        recurrent_act = ACTIVATIONS[spec['recurrent_activation']]
+        i = recurrent_act(z[:, :units])
+        f = recurrent_act(z[:, units:2 * units])
+        c = f * c + i * act(z[:, 2 * units:3 * units])
+        o = recurrent_act(z[:, 3 * units:])
+        return o * act(c), c
+
+    def _lstm(self, x, spec, params):
+        kernel, recurrent, bias = params['kernel'], params['recurrent_kernel'], params['bias']
+        units = recurrent.shape[0]
+        n, steps, _ = x.shape
+        # Input projections for all timesteps in one matmul
+        projected = (x.reshape(n * steps, -1) @ kernel + bias).reshape(n, steps, 4 * units)
+        h = np.zeros((n, units), dtype=np.float32)
+        c = np.zeros((n, units), dtype=np.float32)
+        outputs = []
+        for t in range(steps):
+            z = projected[:, t] if t == 0 else projected[:, t] + h @ recurrent
+            h, c = self._cell(z, c, spec, units)
+            if spec['return_sequences']:
+                outputs.append(h)
+        return np.stack(outputs, axis=1) if spec['return_sequences'] else h
+
+    def _single_lstm(self):
+        kinds = [spec['kind'] for spec, _ in self.layers]
+        if kinds.count('lstm') != 1 or kinds[0] != 'lstm':
+            raise ValueError('stateful stepping needs a model with one leading LSTM layer')
+        return self.layers[0]
+
+    @property
+    def state_units(self):
+        """Width of the hidden/cell state of the model's LSTM layer."""
+        _, params = self._single_lstm()
+        return params['recurrent_kernel'].shape[0]
+
+    def step(self, x, h, c):
+        """Advance the LSTM by one timestep: x (N, F), h and c (N, units) -> new (h, c)."""
+        spec, params = self._single_lstm()
+        z = np.asarray(x, dtype=np.float32) @ params['kernel'] + h @ params['recurrent_kernel'] + params['bias']
+        return self._cell(z, c, spec, params['recurrent_kernel'].shape[0])
+
+    def head(self, h):
+        """Predictions from LSTM hidden states (N, units), i.e. the layers after the LSTM."""
+        self._single_lstm()
+        out = h
+        for spec, params in self.layers[1:]:
+            out = ACTIVATIONS[spec['activation']](out @ params['kernel'] + params['bias'])
+        return out
+
+    def predict_on_batch(self, X):
+        out = np.asarray(X, dtype=np.float32)
+        for spec, params in self.layers:
+            if spec['kind'] == 'lstm':
+                out = self._lstm(out, spec, params)
+            else:
+                out = ACTIVATIONS[spec['activation']](out @ params['kernel'] + params['bias'])
+        return out
+
+    def predict(self, X, verbose=0, batch_size=None):
+        return self.predict_on_batch(X)
+
+
+def _export_is_current(model_path, npz_path):
+    if not npz_path.exists():
+        return False
+    try:
+        with np.load(npz_path) as data:
+            meta = json.loads(str(data['meta']))
+    except (OSError, ValueError, KeyError):
+        return False
+    return meta.get('format') == EXPORT_FORMAT and meta.get('source_sha256') == _file_sha256(model_path)
+
+
+def load_inference_model(model_path=MODEL_PATH, backend=None):
+    """Model object exposing `predict_on_batch` for the chosen backend.
+
+    'numpy' uses the exported `.npz` next to `model_path`, (re)exporting it first when
+    it is missing or was exported from a different Keras file; 'keras' loads the Keras model itself.
+    """
+    backend = backend or os.environ.get('FORECAST_BACKEND', DEFAULT_BACKEND)
+    if backend not in BACKENDS:
+        raise ValueError(f"unknown inference backend {backend!r}; expected one of {BACKENDS}")
+    model_path = Path(model_path)
+    if backend == 'numpy':
+        npz_path = exported_path(model_path)
+        if not _export_is_current(model_path, npz_path):
+            export_numpy_model(model_path, npz_path)
+        return NumpyLSTMModel(npz_path)
+    import tensorflow as tf
+    return tf.keras.models.load_model(str(model_path))
+
+
+def check_parity(model_path=MODEL_PATH, rows=1024, timesteps=(1, 10), seed=0):
+    """Compare NumPy runtime and Keras outputs on random inputs.
+
+    Returns a list of (timesteps, max_abs_diff, keras_seconds, numpy_seconds); raises
+    AssertionError if any output differs beyond PARITY_ATOL / PARITY_RTOL.
+    """
+    import tensorflow as tf
+    keras_model = tf.keras.models.load_model(str(model_path))
+    fast_model = load_inference_model(model_path, 'numpy')
+    rng = np.random.default_rng(seed)
+    features = keras_model.input_shape[-1]
+    results = []
+    for steps in timesteps:
+        X = rng.normal(size=(rows, steps, features)).astype(np.float32)
+        keras_model.predict_on_batch(X[:1])
+        started = time.perf_counter()
+        expected = np.asarray(keras_model.predict_on_batch(X))
+        keras_s = time.perf_counter() - started
+        started = time.perf_counter()
+        actual = fast_model.predict_on_batch(X)
+        numpy_s = time.perf_counter() - started
+        np.testing.assert_allclose(actual, expected, rtol=PARITY_RTOL, atol=PARITY_ATOL)
+        results.append((steps, float(np.max(np.abs(actual - expected))), keras_s, numpy_s))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export the Keras model to the NumPy runtime')
+    parser.add_argument('command', choices=['export', 'check'])
+    parser.add_argument('--model', default=str(MODEL_PATH), help='Keras model file')
+    parser.add_argument('--output', default=None, help='.npz path (default: next to the model)')
+    parser.add_argument('--rows', type=int, default=1024, help='rows per parity batch')
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        print('Exported to', export_numpy_model(args.model, args.output))
+        return
+    npz_path = Path(args.output) if args.output else exported_path(args.model)
+    if not _export_is_current(Path(args.model), npz_path):
+        raise SystemExit(f"{npz_path} is missing or stale for {args.model}; run `python lstm_runtime.py export`")
+    for steps, diff, keras_s, numpy_s in check_parity(args.model, args.rows):
+        print(f"timesteps={steps}: max abs diff {diff:.2e}, keras {keras_s * 1000:.1f}ms, "
+              f"numpy {numpy_s * 1000:.1f}ms")
+    print('Parity OK')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""Fleet-wide reorder suggestions for every partition (e.g. product x store) in one pass."""
+import numpy as np
+import pandas as pd
+
+# (inventory / reorder point below, urgency label, color); anything above the last is LOW
+URGENCY_TIERS = [
+    (0.5, "🔴 CRITICAL - Order Immediately", "red"),
+    (1.0, "🟡 HIGH - Order Within 2-3 Days", "orange"),
+    (1.5, "🟢 MEDIUM - Plan to Order Soon", "green"),
+]
+LOW_URGENCY = ("🟢 LOW - Stock Adequate", "green")
+
+MIN_ORDER_QUANTITY = 50
+
+
+def fleet_reorder_suggestions(store, forecast_14=None, min_stock=20, lead_time=7):
+    """Reorder metrics for every partition of a `datastore.PartitionedStore`, ranked by urgency.
+
+    Uses the same rules as the dashboard's single-product engine: safety stock is two days
+    of average sales, the reorder point covers `lead_time` days plus safety stock, and the
+    order quantity is 1.5x the 14-day forecast (at least MIN_ORDER_QUANTITY).
+    All metrics come from `np.add.reduceat` and last-row gathers over the store's
+    contiguous partitions, so there is no per-partition Python work.
+
+    - forecast_14: optional Series of 14-day forecast totals indexed by partition key
+      (MultiIndex for multi-key stores). Partitions without a forecast use 14 days of
+      their average sales.
+    Returns a DataFrame with one row per partition, most urgent first.
+    """
+    starts, stops = store.boundaries()
+    keys = store.partition_keys()
+    frame = store.frame
+    if len(keys) == 0:
+        return pd.DataFrame()
+
+    last = stops - 1
+    counts = stops - starts
+    units_sold = frame['Units Sold'].to_numpy(dtype=np.float64)
+    current_inventory = frame['Inventory Level'].to_numpy(dtype=np.float64)[last]
+    current_price = frame['Price'].to_numpy(dtype=np.float64)[last]
+    daily_avg = np.add.reduceat(units_sold, starts) / counts
+
+    if len(store.keys) == 1:
+        index = pd.Index(keys, name=store.keys[0])
+    else:
+        index = pd.MultiIndex.from_tuples(keys, names=store.keys)
+
+    return _rank_suggestions(index, current_inventory, current_price, daily_avg, forecast_14,
+                             min_stock, lead_time)
+
+
+def _rank_suggestions(index, current_inventory, current_price, daily_avg, forecast_14, min_stock, lead_time):
+    """Apply the reorder rules to per-partition arrays aligned with `index`; most urgent first."""
+    horizon_14 = daily_avg * 14
+    if forecast_14 is not None:
+        aligned = pd.Series(forecast_14).reindex(index).to_numpy(dtype=np.float64)
+        horizon_14 = np.where(np.isnan(aligned), horizon_14, aligned)
+
+    safety_stock = daily_avg * 2
+    reorder_point = daily_avg * lead_time + safety_stock
+    reorder_quantity = np.maximum(horizon_14 * 1.5, MIN_ORDER_QUANTITY)
+
+    conditions = [current_inventory < reorder_point * ratio for ratio, _, _ in URGENCY_TIERS]
+    tier = np.select(conditions, np.arange(len(URGENCY_TIERS)), default=len(URGENCY_TIERS))
+    labels = np.array([label for _, label, _ in URGENCY_TIERS] + [LOW_URGENCY[0]], dtype=object)
+    colors = np.array([color for _, _, color in URGENCY_TIERS] + [LOW_URGENCY[1]], dtype=object)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        coverage = np.where(reorder_point > 0, current_inventory / reorder_point, np.inf)
+
+    result = pd.DataFrame({
+        'current_inventory': current_inventory,
+        'reorder_point': reorder_point,
+        'reorder_quantity': reorder_quantity,
+        'urgency': labels[tier],
+        'color': colors[tier],
+        'estimated_cost': reorder_quantity * current_price,
+        'safety_stock': safety_stock,
+        'daily_avg': daily_avg,
+        'forecast_14': horizon_14,
+        'below_min_stock': current_inventory < min_stock,
+        'tier': tier,
+        'coverage': coverage,
+    }, index=index)
+    result = result.sort_values(['tier', 'coverage', 'estimated_cost'], ascending=[True, True, False], kind='stable')
+    result.insert(0, 'rank', np.arange(1, len(result) + 1))
+    return result.reset_index()
+
+
+def rollup_reorder_suggestions(cube, level, forecast_14=None, min_stock=20, lead_time=7):
+    """Reorder metrics per member of a `rollup.RollupCube` level (e.g. every store or region).
+
+    Daily average sales, current inventory and price come from the cube's daily sums
+    (`RollupCube.summary`), so no raw rows are scanned; the rules are the same as
+    `fleet_reorder_suggestions`.
+    """
+    summary = cube.summary(level)
+    if summary.empty:
+        return pd.DataFrame()
+    return _rank_suggestions(
+        summary.index,
+        summary['current_inventory'].to_numpy(dtype=np.float64),
+        summary['current_price'].to_numpy(dtype=np.float64),
+        summary['daily_avg'].to_numpy(dtype=np.float64),
+        forecast_14, min_stock, lead_time,
+    )
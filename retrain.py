@@ -0,0 +1,260 @@
+"""Retrain the LSTM on the full history without loading it into memory.
+
+Training windows come from the memory-mapped `feature_store` (same features and scaler
+as inference) and are fed to Keras through a `tf.data` pipeline: partitions are split
+into shards whose generators run interleaved in parallel, and batches are prefetched
+while the previous step trains. Memory use depends on the batch size and prefetch
+depth, not on the length of the history.
+
+Each run writes a new versioned model to models/ (`model_lstm_v003.keras` plus a
+`.json` with its metrics) and points models/LATEST at it; `latest_model_path()` is what
+the dashboard loads. `RetrainJob` runs the same pipeline on a background thread.
+
+Example:
+    python retrain.py --epochs 5 --batch-size 256 --lookback 10
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+from feature_store import open_feature_store
+
+BASE = Path(__file__).parent
+MODEL_PATH = BASE / 'model_lstm_100_100_1.keras'
+DATA_PATH = BASE / 'retail_store_inventory.csv'
+MODELS_DIR = BASE / 'models'
+LATEST_FILE = 'LATEST'
+
+
+def latest_model_path(models_dir=MODELS_DIR, default=MODEL_PATH):
+    """Path of the most recent retrained model, or `default` if there is none."""
+    latest = Path(models_dir) / LATEST_FILE
+    if latest.exists():
+        candidate = Path(models_dir) / latest.read_text().strip()
+        if candidate.exists():
+            return candidate
+    return Path(default)
+
+
+def next_model_path(models_dir=MODELS_DIR):
+    versions = [int(p.stem.rsplit('_v', 1)[1]) for p in Path(models_dir).glob('model_lstm_v*.keras')
+                if p.stem.rsplit('_v', 1)[1].isdigit()]
+    return Path(models_dir) / f"model_lstm_v{max(versions, default=0) + 1:03d}.keras"
+
+
+def _split_windows(n_windows, val_frac):
+    # Chronological split per partition: the last `val_frac` of windows validate
+    n_val = int(round(n_windows * val_frac))
+    return (0, n_windows - n_val), (n_windows - n_val, n_windows)
+
+
+def make_datasets(store, lookback=10, batch_size=256, val_frac=0.2, shards=4, seed=0, timesteps=None):
+    """(train, validation) tf.data pipelines streaming windows out of a FeatureStore.
+
+    Partitions are dealt round-robin into `shards`; each shard is a generator slicing
+    windows (views of the mapped arrays) into batches, and the shards are interleaved
+    with parallel calls. Train shards visit their partitions in a new random order
+    every epoch. Each example is the trailing `timesteps` rows (default: all `lookback`)
+    of its window, the rows `forecasting.model_timesteps` feeds the model at inference.
+    """
+    import tensorflow as tf
+
+    keys = store.partition_keys()
+    shards = max(1, min(shards, len(keys)))
+    num_features = len(store.feature_columns)
+    timesteps = lookback if timesteps is None else timesteps
+    signature = (
+        tf.TensorSpec(shape=(None, timesteps, num_features), dtype=tf.float32),
+        tf.TensorSpec(shape=(None,), dtype=tf.float32),
+    )
+    epoch_counter = {'train': 0}
+
+    def generator(shard, validation):
+        shard_keys = keys[int(shard)::shards]
+        if not validation:
+            epoch_counter['train'] += 1
+            rng = np.random.default_rng(seed + epoch_counter['train'] * shards + int(shard))
+            shard_keys = [shard_keys[i] for i in rng.permutation(len(shard_keys))]
+        for key in shard_keys:
+            X, y = store.windows(key, lookback)
+            train, val = _split_windows(len(X), val_frac)
+            start, stop = val if validation else train
+            for s in range(start, stop, batch_size):
+                e = min(s + batch_size, stop)
+                yield np.ascontiguousarray(X[s:e, lookback - timesteps:]), np.asarray(y[s:e])
+
+    def batches(validation):
+        total = 0
+        for key in keys:
+            start, stop = _split_windows(len(store.windows(key, lookback)[0]), val_frac)[validation]
+            total += -(-(stop - start) // batch_size)
+        return total
+
+    def pipeline(validation):
+        return (
+            tf.data.Dataset.range(shards)
+            .interleave(
+                lambda shard: tf.data.Dataset.from_generator(
+                    generator, args=(shard, validation), output_signature=signature),
+                cycle_length=shards,
+                num_parallel_calls=tf.data.AUTOTUNE,
+                deterministic=validation,
+            )
+            # Known length lets Keras size each epoch instead of probing for the end
+            .apply(tf.data.experimental.assert_cardinality(batches(validation)))
+            .prefetch(tf.data.AUTOTUNE)
+        )
+
+    return pipeline(False), pipeline(True)
+
+
+def build_model(num_features, timesteps, units=100):
+    """Same architecture as the shipped model, taking `timesteps` rows per input."""
+    import tensorflow as tf
+    model = tf.keras.Sequential([
+        tf.keras.layers.Input(shape=(timesteps, num_features)),
+        tf.keras.layers.LSTM(units, activation='relu'),
+        tf.keras.layers.Dense(units, activation='relu'),
+        tf.keras.layers.Dense(1),
+    ])
+    model.compile(optimizer='adam', loss='mse')
+    return model
+
+
+def retrain(data_path=DATA_PATH, base_model=None, models_dir=MODELS_DIR, epochs=5, batch_size=256,
+            lookback=10, val_frac=0.2, shards=4, learning_rate=1e-3, from_scratch=False, progress=None):
+    """Fine-tune (or train from scratch) on every window of the data; returns the new model path.
+
+    `base_model` defaults to the latest model. A fine-tuned model keeps the input shape it
+    was trained with, so it is trained on the trailing `model_timesteps` rows of each
+    window (one for the shipped model), as it is fed at inference; a model trained from
+    scratch takes the whole `lookback`. `progress(epoch, logs)` is called after every epoch. The model is saved as the next version in `models_dir` and LATEST
+    is updated only once the file is completely written.
+    """
+    import tensorflow as tf
+
+    from forecasting import model_timesteps
+
+    store = open_feature_store(str(data_path))
+    num_features = len(store.feature_columns)
+    base_model = Path(base_model) if base_model else latest_model_path(models_dir)
+    if from_scratch:
+        model = build_model(num_features, lookback)
+    else:
+        model = tf.keras.models.load_model(str(base_model))
+        if model.input_shape[-1] != num_features:
+            raise ValueError(f"{base_model} expects {model.input_shape[-1]} features, "
+                             f"the data produces {num_features}; use from_scratch=True")
+    model.compile(optimizer=tf.keras.optimizers.Adam(learning_rate), loss='mse')
+    timesteps = model_timesteps(model, lookback)
+
+    train_ds, val_ds = make_datasets(store, lookback, batch_size, val_frac, shards, timesteps=timesteps)
+    callbacks = []
+    if progress is not None:
+        callbacks.append(tf.keras.callbacks.LambdaCallback(
+            on_epoch_end=lambda epoch, logs: progress(epoch + 1, dict(logs or {}))))
+    started = time.perf_counter()
+    history = model.fit(train_ds, validation_data=val_ds if val_frac > 0 else None,
+                        epochs=epochs, callbacks=callbacks, shuffle=False, verbose=0)
+
+    models_dir = Path(models_dir)
+    models_dir.mkdir(parents=True, exist_ok=True)
+    path = next_model_path(models_dir)
+    tmp_path = path.with_name(path.stem + '.tmp.keras')
+    model.save(tmp_path)
+    os.replace(tmp_path, path)
+
+    metadata = {
+        'model': path.name,
+        'base_model': None if from_scratch else str(base_model),
+        'data': str(data_path),
+        'source': store.index['source'],
+        'epochs': epochs,
+        'batch_size': batch_size,
+        'lookback': lookback,
+        'timesteps': timesteps,
+        'learning_rate': learning_rate,
+        'history': {k: [float(v) for v in values] for k, values in history.history.items()},
+        'train_seconds': time.perf_counter() - started,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+    with open(path.with_suffix('.json'), 'w') as f:
+        json.dump(metadata, f, indent=2)
+    tmp_latest = models_dir / (LATEST_FILE + '.tmp')
+    tmp_latest.write_text(path.name)
+    os.replace(tmp_latest, models_dir / LATEST_FILE)
+    return path
+
+
+class RetrainJob:
+    """`retrain()` on a background thread, with status fields a UI can poll."""
+
+    def __init__(self, **retrain_kwargs):
+        self.retrain_kwargs = retrain_kwargs
+        self.state = 'pending'
+        self.epoch = 0
+        self.epochs = retrain_kwargs.get('epochs', 5)
+        self.logs = {}
+        self.result = None
+        self.error = None
+        self.started = None
+        self.finished = None
+        self._thread = threading.Thread(target=self._run, name='retrain', daemon=True)
+
+    def start(self):
+        self.started = time.time()
+        self.state = 'running'
+        self._thread.start()
+        return self
+
+    def _progress(self, epoch, logs):
+        self.epoch = epoch
+        self.logs = logs
+
+    def _run(self):
+        try:
+            self.result = retrain(progress=self._progress, **self.retrain_kwargs)
+            self.state = 'done'
+        except Exception as e:
+            self.error = str(e)
+            self.state = 'failed'
+        finally:
+            self.finished = time.time()
+
+    @property
+    def running(self):
+        return self.state == 'running'
+
+    def join(self, timeout=None):
+        self._thread.join(timeout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Retrain the LSTM from a streamed feature store')
+    parser.add_argument('--data', default=str(DATA_PATH), help='inventory CSV')
+    parser.add_argument('--base-model', default=None, help='model to fine-tune (default: latest)')
+    parser.add_argument('--models-dir', default=str(MODELS_DIR))
+    parser.add_argument('--epochs', type=int, default=5)
+    parser.add_argument('--batch-size', type=int, default=256)
+    parser.add_argument('--lookback', type=int, default=10)
+    parser.add_argument('--val-frac', type=float, default=0.2, help='last fraction of each history to validate on')
+    parser.add_argument('--shards', type=int, default=4, help='generators interleaved in parallel')
+    parser.add_argument('--learning-rate', type=float, default=1e-3)
+    parser.add_argument('--from-scratch', action='store_true', help='start from fresh weights')
+    args = parser.parse_args()
+
+    def report(epoch, logs):
+        print(f"epoch {epoch}/{args.epochs}: " + ', '.join(f"{k}={v:.4f}" for k, v in logs.items()))
+
+    path = retrain(args.data, args.base_model, args.models_dir, args.epochs, args.batch_size, args.lookback,
+                   args.val_frac, args.shards, args.learning_rate, args.from_scratch, report)
+    print('Saved', path)
+
+
+if __name__ == '__main__':
+    main()
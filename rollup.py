@@ -0,0 +1,257 @@
+"""Pre-aggregated daily rollups of the inventory data by product, store, region and category.
+
+For every level in LEVELS the cube holds one row per (Date, level keys) with the sums
+of MEASURES and the number of raw rows they cover, so daily sums and means at any level
+are a slice of a small table instead of a groupby over the full data. Each level is
+stored columnar in `<csv stem>.rollup/<level>.npz` (one array per column) next to an
+index.json with the source CSV fingerprint.
+
+The cube is built in one streaming pass over the CSV. When rows are appended to it,
+`open_rollup` parses only the appended bytes and merges their aggregates into the
+tail of each level (levels are Date-sorted, so only days at or after the first new
+date are regrouped).
+
+Example:
+    python rollup.py build --data retail_store_inventory.csv
+    python rollup.py show --level region --key East
+    python rollup.py show --level region_store --key East,S004
+"""
+import argparse
+import io
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from ingest import DATE_COLUMN, STREAM_SCHEMA, iter_inventory_chunks
+from instrumentation import timed
+from utils import _appended_bytes, combine_digests, file_block_digests
+
+ROLLUP_VERSION = 2
+MEASURES = ['Units Sold', 'Inventory Level', 'Demand Forecast', 'Price']
+ROWS_COLUMN = 'rows'
+# Level name -> grouping columns. Single-column levels are flat; the combined levels
+# drill down the hierarchy (stores within a region, products within a category) and
+# to the product x store grain the reorder engine works at. 'total' is the whole fleet
+# per day. Members of combined levels are tuples in column order.
+LEVELS = {
+    'product': ('Product ID',),
+    'store': ('Store ID',),
+    'region': ('Region',),
+    'category': ('Category',),
+    'region_store': ('Region', 'Store ID'),
+    'category_product': ('Category', 'Product ID'),
+    'product_store': ('Product ID', 'Store ID'),
+    'total': (),
+}
+
+
+def default_rollup_dir(csv_path):
+    """Where the cube for `csv_path` lives by default: `<csv stem>.rollup/` beside it."""
+    csv_path = Path(csv_path)
+    return csv_path.with_name(csv_path.stem + '.rollup')
+
+
+def _source(csv_path):
+    stat = os.stat(csv_path)
+    blocks = file_block_digests(csv_path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'blocks': blocks,
+            'sha256': combine_digests(blocks)}
+
+
+def _aggregate(df, keys):
+    """Daily sums of MEASURES and row counts of `df` grouped by (Date, keys), sorted."""
+    measures = [m for m in MEASURES if m in df.columns]
+    groups = df.groupby([DATE_COLUMN, *keys], sort=True, observed=True)
+    part = groups[measures].sum().astype(np.float64)
+    part[ROWS_COLUMN] = groups.size().astype(np.int64)
+    part = part.reset_index()
+    for key in keys:
+        part[key] = part[key].astype(str)
+    return part
+
+
+def _merge(frame, delta, keys):
+    """Add `delta` aggregates into `frame`; only rows dated at or after delta's first day move."""
+    if frame is None or frame.empty:
+        return delta
+    start = int(np.searchsorted(frame[DATE_COLUMN].to_numpy(), delta[DATE_COLUMN].to_numpy().min(), side='left'))
+    tail = pd.concat([frame.iloc[start:], delta], ignore_index=True)
+    tail = tail.groupby([DATE_COLUMN, *keys], sort=True).sum().reset_index()
+    return pd.concat([frame.iloc[:start], tail], ignore_index=True)
+
+
+class RollupCube:
+    """Daily aggregates per level, held as one small Date-sorted DataFrame per level."""
+
+    def __init__(self, levels=None, source=None):
+        self.levels = levels or {}
+        self.source = source or {}
+        self._positions = {}
+
+    def add(self, df):
+        """Fold raw inventory rows (e.g. a newly appended day) into every level."""
+        df = df.assign(**{DATE_COLUMN: pd.to_datetime(df[DATE_COLUMN])})
+        for level, keys in LEVELS.items():
+            self.levels[level] = _merge(self.levels.get(level), _aggregate(df, keys), keys)
+        self._positions.clear()
+        return self
+
+    def _rows(self, level, key):
+        keys = LEVELS[level]
+        frame = self.levels[level]
+        if not keys:
+            return frame
+        if level not in self._positions:
+            self._positions[level] = frame.groupby(list(keys), sort=True).indices
+        label = key if isinstance(key, tuple) else (key,)
+        positions = self._positions[level].get(label if len(keys) > 1 else label[0])
+        return frame.iloc[positions if positions is not None else []]
+
+    def members(self, level):
+        """Sorted labels of a level (scalars, tuples for combined levels; empty for 'total')."""
+        keys = LEVELS[level]
+        if not keys:
+            return []
+        if level not in self._positions:
+            self._positions[level] = self.levels[level].groupby(list(keys), sort=True).indices
+        return list(self._positions[level])
+
+    def daily(self, level, key=None, stat='sum'):
+        """Date-indexed MEASURES of one member of a level: daily 'sum' or per-row 'mean'."""
+        rows = self._rows(level, key)
+        values = rows[[m for m in MEASURES if m in rows.columns]]
+        if stat == 'mean':
+            values = values.div(rows[ROWS_COLUMN].to_numpy(), axis=0)
+        elif stat != 'sum':
+            raise ValueError(f"stat must be 'sum' or 'mean', got {stat!r}")
+        return values.set_axis(pd.DatetimeIndex(rows[DATE_COLUMN], name=DATE_COLUMN))
+
+    def summary(self, level):
+        """One row per member: mean daily Units Sold, last day's Inventory Level sum and mean Price.
+
+        These are the inputs of the reorder rules, aggregated to the level.
+        """
+        keys = list(LEVELS[level])
+        frame = self.levels[level]
+        if not keys:
+            frame = frame.assign(level='total')
+            keys = ['level']
+        groups = frame.groupby(keys, sort=True)
+        last = groups.tail(1).set_index(keys).sort_index()
+        return pd.DataFrame({
+            'days': groups.size(),
+            'daily_avg': groups['Units Sold'].mean(),
+            'current_inventory': last['Inventory Level'],
+            'current_price': last['Price'] / last[ROWS_COLUMN],
+        })
+
+    def save(self, rollup_dir):
+        """Write each level as a columnar .npz plus index.json, atomically per file."""
+        rollup_dir = Path(rollup_dir)
+        rollup_dir.mkdir(parents=True, exist_ok=True)
+        for level, frame in self.levels.items():
+            columns = {f"col{i}": (frame[c].to_numpy(dtype='datetime64[ns]').astype(np.int64)
+                                   if c == DATE_COLUMN else frame[c].to_numpy())
+                       for i, c in enumerate(frame.columns)}
+            for key in LEVELS[level]:
+                i = frame.columns.get_loc(key)
+                columns[f"col{i}"] = columns[f"col{i}"].astype(str)
+            tmp_path = rollup_dir / f"{level}.tmp.npz"
+            np.savez(tmp_path, **columns)
+            os.replace(tmp_path, rollup_dir / f"{level}.npz")
+        index = {
+            'version': ROLLUP_VERSION,
+            'source': self.source,
+            'levels': {level: list(frame.columns) for level, frame in self.levels.items()},
+        }
+        tmp_index = rollup_dir / 'index.json.tmp'
+        with open(tmp_index, 'w') as f:
+            json.dump(index, f)
+        os.replace(tmp_index, rollup_dir / 'index.json')
+        return rollup_dir
+
+    @classmethod
+    def load(cls, rollup_dir):
+        rollup_dir = Path(rollup_dir)
+        with open(rollup_dir / 'index.json') as f:
+            index = json.load(f)
+        if index.get('version') != ROLLUP_VERSION:
+            raise ValueError(f"{rollup_dir}: unsupported rollup version {index.get('version')}")
+        levels = {}
+        for level, columns in index['levels'].items():
+            with np.load(rollup_dir / f"{level}.npz") as data:
+                frame = pd.DataFrame({c: data[f"col{i}"] for i, c in enumerate(columns)})
+            frame[DATE_COLUMN] = frame[DATE_COLUMN].astype('datetime64[ns]')
+            levels[level] = frame
+        return cls(levels, index['source'])
+
+
+@timed()
+def build_rollup(csv_path='retail_store_inventory.csv', rollup_dir=None, chunksize=500_000):
+    """Aggregate the whole CSV into every level in one streaming pass; returns the cube."""
+    cube = RollupCube(source=_source(csv_path))
+    for chunk in iter_inventory_chunks(csv_path, chunksize,
+                                       usecols=[DATE_COLUMN, *{k for keys in LEVELS.values() for k in keys},
+                                                *MEASURES]):
+        cube.add(chunk)
+    cube.save(Path(rollup_dir) if rollup_dir else default_rollup_dir(csv_path))
+    return cube
+
+
+@timed()
+def open_rollup(csv_path='retail_store_inventory.csv', rollup_dir=None):
+    """Load the cube for `csv_path`, folding in appended rows or rebuilding when it is stale."""
+    rollup_dir = Path(rollup_dir) if rollup_dir else default_rollup_dir(csv_path)
+    try:
+        cube = RollupCube.load(rollup_dir)
+    except (OSError, ValueError, KeyError):
+        return build_rollup(csv_path, rollup_dir)
+    source = cube.source
+    stat = os.stat(csv_path)
+    if source.get('size') == stat.st_size and source.get('mtime_ns') == stat.st_mtime_ns:
+        return cube
+    delta_bytes = _appended_bytes(csv_path, source)
+    if delta_bytes is None:
+        return build_rollup(csv_path, rollup_dir)
+    if delta_bytes.strip():
+        columns = pd.read_csv(csv_path, nrows=0).columns.tolist()
+        delta = pd.read_csv(io.BytesIO(delta_bytes), header=None, names=columns,
+                            dtype={c: t for c, t in STREAM_SCHEMA.items() if c in columns},
+                            parse_dates=[DATE_COLUMN])
+        cube.add(delta)
+    last_block = len(source['blocks']) - 1
+    source['blocks'] = source['blocks'][:last_block] + file_block_digests(csv_path, start_block=last_block)
+    source['sha256'] = combine_digests(source['blocks'])
+    source.update({'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns})
+    cube.save(rollup_dir)
+    return cube
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build or query the daily rollup cube')
+    parser.add_argument('command', choices=['build', 'show'])
+    parser.add_argument('--data', default='retail_store_inventory.csv', help='inventory CSV')
+    parser.add_argument('--out', default=None, help='cube directory (default: <csv stem>.rollup)')
+    parser.add_argument('--level', choices=list(LEVELS), default='total')
+    parser.add_argument('--key', default=None,
+                        help="member of the level, e.g. a Store ID ('East,S004' for combined levels)")
+    parser.add_argument('--stat', choices=['sum', 'mean'], default='sum')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        cube = build_rollup(args.data, args.out)
+        print(', '.join(f"{level}: {len(frame)} rows" for level, frame in cube.levels.items()))
+        return
+    cube = open_rollup(args.data, args.out)
+    if LEVELS[args.level] and args.key is None:
+        print(cube.summary(args.level).to_string())
+    else:
+        key = tuple(args.key.split(',')) if len(LEVELS[args.level]) > 1 else args.key
+        print(cube.daily(args.level, key, args.stat).tail(14).to_string())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,181 @@
+"""What-if sweeps over price, discount, competitor pricing and promotion.
+
+`sweep_scenarios` takes a grid of values per input and a base row per product (the
+product's latest data by default) and scores the full Cartesian product. Each base row
+is encoded once; a chunk of scenarios is then built by gathering base rows and writing
+the swept columns from pre-scaled per-axis grids, all by flat scenario index with
+`np.unravel_index`, so there is no per-scenario Python and memory is bounded by the
+chunk size. Chunks are scored with `predict_on_batch`, optionally on a thread pool
+(the NumPy backend releases the GIL in its matmuls). Keras models are not safe to call
+from several threads, so with them the predictions are serialized and the CLI defaults
+to one worker.
+
+Example:
+    python scenarios.py --price 0.7 1.3 25 --discount 0 5 10 15 20 --holiday 0 1
+"""
+import argparse
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import incr, observe, timed
+from lstm_runtime import DEFAULT_BACKEND, NumpyLSTMModel
+from utils import DEFAULT_BATCH_SIZE
+
+BASE = Path(__file__).parent
+MODEL_PATH = BASE / 'model_lstm_100_100_1.keras'
+DATA_PATH = BASE / 'retail_store_inventory.csv'
+
+# Inputs a sweep can vary, in the order they become columns of the result
+SWEEP_COLUMNS = ('Price', 'Discount', 'Competitor Pricing', 'Holiday/Promotion')
+DEFAULT_CHUNK_SIZE = 8192
+
+
+def latest_rows(store, keys=None):
+    """Last row of every partition of a `datastore.PartitionedStore` (or of `keys`), one gather."""
+    keys = store.partition_keys() if keys is None else list(keys)
+    last = np.array([store.offsets[key][1] - 1 for key in keys], dtype=np.intp)
+    return store.frame.iloc[last].reset_index(drop=True)
+
+
+def _scaled_axis(encoder, column, values, base, relative):
+    """Encoded values of one swept column, shaped (products, grid) or (1, grid)."""
+    values = np.asarray(values, dtype=np.float64)
+    if column in relative:
+        values = base[column].to_numpy(dtype=np.float64)[:, None] * values[None, :]
+    else:
+        values = values[None, :]
+    if column == 'Holiday/Promotion':
+        return (values != 0).astype(np.float32), values
+    i = encoder.numeric_order.index(column)
+    scaler = encoder.scaler
+    mean = scaler.mean_[i] if getattr(scaler, 'mean_', None) is not None else 0.0
+    scale = scaler.scale_[i] if getattr(scaler, 'scale_', None) is not None else 1.0
+    return ((values - mean) / scale).astype(np.float32), values
+
+
+@timed()
+def sweep_scenarios(base, grids, model, encoder, relative=(), key='Product ID', batch_size=DEFAULT_BATCH_SIZE,
+                    chunk_size=DEFAULT_CHUNK_SIZE, workers=1):
+    """Forecast every combination of `grids` for every base row; returns a tidy DataFrame.
+
+    - base: one raw row per product (e.g. `latest_rows(store)`); its other inputs stay fixed
+    - grids: dict of SWEEP_COLUMNS name -> 1-D values; columns not given keep the base value
+    - relative: names in `grids` whose values are multipliers of each product's base value
+      (e.g. {'Price': np.linspace(0.8, 1.2, 9)} with relative=('Price',))
+    - workers: threads scoring chunks concurrently (1 scores inline); only the NumPy
+      runtime predicts concurrently, other models are called one chunk at a time
+    Result columns: `key`, one per swept input (actual raw values), and 'Forecast';
+    rows are ordered product-major, then by the grids in SWEEP_COLUMNS order.
+    """
+    unknown = set(grids) - set(SWEEP_COLUMNS)
+    if unknown:
+        raise ValueError(f"Cannot sweep {sorted(unknown)}; choose from {SWEEP_COLUMNS}")
+    columns = [c for c in SWEEP_COLUMNS if c in grids]
+    relative = set(relative)
+    base = base.reset_index(drop=True)
+    X_base = encoder.encode(base)[:, 0, :]
+
+    axes = []
+    for column in columns:
+        index = (encoder.holiday_index if column == 'Holiday/Promotion' else encoder.column_index.get(column))
+        if index is None:
+            raise ValueError(f"{column} is not a model input")
+        scaled, raw = _scaled_axis(encoder, column, grids[column], base, relative)
+        axes.append((index, scaled, raw))
+    shape = (len(base),) + tuple(scaled.shape[1] for _, scaled, _ in axes)
+    n = int(np.prod(shape))
+    out = np.empty(n, dtype=np.float32)
+    predict_lock = nullcontext() if isinstance(model, NumpyLSTMModel) else threading.Lock()
+
+    def score(start):
+        stop = min(start + chunk_size, n)
+        position = np.unravel_index(np.arange(start, stop), shape)
+        X = X_base[position[0]]
+        for (index, scaled, _), grid_position in zip(axes, position[1:]):
+            X[:, index] = scaled[position[0] if scaled.shape[0] > 1 else 0, grid_position]
+        X = X.reshape(stop - start, 1, -1)
+        for s in range(0, len(X), batch_size):
+            chunk = X[s:s + batch_size]
+            with predict_lock:
+                preds = model.predict_on_batch(chunk)
+            out[start + s:start + s + len(chunk)] = np.asarray(preds).reshape(-1)
+            incr('predict_calls_total')
+            observe('predict_batch_rows', len(chunk))
+
+    starts = range(0, n, chunk_size)
+    if workers > 1:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='scenario') as executor:
+            list(executor.map(score, starts))
+    else:
+        for start in starts:
+            score(start)
+
+    position = np.unravel_index(np.arange(n), shape)
+    result = {key: base[key].to_numpy()[position[0]] if key in base.columns else position[0]}
+    for column, (_, _, raw), grid_position in zip(columns, axes, position[1:]):
+        result[column] = raw[position[0] if raw.shape[0] > 1 else 0, grid_position]
+    result['Forecast'] = out
+    return pd.DataFrame(result)
+
+
+def main():
+    from datastore import PartitionedStore
+    from ingest import read_inventory_csv
+    from lstm_runtime import load_inference_model
+    from utils import BatchEncoder, load_preprocessing
+
+    parser = argparse.ArgumentParser(description='Forecast a grid of price/discount/promotion scenarios')
+    parser.add_argument('--data', default=str(DATA_PATH), help='inventory CSV')
+    parser.add_argument('--model', default=str(MODEL_PATH))
+    parser.add_argument('--backend', default=None, choices=['numpy', 'keras'])
+    parser.add_argument('--products', nargs='*', help='Product IDs (default: all)')
+    parser.add_argument('--price', nargs=3, type=float, metavar=('LO', 'HI', 'N'),
+                        help='price multipliers of the current price, e.g. 0.7 1.3 25')
+    parser.add_argument('--competitor', nargs=3, type=float, metavar=('LO', 'HI', 'N'),
+                        help='competitor price multipliers of the current competitor price')
+    parser.add_argument('--discount', nargs='*', type=float, help='discount values')
+    parser.add_argument('--holiday', nargs='*', type=int, help='promotion flags, e.g. 0 1')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='scoring threads (default: 4 with the numpy backend, 1 with keras)')
+    parser.add_argument('--output', default=None, help='write the result to this CSV')
+    args = parser.parse_args()
+
+    feature_columns, scaler, _, _, _ = load_preprocessing(args.data)
+    encoder = BatchEncoder(feature_columns, scaler)
+    backend = args.backend or os.environ.get('FORECAST_BACKEND', DEFAULT_BACKEND)
+    model = load_inference_model(args.model, backend)
+    workers = args.workers or (4 if backend == 'numpy' else 1)
+    store = PartitionedStore(read_inventory_csv(args.data))
+    base = latest_rows(store, args.products)
+
+    grids, relative = {}, []
+    if args.price:
+        grids['Price'] = np.linspace(args.price[0], args.price[1], int(args.price[2]))
+        relative.append('Price')
+    if args.competitor:
+        grids['Competitor Pricing'] = np.linspace(args.competitor[0], args.competitor[1], int(args.competitor[2]))
+        relative.append('Competitor Pricing')
+    if args.discount:
+        grids['Discount'] = args.discount
+    if args.holiday:
+        grids['Holiday/Promotion'] = args.holiday
+
+    started = time.perf_counter()
+    result = sweep_scenarios(base, grids, model, encoder, relative, workers=workers)
+    elapsed = time.perf_counter() - started
+    print(f"{len(result)} scenarios in {elapsed:.2f}s ({len(result) / elapsed:,.0f}/s)")
+    if args.output:
+        result.to_csv(args.output, index=False)
+    else:
+        print(result.head(20).to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
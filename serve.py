@@ -0,0 +1,323 @@
+"""Local HTTP inference service with request micro-batching.
+
+Single-row prediction requests that arrive concurrently are gathered into one batch
+(bounded by --max-batch-size rows and --max-wait-ms) and scored with one encode + one
+model call, so throughput grows with load instead of being capped at one predict per
+request. The model, preprocessing artifact and data are loaded once at startup.
+
+Endpoints:
+    GET  /health    -> status and batching counters
+    GET  /metrics   -> span timings and counters in the Prometheus text format
+    POST /predict   -> {"numeric": {...}, "categorical": {...}, "holiday": false}
+                       returns {"prediction": <Demand Forecast>}
+    POST /forecast  -> {"product_id": "P0001", "days": 30, "lookback": 10}  (days <= 90, lookback <= 60)
+                       returns {"product_id": ..., "dates": [...], "forecast": [...],
+                                "source": "model"|"seasonal_naive"|"mixed"}
+                       (daily totals of the product over its stores)
+
+Example:
+    python serve.py --port 8000 --max-batch-size 64 --max-wait-ms 5
+    curl -X POST localhost:8000/predict -d '{"categorical": {"Product ID": "P0001"}}'
+"""
+import argparse
+import asyncio
+import json
+import math
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from pathlib import Path
+
+import pandas as pd
+
+import instrumentation
+from datastore import PartitionedStore
+from forecasting import product_forecast
+from ingest import read_inventory_csv
+from lstm_runtime import load_inference_model
+from utils import BatchEncoder, CAT_COLUMNS, NUMERICAL_COLS, load_preprocessing, predict_batch
+
+BASE = Path(__file__).parent
+MODEL_PATH = BASE / 'model_lstm_100_100_1.keras'
+DATA_PATH = BASE / 'retail_store_inventory.csv'
+
+MAX_BODY_BYTES = 1 << 20
+# Accepted ranges of the /forecast integer fields
+MAX_FORECAST_DAYS = 90
+MAX_LOOKBACK = 60
+
+
+def _int_field(payload, name, default, high):
+    """An integer field of a request payload in 1..high; raises ValueError otherwise."""
+    value = payload.get(name, default)
+    if (isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value)
+            or value != int(value)):
+        raise ValueError(f"{name} must be an integer, got {value!r}")
+    if not 1 <= value <= high:
+        raise ValueError(f"{name} must be between 1 and {high}, got {value}")
+    return int(value)
+
+
+class MicroBatcher:
+    """Collects items submitted by concurrent coroutines and scores them in batches.
+
+    `batch_fn(items) -> list of results` runs on `executor`; a batch is flushed as soon
+    as it holds `max_batch_size` items or `max_wait_ms` passed since its first item.
+    """
+
+    def __init__(self, batch_fn, executor, max_batch_size=64, max_wait_ms=5.0):
+        self.batch_fn = batch_fn
+        self.executor = executor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.batches = 0
+        self.items = 0
+        self._queue = None
+        self._task = None
+
+    def start(self):
+        self._queue = asyncio.Queue()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def submit(self, item):
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            items = [item for item, _ in batch]
+            try:
+                results = await loop.run_in_executor(self.executor, self.batch_fn, items)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.batches += 1
+            self.items += len(items)
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def stats(self):
+        return {
+            'batches': self.batches,
+            'items': self.items,
+            'mean_batch_size': self.items / self.batches if self.batches else 0.0,
+        }
+
+
+class InferenceService:
+    """Model, encoder and data loaded once; all model calls run on one executor thread."""
+
+    def __init__(self, model_path=MODEL_PATH, data_path=DATA_PATH, max_batch_size=64, max_wait_ms=5.0,
+                 backend=None):
+        feature_columns, scaler, raw_means, _, _ = load_preprocessing(str(data_path))
+        self.encoder = BatchEncoder(feature_columns, scaler)
+        self.raw_means = raw_means
+        self.model = load_inference_model(model_path, backend)
+        self.store = PartitionedStore(read_inventory_csv(data_path))
+        # Keras models are not safe to call concurrently; serialize on one thread either way
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='predict')
+        self.batcher = MicroBatcher(self.score_rows, self.executor, max_batch_size, max_wait_ms)
+
+    def prediction_record(self, payload):
+        """Validate a /predict payload into one input row; raises ValueError on bad input.
+
+        Runs per request before batching, so a malformed payload is rejected on its own
+        instead of failing the micro-batch it would have joined.
+        """
+        numeric = payload.get('numeric') or {}
+        categorical = payload.get('categorical') or {}
+        for name, value in (('numeric', numeric), ('categorical', categorical)):
+            if not isinstance(value, dict):
+                raise ValueError(f"'{name}' must be a JSON object")
+        unknown = (set(numeric) - set(NUMERICAL_COLS)) | (set(categorical) - set(CAT_COLUMNS))
+        if unknown:
+            raise ValueError(f"unknown fields {sorted(unknown)}")
+        record = {}
+        for c in NUMERICAL_COLS:
+            value = numeric.get(c, self.raw_means.get(c, 0.0))
+            try:
+                if isinstance(value, bool):
+                    raise TypeError
+                record[c] = float(value)
+            except (TypeError, ValueError):
+                raise ValueError(f"numeric {c!r} must be a number, got {value!r}") from None
+            if not math.isfinite(record[c]):
+                raise ValueError(f"numeric {c!r} must be finite")
+        for c in CAT_COLUMNS:
+            value = categorical.get(c)
+            if value is not None and not isinstance(value, str):
+                raise ValueError(f"categorical {c!r} must be a string")
+            record[c] = value
+        record['Holiday/Promotion'] = 1 if payload.get('holiday') else 0
+        return record
+
+    def score_rows(self, records):
+        """Encode and predict a list of validated input rows (see `prediction_record`) in one batch."""
+        X = self.encoder.encode(pd.DataFrame.from_records(records))
+        return [float(v) for v in predict_batch(self.model, X, len(records))]
+
+    def forecast(self, product_id, days, lookback):
+        product_data = self.store.get(product_id)
+        if product_data is None:
+            raise KeyError(product_id)
+        result = product_forecast(product_data, self.model, self.encoder, days, lookback)
+        if result is None:
+            raise ValueError(f"need at least {lookback} days of history in a store for {product_id}")
+        dates, values, source = result
+        return {'product_id': product_id, 'dates': [d.strftime('%Y-%m-%d') for d in dates],
+                'forecast': values.tolist(), 'source': source}
+
+    async def handle(self, method, path, body):
+        """Route one request; returns (HTTPStatus, JSON-serializable payload or metrics text)."""
+        if method == 'GET' and path == '/health':
+            return HTTPStatus.OK, {'status': 'ok', **self.batcher.stats()}
+        if method == 'GET' and path == '/metrics':
+            for key, value in self.batcher.stats().items():
+                instrumentation.set_gauge(f"serve_{key}", value)
+            return HTTPStatus.OK, instrumentation.prometheus_text()
+        if method != 'POST' or path not in ('/predict', '/forecast'):
+            return HTTPStatus.NOT_FOUND, {'error': f"no route for {method} {path}"}
+        try:
+            payload = json.loads(body or b'{}')
+        except ValueError as e:
+            return HTTPStatus.BAD_REQUEST, {'error': f"invalid JSON: {e}"}
+        if not isinstance(payload, dict):
+            return HTTPStatus.BAD_REQUEST, {'error': 'request body must be a JSON object'}
+
+        if path == '/predict':
+            try:
+                record = self.prediction_record(payload)
+            except ValueError as e:
+                return HTTPStatus.BAD_REQUEST, {'error': str(e)}
+            return HTTPStatus.OK, {'prediction': await self.batcher.submit(record)}
+
+        try:
+            product_id = payload.get('product_id')
+            if not isinstance(product_id, str):
+                raise ValueError(f"product_id must be a string, got {product_id!r}")
+            days = _int_field(payload, 'days', 30, MAX_FORECAST_DAYS)
+            lookback = _int_field(payload, 'lookback', 10, MAX_LOOKBACK)
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self.executor, self.forecast, product_id, days, lookback)
+        except KeyError:
+            return HTTPStatus.NOT_FOUND, {'error': f"unknown product_id {payload.get('product_id')!r}"}
+        except ValueError as e:
+            return HTTPStatus.BAD_REQUEST, {'error': str(e)}
+        return HTTPStatus.OK, result
+
+
+async def _read_request(reader):
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    method, path, _ = request_line.decode('latin-1').split(' ', 2)
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    length = int(headers.get('content-length', 0))
+    if length > MAX_BODY_BYTES:
+        raise ValueError('request body too large')
+    body = await reader.readexactly(length) if length else b''
+    return method.upper(), path.split('?', 1)[0], headers, body
+
+
+def _response(status, payload, keep_alive):
+    # Plain strings (the /metrics page) are sent as text, everything else as JSON
+    if isinstance(payload, str):
+        body, content_type = payload.encode(), 'text/plain; version=0.0.4'
+    else:
+        body, content_type = json.dumps(payload).encode(), 'application/json'
+    head = (
+        f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+        f"Content-Type: {content_type}\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+    )
+    return head.encode('latin-1') + body
+
+
+async def serve(service, host='127.0.0.1', port=8000):
+    async def on_connection(reader, writer):
+        try:
+            while True:
+                try:
+                    request = await _read_request(reader)
+                except (ValueError, asyncio.IncompleteReadError) as e:
+                    writer.write(_response(HTTPStatus.BAD_REQUEST, {'error': str(e)}, False))
+                    break
+                if request is None:
+                    break
+                method, path, headers, body = request
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                try:
+                    status, payload = await service.handle(method, path, body)
+                except Exception as e:
+                    status, payload = HTTPStatus.INTERNAL_SERVER_ERROR, {'error': str(e)}
+                writer.write(_response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    service.batcher.start()
+    server = await asyncio.start_server(on_connection, host, port)
+    print(f"Serving on http://{host}:{port}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.batcher.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Demand forecast HTTP service with micro-batching')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--data', default=str(DATA_PATH), help='inventory CSV')
+    parser.add_argument('--model', default=str(MODEL_PATH), help='Keras model file')
+    parser.add_argument('--max-batch-size', type=int, default=64, help='rows per model call')
+    parser.add_argument('--max-wait-ms', type=float, default=5.0,
+                        help='how long the first request of a batch waits for others')
+    parser.add_argument('--backend', choices=['numpy', 'keras'], default=None,
+                        help='inference runtime (default: FORECAST_BACKEND or numpy)')
+    args = parser.parse_args()
+
+    service = InferenceService(args.model, args.data, args.max_batch_size, args.max_wait_ms, args.backend)
+    try:
+        asyncio.run(serve(service, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""Measure cold-start import time of the project's entry modules.
+
+Each module is imported in a fresh interpreter with `python -X importtime`, so results
+are not skewed by modules another import already loaded. The report lists the wall
+time per entry module and the slowest top-level packages it pulled in. Saved reports
+can be compared against later runs to catch startup regressions.
+
+Example:
+    python startup_report.py                       # default entry modules
+    python startup_report.py app --top 15
+    python startup_report.py --save startup.json   # record a baseline
+    python startup_report.py --baseline startup.json --tolerance 0.25
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+BASE = Path(__file__).parent
+DEFAULT_MODULES = ['utils', 'forecasting', 'app', 'batch_forecast', 'serve', 'test_predict']
+
+
+def measure_import(module):
+    """Import `module` in a fresh interpreter; returns wall seconds and per-package totals.
+
+    Package totals are the cumulative microseconds of each top-level package's import
+    (including what it imported itself), as reported by -X importtime.
+    """
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=BASE, capture_output=True, text=True,
+    )
+    wall = time.perf_counter() - started
+    packages = defaultdict(int)
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line[len('import time:'):].split('|'))
+        # A package's root entry (no dots) covers the package and everything it pulled in
+        if '.' not in name:
+            packages[name] = max(packages[name], int(cumulative))
+    return {
+        'module': module,
+        'ok': proc.returncode == 0,
+        'wall_s': wall,
+        'packages_us': dict(packages),
+        'error': proc.stderr.strip().splitlines()[-1] if proc.returncode else None,
+    }
+
+
+def print_report(results, top=10):
+    for r in results:
+        status = 'ok' if r['ok'] else f"FAILED ({r['error']})"
+        print(f"\n{r['module']}: {r['wall_s']:.2f}s wall, {status}")
+        ranked = sorted(r['packages_us'].items(), key=lambda kv: kv[1], reverse=True)[:top]
+        for name, us in ranked:
+            print(f"    {us / 1e6:8.3f}s  {name}")
+
+
+def compare(results, baseline, tolerance):
+    """Print modules whose wall time grew more than `tolerance` (fraction); returns count."""
+    previous = {r['module']: r for r in baseline}
+    regressions = 0
+    print('\nCompared with baseline:')
+    for r in results:
+        old = previous.get(r['module'])
+        if old is None:
+            continue
+        change = (r['wall_s'] - old['wall_s']) / old['wall_s'] if old['wall_s'] else 0.0
+        flag = 'REGRESSION' if change > tolerance else ''
+        regressions += bool(flag)
+        print(f"    {r['module']:<16} {old['wall_s']:6.2f}s -> {r['wall_s']:6.2f}s ({change:+.0%}) {flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Report import time of entry modules')
+    parser.add_argument('modules', nargs='*', default=DEFAULT_MODULES)
+    parser.add_argument('--top', type=int, default=10, help='packages to list per module')
+    parser.add_argument('--save', help='write the results as JSON')
+    parser.add_argument('--baseline', help='JSON from an earlier --save to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed relative wall-time increase before flagging a regression')
+    args = parser.parse_args()
+
+    results = [measure_import(m) for m in args.modules]
+    print_report(results, args.top)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            if compare(results, json.load(f), args.tolerance):
+                sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,276 @@
+"""Incremental inference: per-product LSTM state carried across days.
+
+Re-feeding a product's whole lookback window every day costs lookback timesteps per
+product although only one row is new. `LSTMStateStore` instead keeps the LSTM hidden
+and cell state of every product in arrays (one row per product, saved as one .npz)
+and advances all products with new rows in a single batched `step` call, so a daily
+update costs a fixed number of timesteps per product whatever the lookback.
+
+A relu LSTM state is not contracting, so one state carried over the whole history
+drifts far from anything seen in training. Each product therefore carries `n_states`
+staggered states that restart from zero every `lookback` steps, `lookback / n_states`
+steps apart; the forecast comes from the oldest one. Its context is always between
+`lookback - lookback / n_states` and `lookback` rows: n_states=1 is a tumbling window,
+and n_states=lookback is the model fed exactly the last `lookback` rows, at the cost of
+lookback steps per update. The default (2) costs 2 steps per product per row.
+
+`lookback` is capped at the rows the model is fed at inference
+(`forecasting.model_timesteps`). The shipped model was trained on single rows, so for
+it the state restarts on every row and the forecast is exactly the single-row one;
+longer contexts are out of distribution for it.
+
+Example:
+    python state_store.py init --data retail_store_inventory.csv --out lstm_state.npz
+    python state_store.py advance --state lstm_state.npz --data new_day.csv
+"""
+import argparse
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from forecasting import model_timesteps
+from instrumentation import incr, timed
+
+BASE = Path(__file__).parent
+MODEL_PATH = BASE / 'model_lstm_100_100_1.keras'
+STATE_VERSION = 1
+
+
+def _model_id(model):
+    return (getattr(model, 'meta', None) or {}).get('source_sha256')
+
+
+def _label(values):
+    return values[0] if len(values) == 1 else tuple(values)
+
+
+class LSTMStateStore:
+    """LSTM states of every partition (e.g. product) in (P, n_states, units) arrays.
+
+    `age[p, j]` counts the rows state j of partition p has consumed since its last
+    reset; negative ages are states that have not started yet (the stagger offset).
+    """
+
+    def __init__(self, labels, keys=('Product ID',), units=100, lookback=10, n_states=2, model_id=None):
+        if not 1 <= n_states <= lookback:
+            raise ValueError('n_states must be between 1 and lookback')
+        self.keys = tuple(keys)
+        self.labels = list(labels)
+        self.lookback = lookback
+        self.n_states = n_states
+        self.model_id = model_id
+        self.position = {label: i for i, label in enumerate(self.labels)}
+        n = len(self.labels)
+        self.h = np.zeros((n, n_states, units), dtype=np.float32)
+        self.c = np.zeros((n, n_states, units), dtype=np.float32)
+        self.age = np.tile(self._initial_age(), (n, 1))
+        self.last_date = np.full(n, np.datetime64('NaT'), dtype='datetime64[ns]')
+
+    def _initial_age(self):
+        stride = self.lookback // self.n_states
+        return -np.arange(self.n_states, dtype=np.int32) * stride
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __contains__(self, label):
+        return label in self.position
+
+    def _add(self, labels):
+        new = [label for label in labels if label not in self.position]
+        if not new:
+            return
+        for label in new:
+            self.position[label] = len(self.labels)
+            self.labels.append(label)
+        k, units = len(new), self.h.shape[2]
+        self.h = np.concatenate([self.h, np.zeros((k, self.n_states, units), dtype=np.float32)])
+        self.c = np.concatenate([self.c, np.zeros((k, self.n_states, units), dtype=np.float32)])
+        self.age = np.concatenate([self.age, np.tile(self._initial_age(), (k, 1))])
+        self.last_date = np.concatenate([self.last_date, np.full(k, np.datetime64('NaT'), dtype='datetime64[ns]')])
+
+    def _check_model(self, model):
+        if not hasattr(model, 'step'):
+            raise TypeError('incremental inference needs the numpy backend (lstm_runtime.NumpyLSTMModel)')
+        model_id = _model_id(model)
+        if self.model_id is None:
+            self.model_id = model_id
+        elif model_id is not None and model_id != self.model_id:
+            raise ValueError('state was built with a different model; re-run initialize')
+        if model_timesteps(model, self.lookback) < self.lookback:
+            raise ValueError(f"state carries {self.lookback} rows of context but the model takes "
+                             f"{model_timesteps(model, self.lookback)}; re-run initialize")
+
+    def _step(self, model, rows, X, dates=None):
+        """Feed one row to each partition in `rows` (positions) with features X (n, F)."""
+        n, k, units = len(rows), self.n_states, self.h.shape[2]
+        h, c, age = self.h[rows], self.c[rows], self.age[rows]
+        expired = age >= self.lookback
+        h[expired] = 0.0
+        c[expired] = 0.0
+        age[expired] = 0
+        new_h, new_c = model.step(np.repeat(X, k, axis=0), h.reshape(n * k, units), c.reshape(n * k, units))
+        active = (age >= 0)[..., None]
+        self.h[rows] = np.where(active, new_h.reshape(n, k, units), h)
+        self.c[rows] = np.where(active, new_c.reshape(n, k, units), c)
+        self.age[rows] = age + 1
+        if dates is not None:
+            self.last_date[rows] = dates
+        incr('state_steps_total', n * k)
+
+    def predictions(self, model, labels=None):
+        """Current forecast per partition from its oldest state; a Series indexed by label."""
+        labels = self.labels if labels is None else list(labels)
+        rows = np.array([self.position[label] for label in labels], dtype=np.intp)
+        age = self.age[rows]
+        oldest = np.argmax(age, axis=1)
+        h = self.h[rows, oldest]
+        values = np.asarray(model.head(h), dtype=np.float64).reshape(-1)
+        values[age[np.arange(len(rows)), oldest] <= 0] = np.nan
+        return pd.Series(values, index=pd.Index(labels, tupleize_cols=False), name='forecast')
+
+    @classmethod
+    @timed()
+    def initialize(cls, feature_store, model, lookback=10, n_states=2):
+        """Build states from the tail of each partition of a `feature_store.FeatureStore`.
+
+        `lookback` is capped at `model_timesteps(model, lookback)` (and `n_states` at it),
+        so states never see more context than the model is fed at inference. Only the
+        last 2 * lookback rows per partition are replayed, all partitions batched per step;
+        shorter histories are right-aligned and start later.
+        """
+        lookback = model_timesteps(model, lookback)
+        n_states = min(n_states, lookback)
+        labels = feature_store.partition_keys()
+        state = cls(labels, feature_store.keys, model.state_units, lookback, n_states, _model_id(model))
+        state._check_model(model)
+        warmup = 2 * lookback
+        tails = []
+        for label in labels:
+            features, _, dates = feature_store.rows(label)
+            tails.append((features[-warmup:], dates[-warmup:]))
+        for t in range(warmup):
+            rows, X, dates = [], [], []
+            for i, (features, d) in enumerate(tails):
+                offset = t - (warmup - len(features))
+                if offset >= 0:
+                    rows.append(i)
+                    X.append(features[offset])
+                    dates.append(d[offset])
+            if rows:
+                state._step(model, np.array(rows, dtype=np.intp), np.stack(X), np.array(dates))
+        return state
+
+    @timed()
+    def advance(self, rows_df, encoder, model):
+        """Feed newly appended rows and return the updated forecast of the partitions they touch.
+
+        Rows are grouped by partition and fed in date order; partition i's j-th new
+        row goes into batched step j, so an update of one row per partition is one
+        step call. Unknown partitions are added with fresh states. Rows dated on or
+        before a partition's `last_date` were already consumed (e.g. a re-sent file)
+        and are skipped, so each update must carry whole days; partitions with
+        nothing new are left out of the result.
+        """
+        self._check_model(model)
+        empty = pd.Series(dtype=np.float64, name='forecast')
+        if rows_df.empty:
+            return empty
+        rows_df = rows_df.sort_values(list(self.keys) + ['Date'], kind='stable')
+        dates = pd.to_datetime(rows_df['Date']).to_numpy(dtype='datetime64[ns]')
+        groups = rows_df.groupby(list(self.keys), sort=False).indices
+        labels = [_label(label if isinstance(label, tuple) else (label,)) for label in groups]
+        self._add(labels)
+        fresh_labels, positions, skipped = [], [], 0
+        for label, p in zip(labels, groups.values()):
+            last = self.last_date[self.position[label]]
+            fresh = np.ones(len(p), dtype=bool) if np.isnat(last) else dates[p] > last
+            skipped += int(len(p) - fresh.sum())
+            if fresh.any():
+                fresh_labels.append(label)
+                positions.append(p[fresh])
+        if skipped:
+            incr('state_rows_skipped_total', skipped)
+        if not positions:
+            return empty
+        labels = fresh_labels
+        X = encoder.encode(rows_df)[:, 0, :]
+        rows = np.array([self.position[label] for label in labels], dtype=np.intp)
+        for t in range(max(len(p) for p in positions)):
+            take = [i for i, p in enumerate(positions) if len(p) > t]
+            index = np.array([positions[i][t] for i in take])
+            self._step(model, rows[take], X[index], dates[index])
+        return self.predictions(model, labels)
+
+    def save(self, path):
+        """Write the store to one .npz, atomically."""
+        path = Path(path)
+        meta = {
+            'version': STATE_VERSION,
+            'keys': list(self.keys),
+            'labels': [list(label) if isinstance(label, tuple) else [label] for label in self.labels],
+            'lookback': self.lookback,
+            'n_states': self.n_states,
+            'model_id': self.model_id,
+        }
+        tmp_path = path.with_name(path.stem + '.tmp.npz')
+        np.savez(tmp_path, h=self.h, c=self.c, age=self.age, last_date=self.last_date.astype(np.int64),
+                 meta=np.array(json.dumps(meta)))
+        os.replace(tmp_path, path)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            meta = json.loads(str(data['meta']))
+            if meta.get('version') != STATE_VERSION:
+                raise ValueError(f"{path}: unsupported state version {meta.get('version')}")
+            labels = [_label(label) for label in meta['labels']]
+            state = cls(labels, meta['keys'], data['h'].shape[2], meta['lookback'], meta['n_states'],
+                        meta['model_id'])
+            state.h = data['h']
+            state.c = data['c']
+            state.age = data['age']
+            state.last_date = data['last_date'].astype('datetime64[ns]')
+        return state
+
+
+def main():
+    from feature_store import open_feature_store
+    from ingest import read_inventory_csv
+    from lstm_runtime import load_inference_model
+    from utils import BatchEncoder, load_preprocessing
+
+    parser = argparse.ArgumentParser(description='Carry per-product LSTM state across daily updates')
+    parser.add_argument('command', choices=['init', 'advance'])
+    parser.add_argument('--data', default='retail_store_inventory.csv',
+                        help='full history (init) or the newly appended rows (advance)')
+    parser.add_argument('--reference', default='retail_store_inventory.csv',
+                        help='CSV whose fitted preprocessing encodes the new rows (advance)')
+    parser.add_argument('--state', '--out', dest='state', default='lstm_state.npz')
+    parser.add_argument('--model', default=str(MODEL_PATH))
+    parser.add_argument('--lookback', type=int, default=10,
+                        help='rows of context, capped at the timesteps the model was trained on')
+    parser.add_argument('--n-states', type=int, default=2, help='staggered states per product')
+    parser.add_argument('--output', default=None, help='write the forecasts to this CSV')
+    args = parser.parse_args()
+
+    model = load_inference_model(args.model, 'numpy')
+    if args.command == 'init':
+        state = LSTMStateStore.initialize(open_feature_store(args.data), model, args.lookback, args.n_states)
+        forecasts = state.predictions(model)
+    else:
+        state = LSTMStateStore.load(args.state)
+        feature_columns, scaler, _, _, _ = load_preprocessing(args.reference)
+        forecasts = state.advance(read_inventory_csv(args.data), BatchEncoder(feature_columns, scaler), model)
+    state.save(args.state)
+    print(f"{args.state}: {len(state)} partitions, {len(forecasts)} forecasts updated")
+    if args.output:
+        forecasts.to_csv(args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""LRU order, byte budget and counters of the analytics cache."""
+import numpy as np
+
+from analytics_cache import AnalyticsCache, estimate_nbytes
+
+
+def _blob(n):
+    return np.zeros(n, dtype=np.uint8)
+
+
+def test_least_recently_used_entry_is_evicted_first():
+    cache = AnalyticsCache(max_entries=3, max_bytes=10_000)
+    for key in 'abc':
+        cache.put(key, _blob(10))
+    assert cache.get('a') is not None  # 'b' is now the least recently used
+    cache.put('d', _blob(10))
+    assert 'b' not in cache
+    assert all(key in cache for key in 'acd')
+    assert cache.stats()['evictions'] == 1
+
+
+def test_byte_budget_evicts_until_it_fits():
+    cache = AnalyticsCache(max_entries=10, max_bytes=250)
+    for key in 'abc':
+        cache.put(key, _blob(100))
+    assert list(cache._entries) == ['b', 'c']
+    assert cache.current_bytes == 200
+    cache.put('b', _blob(50))
+    assert cache.current_bytes == 150
+    assert list(cache._entries) == ['c', 'b']
+
+
+def test_oversize_entry_is_returned_but_not_stored():
+    cache = AnalyticsCache(max_entries=10, max_bytes=100)
+    cache.put('small', _blob(60))
+    value = cache.get_or_compute('big', lambda: _blob(101))
+    assert len(value) == 101
+    assert 'big' not in cache and 'small' in cache
+    assert cache.current_bytes == 60
+    # Replacing an entry with an oversize value drops the old one
+    cache.put('small', _blob(500))
+    assert 'small' not in cache and cache.current_bytes == 0
+
+
+def test_hit_and_miss_counters():
+    cache = AnalyticsCache()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return _blob(8)
+
+    for _ in range(3):
+        cache.get_or_compute('k', compute)
+    assert cache.get('missing') is None
+    stats = cache.stats()
+    assert len(calls) == 1
+    assert (stats['hits'], stats['misses']) == (2, 2)
+    assert stats['hit_rate'] == 0.5
+    assert stats['entries'] == 1 and stats['bytes'] == estimate_nbytes(_blob(8))
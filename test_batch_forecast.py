@@ -0,0 +1,77 @@
+"""Resume behaviour of the batch job's progress manifest."""
+import json
+import re
+
+import pandas as pd
+import pytest
+
+from batch_forecast import PROGRESS_FILE, _load_progress, run
+from conftest import MODEL_PATH
+
+
+def _run(data, output_dir, capsys, **options):
+    options = {'workers': 1, 'shard_size': 5, 'horizon': 14, 'fmt': 'csv', 'backend': 'numpy', **options}
+    run(data, MODEL_PATH, output_dir, **options)
+    out = capsys.readouterr().out
+    return sorted(int(s) for s in re.findall(r'^shard (\d+):', out, flags=re.M)), out
+
+
+def _progress(output_dir):
+    with open(output_dir / PROGRESS_FILE) as f:
+        return json.load(f)
+
+
+@pytest.fixture
+def finished_run(inventory_copy, tmp_path, capsys):
+    output_dir = tmp_path / 'out'
+    shards, _ = _run(inventory_copy, output_dir, capsys)
+    assert len(shards) > 1
+    return inventory_copy, output_dir, shards
+
+
+def test_finished_run_is_marked_and_not_resumed(finished_run, capsys):
+    data, output_dir, shards = finished_run
+    progress = _progress(output_dir)
+    assert progress['finished'] and sorted(progress['completed']) == shards
+    assert (output_dir / 'reorder.csv').exists()
+    rerun, out = _run(data, output_dir, capsys)
+    assert rerun == shards
+    assert 'last run finished' in out
+
+
+def test_interrupted_run_resumes_pending_shards(finished_run, capsys):
+    data, output_dir, shards = finished_run
+    progress = _progress(output_dir)
+    progress.update(completed=shards[1:], finished=False)
+    (output_dir / PROGRESS_FILE).write_text(json.dumps(progress))
+    (output_dir / 'forecasts' / 'part-00000.csv').unlink()
+    rerun, _ = _run(data, output_dir, capsys)
+    assert rerun == [shards[0]]
+    assert len(list((output_dir / 'forecasts').glob('part-*.csv'))) == len(shards)
+
+
+def test_data_change_invalidates_progress(finished_run, capsys):
+    data, output_dir, shards = finished_run
+    progress = _progress(output_dir)
+    progress.update(completed=shards[1:], finished=False)
+    (output_dir / PROGRESS_FILE).write_text(json.dumps(progress))
+    frame = pd.read_csv(data)
+    next_day = pd.to_datetime(frame['Date']).max() + pd.Timedelta(days=1)
+    frame.tail(1).assign(Date=next_day.strftime('%Y-%m-%d')).to_csv(data, mode='a', header=False, index=False)
+    rerun, out = _run(data, output_dir, capsys)
+    assert rerun == shards
+    assert 'data changed' in out
+    assert _progress(output_dir)['config']['data_sha256'] != progress['config']['data_sha256']
+
+
+@pytest.mark.parametrize('change, value', [('batch_size', 64), ('backend', 'keras')])
+def test_backend_or_batch_size_change_invalidates_progress(finished_run, capsys, change, value):
+    _, output_dir, shards = finished_run
+    progress = _progress(output_dir)
+    assert progress['config']['backend'] == 'numpy' and 'batch_size' in progress['config']
+    progress.update(completed=shards[1:], finished=False)
+    (output_dir / PROGRESS_FILE).write_text(json.dumps(progress))
+    assert _load_progress(output_dir, progress['config'])['completed'] == shards[1:]
+    resumed = _load_progress(output_dir, {**progress['config'], change: value})
+    assert resumed['completed'] == []
+    assert 'starting over' in capsys.readouterr().out
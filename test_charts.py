@@ -0,0 +1,47 @@
+"""Downsampling used by the dashboard charts."""
+import numpy as np
+import pytest
+
+from charts import historical_chart, lttb_indices, minmax_indices
+
+
+@pytest.fixture
+def series():
+    rng = np.random.default_rng(0)
+    dates = np.arange('2022-01-01', '2027-06-01', dtype='datetime64[D]')
+    return dates, rng.normal(100, 30, len(dates)).cumsum()
+
+
+@pytest.mark.parametrize('n_out', [3, 10, 500])
+def test_lttb_keeps_endpoints_and_target_length(series, n_out):
+    dates, y = series
+    keep = lttb_indices(dates, y, n_out)
+    assert len(keep) == n_out
+    assert keep[0] == 0 and keep[-1] == len(y) - 1
+    assert np.all(np.diff(keep) > 0)
+
+
+def test_lttb_returns_short_series_whole(series):
+    dates, y = series
+    np.testing.assert_array_equal(lttb_indices(dates[:50], y[:50], 100), np.arange(50))
+
+
+@pytest.mark.parametrize('n_buckets', [5, 64, 400])
+def test_minmax_keeps_bucket_extremes_and_endpoints(series, n_buckets):
+    _, y = series
+    keep = minmax_indices(y, n_buckets)
+    assert keep[0] == 0 and keep[-1] == len(y) - 1
+    assert np.all(np.diff(keep) > 0)
+    assert 2 * n_buckets <= len(keep) <= 2 * n_buckets + 2
+    kept = set(keep.tolist())
+    edges = np.linspace(0, len(y), n_buckets + 1).astype(np.intp)
+    for start, stop in zip(edges[:-1], edges[1:]):
+        assert start + int(np.argmin(y[start:stop])) in kept
+        assert start + int(np.argmax(y[start:stop])) in kept
+    assert y[keep].min() == y.min() and y[keep].max() == y.max()
+
+
+def test_chart_renders_png(series):
+    dates, y = series
+    png = historical_chart('P0001', dates, y, y * 0.9, dates[-1:] + np.arange(1, 8), np.full(7, y[-1]))
+    assert png.startswith(b'\x89PNG')
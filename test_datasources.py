@@ -0,0 +1,93 @@
+"""Filter pushdown, empty results and categories of the CSV and SQLite sources."""
+import pandas as pd
+import pytest
+
+from datasources import CATEGORY_COLUMNS, CsvSource, DataSource, SqliteSource, import_csv_to_sqlite
+from datastore import PartitionedStore
+
+
+@pytest.fixture(scope='module')
+def store(inventory):
+    return PartitionedStore(inventory)
+
+
+@pytest.fixture(scope='module', params=['csv', 'sqlite'])
+def source(request, inventory_csv, tmp_path_factory):
+    if request.param == 'csv':
+        source = CsvSource(inventory_csv, chunksize=1000)
+    else:
+        db_path = tmp_path_factory.mktemp('db') / 'inventory.db'
+        import_csv_to_sqlite(inventory_csv, db_path, chunksize=1000)
+        source = SqliteSource(db_path, pool_size=2)
+    yield source
+    source.close()
+
+
+def _expected(inventory, store, product, stores=None, start=None, end=None):
+    rows = store.get(product)
+    if stores is not None:
+        rows = rows[rows['Store ID'].isin(stores)]
+    if start is not None:
+        rows = rows[rows['Date'] >= pd.Timestamp(start)]
+    if end is not None:
+        rows = rows[rows['Date'] <= pd.Timestamp(end)]
+    return rows.reset_index(drop=True)
+
+
+def _assert_rows_equal(actual, expected):
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False, check_categorical=False)
+
+
+def test_data_source_is_abstract():
+    with pytest.raises(TypeError):
+        DataSource()
+
+
+def test_get_matches_partitioned_store(source, inventory, store):
+    product = store.partition_keys()[1]
+    _assert_rows_equal(source.get(product), _expected(inventory, store, product))
+    assert source.partition_keys() == store.partition_keys()
+
+
+def test_filters_are_pushed_down(source, inventory, store):
+    product = store.partition_keys()[0]
+    stores = sorted(inventory['Store ID'].unique())[:2]
+    dates = store.get(product)['Date']
+    start, end = dates.iloc[10], dates.iloc[len(dates) // 2]
+    actual = source.fetch(products=[product], stores=stores, start=start, end=end)
+    expected = _expected(inventory, store, product, stores, start, end)
+    assert len(actual) and len(actual) < len(store.get(product))
+    _assert_rows_equal(actual, expected)
+
+
+def test_column_subset(source, store):
+    product = store.partition_keys()[0]
+    actual = source.fetch(products=product, columns=['Date', 'Units Sold'])
+    assert list(actual.columns) == ['Date', 'Units Sold']
+    assert actual['Units Sold'].tolist() == store.get(product)['Units Sold'].tolist()
+
+
+def test_no_match_is_empty_frame_with_schema(source, inventory):
+    empty = source.fetch(products='NO-SUCH-PRODUCT')
+    assert empty.empty
+    assert list(empty.columns) == list(inventory.columns)
+    assert empty.dtypes.astype(str).str.replace(r'\[.*\]', '', regex=True).tolist() == \
+        inventory.dtypes.astype(str).str.replace(r'\[.*\]', '', regex=True).tolist()
+    assert source.get('NO-SUCH-PRODUCT') is None
+
+
+def test_fetched_categories_are_the_full_level_sets(source, inventory, store):
+    rows = source.fetch(products=store.partition_keys()[0], stores=sorted(inventory['Store ID'].unique())[0])
+    for column in CATEGORY_COLUMNS:
+        assert rows[column].cat.categories.tolist() == sorted(inventory[column].astype(str).unique())
+    assert rows['Product ID'].nunique() == 1
+    assert len(rows['Product ID'].cat.categories) == inventory['Product ID'].nunique()
+
+
+def test_header_only_csv(tmp_path, inventory_csv):
+    path = tmp_path / 'empty.csv'
+    with open(inventory_csv) as f:
+        path.write_text(f.readline())
+    empty = CsvSource(path).fetch(products='P0001')
+    assert empty.empty and 'Units Sold' in empty.columns
+    assert pd.api.types.is_datetime64_any_dtype(empty['Date'])
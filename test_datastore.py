@@ -0,0 +1,104 @@
+"""Partition slices and prefix-sum statistics against the equivalent pandas computations."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from datastore import PartitionedStore, PrefixSumIndex
+
+
+def _assert_partitions_match(store, df):
+    starts, stops = store.boundaries()
+    assert starts[0] == 0 and stops[-1] == len(df)
+    np.testing.assert_array_equal(starts[1:], stops[:-1])
+    keys = list(store.keys)
+    expected = df.groupby(keys, observed=True).size()
+    assert len(store) == len(expected)
+    for key in store.partition_keys():
+        label = key if isinstance(key, tuple) else (key,)
+        mask = np.logical_and.reduce([df[k] == v for k, v in zip(keys, label)])
+        rows = df[mask].sort_values(store.date_col, kind='stable')
+        part = store.get(key)
+        pd.testing.assert_frame_equal(part.reset_index(drop=True), rows.reset_index(drop=True))
+        np.testing.assert_array_equal(store.column(key, 'Units Sold'), rows['Units Sold'].to_numpy())
+
+
+@pytest.mark.parametrize('keys', [('Product ID',), ('Product ID', 'Store ID')])
+def test_partitions_match_boolean_selection(inventory, keys):
+    _assert_partitions_match(PartitionedStore(inventory, keys=keys), inventory)
+    assert PartitionedStore(inventory, keys=keys).get('P9999') is None
+
+
+def test_partitions_match_after_append(inventory):
+    last_day = inventory['Date'].max()
+    appended = inventory[inventory['Date'] == last_day].assign(Date=last_day + pd.Timedelta(days=1))
+    new_product = appended.head(3).assign(**{'Product ID': 'P9999'})
+    # Appended rows arrive in file order, after every existing row
+    df = pd.concat([inventory, appended.iloc[::-1], new_product], ignore_index=True)
+    df['Product ID'] = df['Product ID'].astype(str)
+    store = PartitionedStore(df)
+    _assert_partitions_match(store, df)
+    assert store.get('P9999')['Date'].eq(last_day + pd.Timedelta(days=1)).all()
+    first = store.partition_keys()[0]
+    assert store.get(first)['Date'].iloc[-1] == last_day + pd.Timedelta(days=1)
+
+
+@pytest.fixture(scope='module')
+def store(inventory):
+    return PartitionedStore(inventory)
+
+
+@pytest.fixture(scope='module')
+def index(store):
+    return PrefixSumIndex(store)
+
+
+def _series(store, key):
+    return store.get(key)['Units Sold'].astype(np.float64).reset_index(drop=True)
+
+
+@pytest.mark.parametrize('window', [1, 2, 7, 30, 180])
+def test_rolling_mean_and_std_match_pandas(store, index, window):
+    for key in store.partition_keys()[:3]:
+        series = _series(store, key)
+        np.testing.assert_allclose(index.rolling_mean(key, window), series.rolling(window).mean().to_numpy(),
+                                   rtol=1e-9, atol=1e-9)
+        np.testing.assert_allclose(index.rolling_std(key, window), series.rolling(window).std().to_numpy(),
+                                   rtol=1e-6, atol=1e-6)
+
+
+def test_window_longer_than_series_is_all_nan(store, index):
+    key = store.partition_keys()[0]
+    n = len(store.get(key))
+    assert np.isnan(index.rolling_mean(key, n + 1)).all()
+    assert np.isnan(index.rolling_std(key, n + 1)).all()
+    assert np.isnan(index.rolling_std(key, 1)).all()
+
+
+def test_range_sums_and_means(store, index):
+    key = store.partition_keys()[1]
+    series = _series(store, key)
+    assert index.sum(key) == pytest.approx(series.sum())
+    assert index.mean(key) == pytest.approx(series.mean())
+    assert index.sum(key, 5, 17) == pytest.approx(series.iloc[5:17].sum())
+    assert index.mean(key, -10) == pytest.approx(series.iloc[-10:].mean())
+    assert np.isnan(index.mean(key, 8, 8))
+
+
+def test_monthly_mean_matches_groupby(store, index):
+    for key in store.partition_keys()[:3]:
+        rows = store.get(key)
+        expected = rows['Units Sold'].astype(np.float64).groupby(rows['Date'].dt.to_period('M')).mean()
+        actual = index.monthly_mean(key)
+        assert list(actual.index) == list(expected.index)
+        np.testing.assert_allclose(actual.to_numpy(), expected.to_numpy(), rtol=1e-9)
+
+
+def test_partitions_are_independent(inventory):
+    # Two stores interleaved by date: a window never reaches into the other partition
+    store = PartitionedStore(inventory, keys=('Product ID', 'Store ID'))
+    index = PrefixSumIndex(store)
+    first, second = store.partition_keys()[:2]
+    expected = pd.Series(store.get(second)['Units Sold'].to_numpy(dtype=np.float64)).rolling(3).mean()
+    np.testing.assert_allclose(index.rolling_mean(second, 3), expected.to_numpy(), rtol=1e-9)
+    assert index.sum(first) + index.sum(second) == pytest.approx(
+        store.get(first)['Units Sold'].sum() + store.get(second)['Units Sold'].sum())
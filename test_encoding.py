@@ -0,0 +1,90 @@
+"""Feature encoding and preprocessing statistics against the reference paths."""
+import numpy as np
+import pytest
+
+from utils import (CAT_COLUMNS, NUMERICAL_COLS, BatchEncoder, build_input_row, load_and_preprocess, predict_batch,
+                   stream_preprocessing_stats)
+
+
+@pytest.fixture(scope='module')
+def dense(inventory_csv):
+    """load_and_preprocess outputs: the dense get_dummies frame, columns, scaler and options."""
+    frame, feature_columns, scaler, _, _, category_options, raw = load_and_preprocess(inventory_csv)
+    return frame, feature_columns, scaler, category_options, raw
+
+
+def _sample(raw, n_products=4):
+    products = raw['Product ID'].cat.categories[:n_products]
+    return raw[raw['Product ID'].isin(products)].groupby('Product ID', observed=True).head(3)
+
+
+def test_encoder_matches_dense_frame(dense):
+    frame, feature_columns, scaler, _, raw = dense
+    X = BatchEncoder(feature_columns, scaler).encode(raw)[:, 0, :]
+    expected = frame[feature_columns].to_numpy(dtype=np.float64)
+    np.testing.assert_allclose(X, expected, rtol=1e-5, atol=1e-5)
+
+
+def test_encoder_matches_build_input_row(dense):
+    _, feature_columns, scaler, category_options, raw = dense
+    sample = _sample(raw)
+    X = BatchEncoder(feature_columns, scaler).encode(sample)
+    for i, (_, row) in enumerate(sample.iterrows()):
+        expected = build_input_row(feature_columns, category_options, scaler,
+                                   {c: row[c] for c in NUMERICAL_COLS}, {c: str(row[c]) for c in CAT_COLUMNS},
+                                   row['Holiday/Promotion'])
+        np.testing.assert_allclose(X[i:i + 1], expected, rtol=1e-6, atol=1e-6)
+
+
+@pytest.mark.parametrize('categorical', [False, True])
+def test_unseen_category_encodes_like_the_base_level(dense, categorical):
+    _, feature_columns, scaler, category_options, raw = dense
+    sample = _sample(raw, 1).head(2).copy()
+    sample['Product ID'] = sample['Product ID'].astype(str)
+    sample.loc[sample.index[0], 'Product ID'] = 'P9999'
+    if categorical:
+        sample['Product ID'] = sample['Product ID'].astype('category')
+    X = BatchEncoder(feature_columns, scaler).encode(sample)
+    row = sample.iloc[0]
+    expected = build_input_row(feature_columns, category_options, scaler, {c: row[c] for c in NUMERICAL_COLS},
+                               {c: str(row[c]) for c in CAT_COLUMNS}, row['Holiday/Promotion'])
+    np.testing.assert_allclose(X[:1], expected, rtol=1e-6, atol=1e-6)
+    product_columns = [i for i, c in enumerate(feature_columns) if c.startswith('Product ID_')]
+    assert not X[0, 0, product_columns].any()
+
+
+def test_predict_batch_chunks_match_one_call(dense, numpy_model):
+    _, feature_columns, scaler, _, raw = dense
+    X = BatchEncoder(feature_columns, scaler).encode(raw.head(100))
+    whole = np.asarray(numpy_model.predict_on_batch(X)).reshape(-1)
+    np.testing.assert_allclose(predict_batch(numpy_model, X, batch_size=7), whole, rtol=1e-6, atol=1e-5)
+    assert predict_batch(numpy_model, X[:0]).shape == (0,)
+
+
+@pytest.mark.parametrize('chunksize', [997, 5000])
+def test_streamed_stats_match_the_fitted_scaler(inventory_csv, dense, chunksize):
+    _, feature_columns, scaler, category_options, raw = dense
+    assert len(raw) > 2 * chunksize
+    streamed = stream_preprocessing_stats(inventory_csv, chunksize=chunksize)
+    s_columns, s_scaler, s_raw_means, s_scaled_means, s_options = streamed
+    _, _, _, raw_means, scaled_means, _, _ = load_and_preprocess(inventory_csv)
+    assert s_columns == feature_columns
+    assert s_options == category_options
+    np.testing.assert_allclose(s_scaler.mean_, scaler.mean_, rtol=1e-8)
+    np.testing.assert_allclose(s_scaler.scale_, scaler.scale_, rtol=1e-8)
+    assert s_scaler.n_samples_seen_ == len(raw)
+    assert s_raw_means == pytest.approx(raw_means, rel=1e-8)
+    assert s_scaled_means == pytest.approx(scaled_means, abs=1e-8)
+
+
+def test_compact_features_match_dense_frame(inventory_csv, dense):
+    frame, feature_columns, _, _, _ = dense
+    compact, c_columns, *_ = load_and_preprocess(inventory_csv, compact=True)
+    assert c_columns == feature_columns
+    expected = frame[feature_columns].to_numpy(dtype=np.float64)
+    np.testing.assert_allclose(compact.dense(), expected, rtol=1e-5, atol=1e-5)
+    np.testing.assert_allclose(compact.dense(10, 25), expected[10:25], rtol=1e-5, atol=1e-5)
+    batches = np.concatenate([X[:, 0, :] for X in compact.iter_batches(batch_size=1000)])
+    np.testing.assert_array_equal(batches, compact.dense())
+    pytest.importorskip('scipy')
+    np.testing.assert_allclose(compact.to_csr().toarray(), expected, rtol=1e-5, atol=1e-5)
@@ -0,0 +1,38 @@
+"""Memory-mapped feature store against encoding the source frame directly."""
+import json
+
+import numpy as np
+
+from datastore import PartitionedStore
+from feature_store import open_feature_store
+from forecasting import feature_windows
+
+
+def test_rows_and_windows_match_encoder(inventory_csv, inventory, encoder):
+    store = open_feature_store(inventory_csv)
+    partitioned = PartitionedStore(inventory)
+    assert store.partition_keys() == partitioned.partition_keys()
+    for key in store.partition_keys()[:5]:
+        source = partitioned.get(key)
+        features, target, dates = store.rows(key)
+        expected = encoder.encode(source)[:, 0, :]
+        # The store encodes streamed float64 chunks; the fixture frame holds prices as float32
+        np.testing.assert_allclose(features, expected, rtol=1e-6, atol=1e-6)
+        np.testing.assert_array_equal(target, source['Demand Forecast'].to_numpy(dtype=np.float32))
+        np.testing.assert_array_equal(dates, source['Date'].to_numpy(dtype='datetime64[ns]'))
+        X, y = store.windows(key, 10)
+        np.testing.assert_array_equal(X, feature_windows(np.asarray(features), 10))
+        assert X.shape == feature_windows(expected, 10).shape
+        np.testing.assert_array_equal(y, target[9:])
+
+
+def test_changed_scaler_or_columns_rebuild_the_store(inventory_csv):
+    store = open_feature_store(inventory_csv)
+    index_path = store.path / 'index.json'
+    original = json.loads(index_path.read_text())
+    for field, stale in [('scaler_scale', [s * 2 for s in original['scaler_scale']]),
+                         ('scaler_mean', [m + 1 for m in original['scaler_mean']]),
+                         ('feature_columns', original['feature_columns'][::-1])]:
+        index_path.write_text(json.dumps({**original, field: stale}))
+        rebuilt = json.loads(open_feature_store(inventory_csv).path.joinpath('index.json').read_text())
+        assert rebuilt[field] == original[field]
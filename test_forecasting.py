@@ -0,0 +1,146 @@
+"""Backtest and rollout checks against direct single-row scoring of the shipped model."""
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.metrics import mean_absolute_error, r2_score
+
+from datastore import PartitionedStore
+from forecasting import (TARGET_COL, _partition_demand, backtest, forecast_partitions, forecast_products,
+                         guarded_forecast, last_windows, model_timesteps, product_forecast, recent_demand,
+                         recursive_forecast, seasonal_naive, store_histories)
+from utils import predict_batch
+
+
+def _product(inventory, product_id=None):
+    product_id = product_id or inventory['Product ID'].iloc[0]
+    return inventory[inventory['Product ID'] == product_id].sort_values('Date', kind='stable')
+
+
+def _single_step_metrics(product, model, encoder, lookback, train_frac=0.8):
+    """Test-split MAE and R2 of scoring each row on its own, over the rows backtest scores."""
+    y = product[TARGET_COL].to_numpy(dtype=np.float64)[lookback - 1:]
+    y_pred = predict_batch(model, encoder.encode(product)[lookback - 1:])
+    test = int(train_frac * len(y))
+    return mean_absolute_error(y[test:], y_pred[test:]), r2_score(y[test:], y_pred[test:])
+
+
+def test_model_timesteps_follows_trained_shape(numpy_model):
+    assert numpy_model.input_shape[1] == 1
+    assert model_timesteps(numpy_model, 10) == 1
+
+    class Variable:
+        input_shape = (None, None, 43)
+
+    assert model_timesteps(Variable(), 10) == 10
+
+
+@pytest.mark.parametrize('lookback', [1, 5, 10, 30])
+def test_backtest_at_least_single_step_baseline(inventory, encoder, numpy_model, lookback):
+    product = _product(inventory)
+    result = backtest(product, numpy_model, encoder, lookback)
+    mae, r2 = _single_step_metrics(product, numpy_model, encoder, lookback)
+    assert result['mae'] <= mae + 1e-6
+    assert result['r2'] >= r2 - 1e-6
+
+
+class ConstantModel:
+    """Single-step model predicting the same demand for every row."""
+
+    def __init__(self, value, num_features=43):
+        self.value = value
+        self.input_shape = (None, 1, num_features)
+
+    def predict_on_batch(self, X):
+        assert X.shape[1] == 1
+        return np.full((len(X), 1), self.value, dtype=np.float32)
+
+
+def _windows(inventory, encoder, lookback=10, n=5):
+    histories = store_histories(_product(inventory))[:n]
+    windows, valid = last_windows(histories, encoder, lookback)
+    assert valid.all()
+    return windows, recent_demand(histories), histories
+
+
+def test_recursive_forecast_stops_outside_input_range(inventory, encoder):
+    windows, _, _ = _windows(inventory, encoder)
+    rollout = recursive_forecast(windows, ConstantModel(1e6), encoder, 5)
+    assert np.all(rollout[:, 0] == 1e6)
+    assert np.isnan(rollout[:, 1:]).all()
+
+
+def test_guarded_forecast_keeps_rollout_close_to_baseline(inventory, encoder):
+    windows, demand, histories = _windows(inventory, encoder)
+    # Inside every window's Units Sold range, so the rollout never stops
+    sold = np.concatenate([h['Units Sold'].to_numpy()[-10:] for h in histories])
+    value = float(np.median(sold))
+    within = np.array([h['Units Sold'].to_numpy()[-10:].min() <= value <= h['Units Sold'].to_numpy()[-10:].max()
+                       for h in histories])
+    assert within.any()
+    forecasts, from_model = guarded_forecast(windows, demand, ConstantModel(value), encoder, 14, tolerance=np.inf)
+    assert np.array_equal(from_model, within)
+    assert np.all(forecasts[from_model] == np.float32(value))
+    assert np.array_equal(forecasts[~from_model], seasonal_naive(demand, 14)[~from_model])
+
+
+def test_guarded_forecast_falls_back_to_seasonal_naive(inventory, encoder):
+    windows, demand, _ = _windows(inventory, encoder)
+    forecasts, from_model = guarded_forecast(windows, demand, ConstantModel(1e6), encoder, 14)
+    assert not from_model.any()
+    assert np.array_equal(forecasts, seasonal_naive(demand, 14))
+    assert np.array_equal(forecasts[:, 7], demand[:, -7])
+
+
+def test_baseline_dates_and_values_follow_daily_totals(inventory, encoder):
+    product = _product(inventory)
+    dates, forecast, source = product_forecast(product, ConstantModel(1e6), encoder, 10)
+    assert source == 'seasonal_naive'
+    daily = product.groupby('Date')[TARGET_COL].sum()
+    last = daily.index[-1]
+    assert list(dates) == list(pd.date_range(last + pd.Timedelta(days=1), periods=10, freq='D'))
+    # Day d repeats the total of d - 7 days (d - 14 for the second week)
+    expected = [daily[d - pd.Timedelta(days=7 * (((d - last).days - 1) // 7 + 1))] for d in dates]
+    np.testing.assert_allclose(forecast, expected, rtol=1e-6)
+
+
+def test_recent_demand_is_date_based(inventory):
+    product = _product(inventory)
+    gapped = product[product['Date'] != product['Date'].max() - pd.Timedelta(days=2)]
+    demand = recent_demand([gapped], 7)[0]
+    daily = product.groupby('Date')[TARGET_COL].sum().iloc[-7:].to_numpy()
+    assert np.isnan(demand[4])
+    np.testing.assert_allclose(np.delete(demand, 4), np.delete(daily, 4))
+
+
+def test_forecast_products_sums_stores(inventory, encoder):
+    model = ConstantModel(1e6)
+    product_id = inventory['Product ID'].iloc[0]
+    totals = forecast_products(inventory, [product_id], model, encoder, 14)
+    _, forecast, _ = product_forecast(_product(inventory, product_id), model, encoder, 14)
+    np.testing.assert_allclose(totals.loc[product_id].to_numpy(), forecast)
+
+
+def test_partition_demand_matches_recent_demand(inventory):
+    gapped = inventory[~((inventory['Store ID'] == inventory['Store ID'].iloc[0])
+                         & (inventory['Date'] == inventory['Date'].max() - pd.Timedelta(days=3)))]
+    for keys in (['Product ID', 'Store ID'], ['Product ID']):
+        store = PartitionedStore(gapped, keys=keys)
+        starts, stops = store.boundaries()
+        expected = recent_demand([store.get(key) for key in store.partition_keys()])
+        np.testing.assert_allclose(_partition_demand(store, starts, stops), expected, rtol=1e-6)
+
+
+def test_forecast_partitions_rejects_repeated_dates(inventory, encoder, numpy_model):
+    with pytest.raises(ValueError, match='repeat dates'):
+        forecast_partitions(PartitionedStore(inventory), numpy_model, encoder, 14, 10)
+
+
+def test_fleet_forecast_stays_at_observed_level(inventory, encoder, numpy_model):
+    store = PartitionedStore(inventory, keys=['Product ID', 'Store ID'])
+    forecasts = forecast_partitions(store, numpy_model, encoder, 14, 10)
+    observed = inventory[TARGET_COL]
+    assert forecasts.to_numpy().max() <= observed.max()
+    recent = inventory.sort_values('Date', kind='stable').groupby(['Product ID', 'Store ID'], observed=True)
+    daily = recent.tail(14).groupby(['Product ID', 'Store ID'], observed=True)['Units Sold'].mean()
+    ratio = forecasts.sum(axis=1).mean() / (daily.mean() * 14)
+    assert 0.5 < ratio < 1.5
@@ -0,0 +1,56 @@
+"""Span self time and the Prometheus text export."""
+import time
+
+import instrumentation
+from instrumentation import Registry, prometheus_text, span, trace
+
+
+def test_nested_spans_share_at_most_the_trace():
+    with trace('rerun') as rerun:
+        with span('outer'):
+            time.sleep(0.02)
+            with span('inner'):
+                time.sleep(0.03)
+            with span('inner'):
+                time.sleep(0.01)
+    rows = {row[0]: row for row in rerun.breakdown()}
+    _, calls, total_ms, self_ms, share = rows['outer']
+    assert calls == 1 and total_ms >= 60
+    assert abs(self_ms - (total_ms - rows['inner'][2])) < 1e-6
+    assert rows['inner'][1] == 2 and rows['inner'][2] == rows['inner'][3]
+    assert sum(row[4] for row in rerun.breakdown()) <= 1.0
+    assert [row[0] for row in rerun.breakdown()] == ['inner', 'outer']
+
+
+def test_registry_records_self_time():
+    instrumentation.REGISTRY.reset()
+    with span('parent'):
+        with span('child'):
+            time.sleep(0.01)
+    spans = instrumentation.REGISTRY.snapshot()['spans']
+    count, total, _, own = spans['parent']
+    assert count == 1 and own < total and own <= total - spans['child'][1] + 1e-9
+    assert 'forecast_span_self_seconds{span="parent"}' in prometheus_text()
+
+
+def test_label_values_are_escaped():
+    registry = Registry()
+    registry.incr('requests_total', path='a\\b"c\nd')
+    registry.record_span('odd "span"\n', 0.5)
+    text = prometheus_text(registry)
+    assert 'forecast_requests_total{path="a\\\\b\\"c\\nd"} 1' in text
+    assert 'forecast_span_seconds_count{span="odd \\"span\\"\\n"} 1' in text
+    # Every sample stays on one line
+    assert all(line.startswith(('#', 'forecast_')) for line in text.splitlines())
+
+
+def test_profiles_of_the_same_block_get_distinct_files(tmp_path, monkeypatch):
+    monkeypatch.setenv('FORECAST_PROFILE', 'cprofile')
+    monkeypatch.setenv('FORECAST_PROFILE_DIR', str(tmp_path))
+    paths = []
+    for _ in range(3):
+        with instrumentation.profile('block') as result:
+            pass
+        paths.append(result['prof_path'])
+    assert len(set(paths)) == 3
+    assert sorted(str(p) for p in tmp_path.glob('block-*.prof')) == sorted(paths)
@@ -0,0 +1,41 @@
+"""NumPy runtime against Keras on the shipped weights, and freshness of the committed export."""
+import json
+
+import numpy as np
+import pytest
+
+from conftest import MODEL_PATH
+from forecasting import feature_windows
+from lstm_runtime import (EXPORT_FORMAT, NumpyLSTMModel, PARITY_ATOL, PARITY_RTOL, _export_is_current,
+                          export_numpy_model, exported_path)
+
+tf = pytest.importorskip('tensorflow')
+
+
+@pytest.fixture(scope='module')
+def keras_model():
+    return tf.keras.models.load_model(str(MODEL_PATH))
+
+
+def test_committed_export_is_current(keras_model, tmp_path):
+    committed = exported_path(MODEL_PATH)
+    assert _export_is_current(MODEL_PATH, committed), 'run `python lstm_runtime.py export` and commit the .npz'
+    fresh = export_numpy_model(MODEL_PATH, tmp_path / 'fresh.npz', model=keras_model)
+    with np.load(committed) as old, np.load(fresh) as new:
+        assert sorted(old.files) == sorted(new.files)
+        meta = json.loads(str(old['meta']))
+        assert meta == json.loads(str(new['meta']))
+        assert meta['format'] == EXPORT_FORMAT and meta['timesteps'] == keras_model.input_shape[1]
+        for name in old.files:
+            if name != 'meta':
+                np.testing.assert_array_equal(old[name], new[name])
+
+
+@pytest.mark.parametrize('timesteps', [1, 10])
+def test_numpy_matches_keras_on_inventory_rows(keras_model, encoder, inventory, timesteps):
+    features = encoder.encode(inventory.head(2000))[:, 0, :]
+    X = np.ascontiguousarray(feature_windows(features, timesteps), dtype=np.float32)
+    expected = np.asarray(keras_model.predict_on_batch(X))
+    actual = NumpyLSTMModel(exported_path(MODEL_PATH)).predict_on_batch(X)
+    assert actual.shape == expected.shape
+    np.testing.assert_allclose(actual, expected, rtol=PARITY_RTOL, atol=PARITY_ATOL)
@@ -1,13 +1,13 @@
 from pathlib import Path
 import numpy as np
-import tensorflow as tf
-from utils import load_and_preprocess, build_input_row
+from utils import load_preprocessing, build_input_row
+from lstm_runtime import PARITY_ATOL, PARITY_RTOL, load_inference_model
 
 BASE = Path(__file__).parent
 MODEL_PATH = BASE / 'model_lstm_100_100_1.keras'
 
 def main():
-    df_reconstructed, feature_columns, scaler, raw_means, scaled_means, category_options = load_and_preprocess(str(BASE / 'retail_store_inventory.csv'))
+    feature_columns, scaler, raw_means, scaled_means, category_options = load_preprocessing(str(BASE / 'retail_store_inventory.csv'))
 
     print('Loaded preprocessing, number of features:', len(feature_columns))
 
@@ -20,9 +20,15 @@ def main():
 
     inp = build_input_row(feature_columns, category_options, scaler, raw_numeric_inputs, categorical_inputs, holiday=False)
 
+    import tensorflow as tf
     model = tf.keras.models.load_model(str(MODEL_PATH))
     pred = model.predict(inp)
     print('Predicted Demand Forecast:', float(pred.flatten()[0]))
 
+    # The NumPy runtime must agree with Keras on the same input
+    fast_pred = load_inference_model(MODEL_PATH, 'numpy').predict_on_batch(inp)
+    np.testing.assert_allclose(fast_pred, pred, rtol=PARITY_RTOL, atol=PARITY_ATOL)
+    print('NumPy runtime prediction:', float(fast_pred.flatten()[0]), '(matches Keras)')
+
 if __name__ == '__main__':
     main()
@@ -0,0 +1,37 @@
+"""Fleet reorder engine against the dashboard's single-product rules."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from datastore import PartitionedStore
+from reorder import fleet_reorder_suggestions
+
+app = pytest.importorskip('app')
+
+FIELDS = ['current_inventory', 'reorder_point', 'reorder_quantity', 'estimated_cost', 'safety_stock', 'daily_avg']
+
+
+@pytest.mark.parametrize('keys', [('Product ID',), ('Product ID', 'Store ID')])
+@pytest.mark.parametrize('lead_time', [3, 7])
+def test_fleet_matches_single_product_engine(inventory, keys, lead_time):
+    store = PartitionedStore(inventory, keys=keys)
+    labels = store.partition_keys()
+    index = pd.Index(labels, name=keys[0]) if len(keys) == 1 else pd.MultiIndex.from_tuples(labels, names=keys)
+    rng = np.random.default_rng(0)
+    forecast_14 = pd.Series(rng.uniform(0, 5000, len(labels)), index=index)
+    forecast_14.iloc[::4] = np.nan  # falls back to 14 days of average sales
+
+    fleet = fleet_reorder_suggestions(store, forecast_14, lead_time=lead_time).set_index(list(keys))
+    assert len(fleet) == len(labels)
+    assert list(fleet['rank']) == list(range(1, len(labels) + 1))
+    for label in labels:
+        rows = store.get(label)
+        total = forecast_14[label]
+        if np.isnan(total):
+            total = rows['Units Sold'].mean() * 14
+        expected = app.calculate_reorder_suggestions(rows, {'14': np.full(14, total / 14)}, lead_time=lead_time)
+        actual = fleet.loc[label]
+        for field in FIELDS:
+            assert actual[field] == pytest.approx(expected[field], rel=1e-6), field  # prices are stored as float32
+        assert actual['urgency'] == expected['urgency']
+        assert actual['color'] == expected['color']
@@ -0,0 +1,32 @@
+"""Training windows and saved input shapes of the retraining pipeline."""
+import json
+
+import numpy as np
+import pytest
+
+from conftest import MODEL_PATH
+from feature_store import open_feature_store
+from retrain import make_datasets, retrain
+
+tf = pytest.importorskip('tensorflow')
+
+
+@pytest.mark.parametrize('timesteps', [1, 10])
+def test_examples_are_trailing_rows_of_windows(inventory_csv, timesteps):
+    store = open_feature_store(inventory_csv)
+    train, _ = make_datasets(store, lookback=10, batch_size=32, val_frac=0.2, shards=1, timesteps=timesteps)
+    X, y = next(iter(train))
+    assert X.shape[1:] == (timesteps, len(store.feature_columns))
+    # Train order is shuffled by partition, so find the batch's partition by its first target
+    candidates = [key for key in store.partition_keys()
+                  if np.array_equal(store.windows(key, 10)[1][:len(y)], y.numpy())]
+    assert candidates
+    windows, _ = store.windows(candidates[0], 10)
+    np.testing.assert_array_equal(X.numpy(), windows[:len(y), 10 - timesteps:])
+
+
+def test_fine_tuned_model_keeps_its_trained_timesteps(inventory_csv, tmp_path):
+    path = retrain(inventory_csv, MODEL_PATH, tmp_path, epochs=1, batch_size=512, lookback=10)
+    assert tf.keras.models.load_model(str(path)).input_shape[1] == 1
+    with open(path.with_suffix('.json')) as f:
+        assert json.load(f)['timesteps'] == 1
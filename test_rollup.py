@@ -0,0 +1,66 @@
+"""Rollup cube: appended rows fold in to the same cube a full build produces."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from rollup import LEVELS, ROWS_COLUMN, RollupCube, build_rollup, open_rollup
+
+
+def _split(csv_path, tmp_path, fraction=0.75):
+    """Write the first `fraction` of the rows (by date) to a new CSV; returns it and the rest."""
+    lines = csv_path.read_text().splitlines(keepends=True)
+    header, rows = lines[0], lines[1:]
+    cut = int(len(rows) * fraction)
+    head = tmp_path / 'inventory.csv'
+    head.write_text(header + ''.join(rows[:cut]))
+    return head, ''.join(rows[cut:])
+
+
+def _assert_cubes_equal(actual, expected):
+    assert set(actual.levels) == set(expected.levels) == set(LEVELS)
+    for level in LEVELS:
+        pd.testing.assert_frame_equal(actual.levels[level].reset_index(drop=True),
+                                      expected.levels[level].reset_index(drop=True),
+                                      check_dtype=False, check_exact=False, rtol=1e-9)
+
+
+def test_appended_rows_match_full_build(inventory_csv, tmp_path):
+    head, rest = _split(inventory_csv, tmp_path)
+    build_rollup(head)
+    with open(head, 'a') as f:
+        f.write(rest)
+    incremental = open_rollup(head)
+    full = build_rollup(inventory_csv, tmp_path / 'full.rollup')
+    _assert_cubes_equal(incremental, full)
+    # The merged cube was saved and reloads as is
+    _assert_cubes_equal(RollupCube.load(tmp_path / 'inventory.rollup'), full)
+
+
+def test_add_in_batches_matches_one_pass(inventory):
+    dates = np.sort(inventory['Date'].unique())
+    cube = RollupCube()
+    for chunk in np.array_split(dates, 4):
+        cube.add(inventory[inventory['Date'].isin(chunk)])
+    _assert_cubes_equal(cube, RollupCube().add(inventory))
+
+
+@pytest.mark.parametrize('combined, parent', [('region_store', 'region'), ('category_product', 'category'),
+                                              ('product_store', 'product')])
+def test_combined_levels_sum_to_their_parent(inventory, combined, parent):
+    cube = RollupCube().add(inventory)
+    members = cube.members(combined)
+    assert members and all(isinstance(m, tuple) and len(m) == 2 for m in members)
+    parent_key = LEVELS[parent][0]
+    position = LEVELS[combined].index(parent_key)
+    member = cube.members(parent)[0]
+    children = [m for m in members if m[position] == member]
+    total = sum(cube.daily(combined, m).reindex(cube.daily(parent, member).index, fill_value=0) for m in children)
+    pd.testing.assert_frame_equal(total, cube.daily(parent, member), check_exact=False)
+
+
+def test_product_store_level_counts_raw_rows(inventory):
+    cube = RollupCube().add(inventory)
+    assert cube.levels['product_store'][ROWS_COLUMN].sum() == len(inventory)
+    summary = cube.summary('product_store')
+    assert summary.index.names == ['Product ID', 'Store ID']
+    assert len(summary) == inventory.groupby(['Product ID', 'Store ID'], observed=True).ngroups
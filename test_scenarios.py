@@ -0,0 +1,48 @@
+"""Scenario sweeps: concurrent scoring only where the model allows it."""
+import threading
+import time
+
+import numpy as np
+
+from datastore import PartitionedStore
+from scenarios import latest_rows, sweep_scenarios
+
+
+class NotThreadSafeModel:
+    """Fails if two threads are inside predict_on_batch at once (like a Keras model)."""
+
+    def __init__(self):
+        self.inside = 0
+        self.overlaps = 0
+        self.lock = threading.Lock()
+
+    def predict_on_batch(self, X):
+        with self.lock:
+            self.inside += 1
+            self.overlaps += self.inside > 1
+        time.sleep(0.002)
+        with self.lock:
+            self.inside -= 1
+        return X[:, 0, :1].sum(axis=1, keepdims=True)
+
+
+def _sweep(inventory, encoder, model, workers):
+    base = latest_rows(PartitionedStore(inventory))
+    grids = {'Price': np.linspace(0.8, 1.2, 5), 'Discount': [0, 10], 'Holiday/Promotion': [0, 1]}
+    return sweep_scenarios(base, grids, model, encoder, relative=('Price',), chunk_size=16, batch_size=8,
+                           workers=workers)
+
+
+def test_non_numpy_models_are_called_one_at_a_time(inventory, encoder):
+    model = NotThreadSafeModel()
+    threaded = _sweep(inventory, encoder, model, workers=4)
+    assert model.overlaps == 0
+    inline = _sweep(inventory, encoder, NotThreadSafeModel(), workers=1)
+    np.testing.assert_array_equal(threaded['Forecast'].to_numpy(), inline['Forecast'].to_numpy())
+
+
+def test_numpy_model_threads_match_inline(inventory, encoder, numpy_model):
+    threaded = _sweep(inventory, encoder, numpy_model, workers=4)
+    inline = _sweep(inventory, encoder, numpy_model, workers=1)
+    assert len(threaded) == inventory['Product ID'].nunique() * 5 * 2 * 2
+    np.testing.assert_allclose(threaded['Forecast'].to_numpy(), inline['Forecast'].to_numpy(), rtol=1e-6)
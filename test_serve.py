@@ -0,0 +1,96 @@
+"""Micro-batching and request validation of the inference service."""
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+
+import pytest
+
+from conftest import MODEL_PATH
+from serve import InferenceService, MicroBatcher
+
+
+@pytest.fixture(scope='module')
+def service(inventory_csv):
+    return InferenceService(MODEL_PATH, inventory_csv, max_batch_size=16, max_wait_ms=50, backend='numpy')
+
+
+def _gather(service, bodies, path='/predict'):
+    async def main():
+        service.batcher.start()
+        try:
+            return await asyncio.gather(*(service.handle('POST', path, json.dumps(b).encode()) for b in bodies))
+        finally:
+            await service.batcher.stop()
+    return asyncio.run(main())
+
+
+def test_micro_batcher_respects_max_batch_size():
+    sizes = []
+
+    def batch_fn(items):
+        sizes.append(len(items))
+        return [item * 2 for item in items]
+
+    async def main():
+        batcher = MicroBatcher(batch_fn, ThreadPoolExecutor(max_workers=1), max_batch_size=4, max_wait_ms=50)
+        batcher.start()
+        try:
+            return await asyncio.gather(*(batcher.submit(i) for i in range(10))), batcher.stats()
+        finally:
+            await batcher.stop()
+
+    results, stats = asyncio.run(main())
+    assert results == [i * 2 for i in range(10)]
+    assert sizes == [4, 4, 2]
+    assert stats['batches'] == 3 and stats['items'] == 10
+
+
+def test_concurrent_requests_share_a_batch(service):
+    bodies = [{'numeric': {'Price': 10.0 + i}, 'categorical': {'Product ID': 'P0001'}} for i in range(8)]
+    before = service.batcher.batches
+    responses = _gather(service, bodies)
+    assert all(status == HTTPStatus.OK for status, _ in responses)
+    assert service.batcher.batches - before < len(bodies)
+    single = [service.score_rows([service.prediction_record(b)])[0] for b in bodies]
+    assert [payload['prediction'] for _, payload in responses] == pytest.approx(single, rel=1e-5, abs=1e-3)
+
+
+@pytest.mark.parametrize('bad', [
+    {'numeric': {'Price': 'abc'}},
+    {'numeric': [1, 2]},
+    {'numeric': {'Price': True}},
+    {'numeric': {'Price': None}},
+    {'numeric': {'Prise': 3.0}},
+    {'categorical': {'Product ID': 7}},
+    {'categorical': 'P0001'},
+])
+def test_malformed_payload_fails_alone(service, bad):
+    good = {'numeric': {'Price': 20.0}, 'categorical': {'Product ID': 'P0002'}}
+    responses = _gather(service, [good, bad, good])
+    assert [status for status, _ in responses] == [HTTPStatus.OK, HTTPStatus.BAD_REQUEST, HTTPStatus.OK]
+    assert 'error' in responses[1][1]
+
+
+@pytest.mark.parametrize('body, message', [
+    ({'product_id': 'P0001', 'lookback': 0}, 'lookback must be between'),
+    ({'product_id': 'P0001', 'lookback': -3}, 'lookback must be between'),
+    ({'product_id': 'P0001', 'lookback': 10_000}, 'lookback must be between'),
+    ({'product_id': 'P0001', 'lookback': 'ten'}, 'lookback must be an integer'),
+    ({'product_id': 'P0001', 'days': 2.5}, 'days must be an integer'),
+    ({'product_id': 'P0001', 'days': None}, 'days must be an integer'),
+    ({'product_id': ['P0001']}, 'product_id must be a string'),
+    ({'product_id': {'id': 'P0001'}}, 'product_id must be a string'),
+    ({}, 'product_id must be a string'),
+])
+def test_bad_forecast_fields_are_rejected(service, body, message):
+    [(status, payload)] = _gather(service, [body], '/forecast')
+    assert status == HTTPStatus.BAD_REQUEST
+    assert message in payload['error']
+
+
+def test_forecast_accepts_valid_fields(service, inventory):
+    product_id = str(inventory['Product ID'].iloc[0])
+    [(status, payload)] = _gather(service, [{'product_id': product_id, 'days': 7, 'lookback': 10}], '/forecast')
+    assert status == HTTPStatus.OK
+    assert len(payload['dates']) == len(payload['forecast']) == 7
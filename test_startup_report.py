@@ -0,0 +1,11 @@
+"""Heavy optional packages stay out of the entry modules' imports."""
+import pytest
+
+from startup_report import measure_import
+
+
+@pytest.mark.parametrize('module', ['utils', 'forecasting', 'app'])
+def test_entry_module_import_skips_sklearn_and_tensorflow(module):
+    result = measure_import(module)
+    assert result['ok'], result['error']
+    assert not {'sklearn', 'scipy', 'tensorflow', 'keras'} & set(result['packages_us'])
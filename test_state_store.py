@@ -0,0 +1,61 @@
+"""Incremental LSTM state: the context the model is fed and rows already consumed."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from feature_store import open_feature_store
+from state_store import LSTMStateStore
+from utils import BatchEncoder, load_preprocessing, predict_batch
+
+
+@pytest.fixture
+def initialized(inventory, tmp_path, numpy_model):
+    """State built from all but the last two days, the encoder it uses and those two days."""
+    days = np.sort(inventory['Date'].unique())
+    history, new = inventory[inventory['Date'] < days[-2]], inventory[inventory['Date'] >= days[-2]]
+    csv_path = tmp_path / 'history.csv'
+    history.to_csv(csv_path, index=False)
+    state = LSTMStateStore.initialize(open_feature_store(csv_path), numpy_model, lookback=10, n_states=2)
+    feature_columns, scaler, _, _, _ = load_preprocessing(str(csv_path))
+    return state, BatchEncoder(feature_columns, scaler), new.reset_index(drop=True), days
+
+
+def _arrays(state):
+    return state.h.copy(), state.c.copy(), state.age.copy(), state.last_date.copy()
+
+
+def test_resent_rows_are_skipped(initialized, numpy_model):
+    state, encoder, new, days = initialized
+    updated = state.advance(new, encoder, numpy_model)
+    assert len(updated) == new['Product ID'].nunique()
+    assert (state.last_date == days[-1]).all()
+    before = _arrays(state)
+    assert state.advance(new, encoder, numpy_model).empty
+    for expected, actual in zip(before, _arrays(state)):
+        np.testing.assert_array_equal(actual, expected)
+
+
+def test_stale_rows_mixed_into_an_update_are_skipped(initialized, numpy_model, tmp_path):
+    state, encoder, new, days = initialized
+    reference = LSTMStateStore.load(state.save(tmp_path / 'state.npz'))
+    expected = reference.advance(new, encoder, numpy_model)
+    stale = new[new['Date'] == days[-2]].assign(Date=days[0])
+    updated = state.advance(pd.concat([stale, new], ignore_index=True), encoder, numpy_model)
+    pd.testing.assert_series_equal(updated, expected)
+    np.testing.assert_array_equal(state.age, reference.age)
+    np.testing.assert_array_equal(state.h, reference.h)
+
+
+def test_single_step_model_state_matches_single_row_forecast(initialized, numpy_model):
+    state, encoder, new, days = initialized
+    assert (state.lookback, state.n_states) == (1, 1)
+    updated = state.advance(new, encoder, numpy_model)
+    last = new[new['Date'] == days[-1]].drop_duplicates('Product ID', keep='last').set_index('Product ID')
+    expected = predict_batch(numpy_model, encoder.encode(last.reset_index()))
+    np.testing.assert_allclose(updated.loc[last.index].to_numpy(), expected, rtol=1e-5, atol=1e-3)
+
+
+def test_state_with_longer_context_than_the_model_is_refused(inventory, numpy_model):
+    state = LSTMStateStore(inventory['Product ID'].unique(), units=numpy_model.state_units, lookback=10)
+    with pytest.raises(ValueError, match='context'):
+        state.advance(inventory.tail(5), None, numpy_model)
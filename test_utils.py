@@ -0,0 +1,154 @@
+"""KNN defaults and the preprocessing artifact helpers in utils."""
+import os
+
+import numpy as np
+import pytest
+
+import utils
+from datasources import CsvSource
+from utils import KnnDefaultsIndex, get_knn_defaults
+
+
+def _choice(inventory):
+    row = inventory.iloc[0]
+    return {c: str(row[c]) for c in utils.CAT_COLUMNS}
+
+
+def test_knn_defaults_reuse_one_index_per_frame(inventory, monkeypatch):
+    built = []
+    original = KnnDefaultsIndex.__init__
+
+    def counting_init(self, *args, **kwargs):
+        built.append(1)
+        original(self, *args, **kwargs)
+
+    monkeypatch.setattr(KnnDefaultsIndex, '__init__', counting_init)
+    utils._KNN_INDEXES.clear()
+    choice = _choice(inventory)
+    first = get_knn_defaults(inventory, choice)
+    again = get_knn_defaults(inventory, {**choice, 'Seasonality': 'no-such-season'})
+    assert len(built) == 1
+    assert set(first) == set(utils.NUMERICAL_COLS)
+    assert first == KnnDefaultsIndex(inventory).lookup(choice)
+    # Unknown last key falls back to the remaining keys, not to the whole data set
+    assert again == KnnDefaultsIndex(inventory).lookup({c: v for c, v in choice.items() if c != 'Seasonality'})
+
+
+def test_knn_defaults_match_exact_group_neighbours(inventory):
+    choice = _choice(inventory)
+    mask = np.ones(len(inventory), dtype=bool)
+    for c, v in choice.items():
+        mask &= (inventory[c].astype(str) == v).to_numpy()
+    X = inventory.loc[mask, utils.NUMERICAL_COLS].to_numpy(dtype=np.float64)
+    nearest = np.argsort(((X - X[0]) ** 2).sum(axis=1), kind='stable')[:min(5, len(X))]
+    expected = X[nearest].mean(axis=0)
+    actual = get_knn_defaults(inventory, choice)
+    assert [actual[c] for c in utils.NUMERICAL_COLS] == pytest.approx(expected)
+
+
+def test_knn_defaults_from_source(inventory, inventory_csv):
+    source = CsvSource(inventory_csv)
+    choice = _choice(inventory)
+    assert get_knn_defaults(source, choice) == pytest.approx(get_knn_defaults(inventory, choice))
+    assert get_knn_defaults(source, {**choice, 'Product ID': 'NO-SUCH-PRODUCT'})
+
+
+def test_knn_defaults_log_bad_data(inventory, caplog):
+    broken = inventory.head(20).astype({'Price': object})
+    broken.loc[broken.index[0], 'Price'] = 'n/a'
+    assert get_knn_defaults(broken, _choice(inventory)) == {}
+    assert 'KNN defaults failed' in caplog.text
+    assert get_knn_defaults(inventory.iloc[:0], _choice(inventory)) == {}
+
+
+def _split_csv(csv_path, tmp_path, fraction=0.8):
+    lines = csv_path.read_text().splitlines(keepends=True)
+    cut = 1 + int((len(lines) - 1) * fraction)
+    head = tmp_path / 'inventory.csv'
+    head.write_text(''.join(lines[:cut]))
+    return head, lines[0], lines[cut:]
+
+
+def _read(path):
+    return utils._read_artifact(path)
+
+
+def test_appended_rows_update_artifact_like_a_full_compile(inventory_csv, tmp_path):
+    head, _, rest = _split_csv(inventory_csv, tmp_path)
+    utils.compile_preprocessing_artifact(head)
+    with open(head, 'a') as f:
+        f.write(''.join(rest))
+    result = utils.update_preprocessing_artifact(head)
+    assert result == {'rows_added': len(rest), 'new_levels': {}}
+
+    updated = _read(utils.preprocessing_artifact_path(head))
+    full = utils.compile_preprocessing_artifact(inventory_csv, tmp_path / 'full.preprocessing.json')
+    assert updated['feature_columns'] == full['feature_columns']
+    assert updated['category_options'] == full['category_options']
+    assert updated['source']['sha256'] == full['source']['sha256']
+    assert updated['source']['blocks'] == full['source']['blocks']
+    for key in ('mean', 'var', 'scale'):
+        np.testing.assert_allclose(updated['scaler'][key], full['scaler'][key], rtol=1e-9)
+    assert updated['scaler']['n_samples_seen'] == full['scaler']['n_samples_seen']
+    assert updated['raw_means'] == pytest.approx(full['raw_means'], rel=1e-9)
+    assert updated['scaled_means'] == pytest.approx(full['scaled_means'], abs=1e-9)
+    # The updated artifact is current: loading it does not recompile
+    assert utils._artifact_is_current(updated, head)
+
+
+def test_rewritten_csv_triggers_full_compile(inventory_csv, tmp_path):
+    head, header, rest = _split_csv(inventory_csv, tmp_path)
+    utils.compile_preprocessing_artifact(head)
+    head.write_text(header + ''.join(rest))
+    assert utils.update_preprocessing_artifact(head)['rows_added'] is None
+    assert utils._artifact_is_current(_read(utils.preprocessing_artifact_path(head)), head)
+
+
+def test_same_size_content_change_rebuilds_artifact(inventory_csv, tmp_path):
+    path = tmp_path / 'inventory.csv'
+    lines = inventory_csv.read_text().splitlines(keepends=True)
+    path.write_text(''.join(lines))
+    before = utils.load_preprocessing_artifact(path)
+    fields = lines[1].split(',')
+    level = fields[5]
+    fields[5] = level[:-1] + ('1' if level[-1] != '1' else '2')
+    lines[1] = ','.join(fields)
+    path.write_text(''.join(lines))
+    stat = path.stat()
+    assert stat.st_size == before['source']['size']
+    os.utime(path, ns=(stat.st_atime_ns, before['source']['mtime_ns'] + 1_000_000))
+
+    after = utils.load_preprocessing_artifact(path)
+    assert after['source']['sha256'] != before['source']['sha256']
+    assert after['raw_means']['Inventory Level'] != before['raw_means']['Inventory Level']
+    assert utils._artifact_is_current(_read(utils.preprocessing_artifact_path(path)), path)
+
+
+def test_unreadable_artifact_is_rebuilt_with_a_warning(inventory_csv, tmp_path, caplog):
+    path = tmp_path / 'inventory.csv'
+    path.write_bytes(inventory_csv.read_bytes())
+    utils.preprocessing_artifact_path(path).write_text('{not json')
+    with caplog.at_level('WARNING', logger='utils'):
+        feature_columns, *_ = utils.load_preprocessing(path)
+    assert 'unreadable, rebuilding' in caplog.text
+    assert feature_columns == _read(utils.preprocessing_artifact_path(path))['feature_columns']
+
+
+@pytest.mark.parametrize('policy', ['map_to_base', 'extend', 'error'])
+def test_new_category_levels_follow_policy(inventory_csv, tmp_path, policy):
+    head, _, rest = _split_csv(inventory_csv, tmp_path)
+    base = utils.compile_preprocessing_artifact(head)
+    store = rest[0].split(',')[1]
+    new_row = rest[0].replace(f',{store},', ',S999,', 1)
+    with open(head, 'a') as f:
+        f.write(new_row)
+    if policy == 'error':
+        with pytest.raises(ValueError, match='S999'):
+            utils.update_preprocessing_artifact(head, new_level_policy=policy)
+        return
+    result = utils.update_preprocessing_artifact(head, new_level_policy=policy)
+    assert result == {'rows_added': 1, 'new_levels': {'Store ID': ['S999']}}
+    updated = _read(utils.preprocessing_artifact_path(head))
+    assert 'S999' in updated['category_options']['Store ID']
+    added = set(updated['feature_columns']) - set(base['feature_columns'])
+    assert added == (set() if policy == 'map_to_base' else {'Store ID_S999'})
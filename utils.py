@@ -1,31 +1,67 @@
+import hashlib
+import io
+import json
+import logging
+import os
+import weakref
+from collections import OrderedDict
+from pathlib import Path
+
 import pandas as pd
 import numpy as np
-from sklearn.preprocessing import StandardScaler
-from sklearn.neighbors import NearestNeighbors
+
+from ingest import STREAM_SCHEMA, read_inventory_csv, iter_inventory_chunks
+from instrumentation import incr, observe, timed
+
+logger = logging.getLogger(__name__)
 
 # Columns used in the notebook
 NUMERICAL_COLS = ['Inventory Level', 'Units Sold', 'Units Ordered', 'Price', 'Discount', 'Competitor Pricing']
 CAT_COLUMNS = ['Store ID', 'Product ID', 'Category', 'Region', 'Weather Condition', 'Seasonality']
 
-def load_and_preprocess(csv_path='retail_store_inventory.csv'):
+# Default number of rows sent to the model per predict call
+DEFAULT_BATCH_SIZE = 1024
+
+
+def _dummy_feature_columns(columns, category_options, present_numerical):
+    """feature_columns in the order get_dummies(drop_first=True) + concat produce them."""
+    existing_cat_cols = [c for c in CAT_COLUMNS if c in columns]
+    feature_columns = [
+        c for c in columns
+        if c not in existing_cat_cols and c not in present_numerical and c not in ('Date', 'Demand Forecast')
+    ]
+    for c in existing_cat_cols:
+        feature_columns.extend(f"{c}_{v}" for v in category_options[c][1:])
+    feature_columns.extend(present_numerical)
+    return feature_columns
+
+
+@timed()
+def load_and_preprocess(csv_path='retail_store_inventory.csv', engine=None, compact=False):
     """Load CSV, one-hot encode categorical columns (drop_first=True), scale numerical cols.
+    The CSV is read with the typed schema from `ingest` (engine: None or 'pyarrow');
+    `csv_path` may also be an already loaded inventory frame (e.g. a data source's fetch).
+    With compact=True no dense one-hot frame is built: the first return value is a
+    `CompactFeatures` holding integer category codes and float32 scaled numerics, which
+    materializes dense feature batches on demand.
     Returns:
       df_reconstructed: DataFrame with scaled numerical cols and one-hot columns
+        (CompactFeatures when compact=True)
       feature_columns: list of columns used as model input (exclude Date and Demand Forecast)
       scaler: fitted StandardScaler for numerical columns
       raw_means: dict of means of numerical columns in original scale
       scaled_means: dict of means of scaled numerical columns (should be ~0)
       category_options: dict mapping categorical column -> list of unique values (for UI)
+      df: the raw DataFrame as read (categorical IDs, downcast numerics, parsed Date)
     """
-    df = pd.read_csv(csv_path)
-    # Ensure Date is datetime
-    if 'Date' in df.columns:
-        df['Date'] = pd.to_datetime(df['Date'])
+    from sklearn.preprocessing import StandardScaler
+
+    df = csv_path if isinstance(csv_path, pd.DataFrame) else read_inventory_csv(csv_path, engine=engine)
 
-    # Save raw means for defaults
+    # Save raw means for defaults (accumulate in float64; columns are stored downcast)
     raw_means = {}
     for col in NUMERICAL_COLS:
-        raw_means[col] = float(df[col].mean()) if col in df.columns else 0.0
+        raw_means[col] = float(df[col].to_numpy(dtype=np.float64).mean()) if col in df.columns else 0.0
 
     # Keep category options from raw df for UI
     category_options = {}
@@ -36,6 +72,20 @@ def load_and_preprocess(csv_path='retail_store_inventory.csv'):
         else:
             category_options[c] = []
 
+    if compact:
+        present_numerical = [c for c in NUMERICAL_COLS if c in df.columns]
+        feature_columns = _dummy_feature_columns(df.columns.tolist(), category_options, present_numerical)
+        scaler = StandardScaler()
+        scaled_means = {}
+        numeric = np.zeros((len(df), 0), dtype=np.float32)
+        if present_numerical:
+            scaled_values = scaler.fit_transform(df[present_numerical])
+            scaled_means = {c: float(scaled_values[:, i].mean()) for i, c in enumerate(present_numerical)}
+            numeric = scaled_values.astype(np.float32)
+            del scaled_values
+        features = CompactFeatures.from_frame(df, feature_columns, category_options, numeric)
+        return features, feature_columns, scaler, raw_means, scaled_means, category_options, df
+
     # One-hot encode
     existing_cat_cols = [c for c in CAT_COLUMNS if c in df.columns]
     if existing_cat_cols:
@@ -67,59 +117,166 @@ def load_and_preprocess(csv_path='retail_store_inventory.csv'):
     return df_reconstructed, feature_columns, scaler, raw_means, scaled_means, category_options, df
 
 
+class CompactFeatures:
+    """Integer-coded stand-in for the dense one-hot frame built by `load_and_preprocess`.
+
+    Each categorical column is kept as one small integer array of codes into
+    category_options (code 0 is the dropped base level), numerics as one float32 block of
+    scaled values, and other model inputs (Holiday/Promotion) in their narrow raw dtype.
+    That is a few bytes per categorical per row instead of one column per level; dense
+    float32 features are only built per batch with `dense` / `iter_batches`.
+    """
+
+    def __init__(self, feature_columns, codes, code_columns, numeric, numeric_index, passthrough,
+                 target=None, dates=None):
+        self.feature_columns = list(feature_columns)
+        self.num_features = len(self.feature_columns)
+        self.codes = codes                  # cat_col -> int array of codes (-1 = missing)
+        self.code_columns = code_columns    # cat_col -> code -> feature index (-1 = none), plus -1 for code -1
+        self.numeric = numeric              # (n, k) float32 scaled numerics, k may be 0
+        self.numeric_index = numeric_index  # feature index of each numeric column
+        self.passthrough = passthrough      # feature index -> raw array
+        self.target = target
+        self.dates = dates
+
+    @classmethod
+    def from_frame(cls, df, feature_columns, category_options, numeric):
+        column_index = {c: i for i, c in enumerate(feature_columns)}
+        codes, code_columns = {}, {}
+        for c in CAT_COLUMNS:
+            if c not in df.columns:
+                continue
+            options = category_options[c]
+            codes[c] = np.asarray(df[c].astype(pd.CategoricalDtype(options)).cat.codes)
+            code_columns[c] = np.array([column_index.get(f"{c}_{v}", -1) for v in options] + [-1], dtype=np.intp)
+        numeric_cols = [c for c in NUMERICAL_COLS if c in df.columns]
+        numeric_index = np.array([column_index[c] for c in numeric_cols], dtype=np.intp)
+        passthrough = {
+            column_index[c]: df[c].to_numpy()
+            for c in feature_columns
+            if c in df.columns and c not in numeric_cols
+        }
+        target = df['Demand Forecast'].to_numpy(dtype=np.float32) if 'Demand Forecast' in df.columns else None
+        dates = df['Date'].to_numpy() if 'Date' in df.columns else None
+        return cls(feature_columns, codes, code_columns, numeric, numeric_index, passthrough, target, dates)
+
+    def __len__(self):
+        return self.numeric.shape[0]
+
+    @property
+    def nbytes(self):
+        total = self.numeric.nbytes + sum(a.nbytes for a in self.codes.values())
+        return total + sum(a.nbytes for a in self.passthrough.values())
+
+    def dense(self, start=0, stop=None):
+        """Dense float32 feature rows [start, stop) in feature_columns order, shape (m, F)."""
+        stop = len(self) if stop is None else min(stop, len(self))
+        m = max(stop - start, 0)
+        X = np.zeros((m, self.num_features), dtype=np.float32)
+        rows = np.arange(m)
+        for c, codes in self.codes.items():
+            cols = self.code_columns[c][codes[start:stop]]
+            hit = cols >= 0
+            X[rows[hit], cols[hit]] = 1.0
+        if len(self.numeric_index):
+            X[:, self.numeric_index] = self.numeric[start:stop]
+        for idx, values in self.passthrough.items():
+            X[:, idx] = values[start:stop]
+        return X
+
+    def iter_batches(self, batch_size=DEFAULT_BATCH_SIZE):
+        """Yield (m, 1, F) float32 model inputs of at most `batch_size` rows."""
+        for start in range(0, len(self), batch_size):
+            X = self.dense(start, start + batch_size)
+            yield X.reshape(X.shape[0], 1, self.num_features)
+
+    def to_csr(self):
+        """All rows as a scipy.sparse CSR matrix (requires scipy)."""
+        try:
+            from scipy import sparse
+        except ImportError as e:
+            raise ImportError("CompactFeatures.to_csr requires scipy") from e
+        n = len(self)
+        rows, cols, data = [], [], []
+        for c, codes in self.codes.items():
+            feature = self.code_columns[c][codes]
+            hit = np.flatnonzero(feature >= 0)
+            rows.append(hit)
+            cols.append(feature[hit])
+            data.append(np.ones(len(hit), dtype=np.float32))
+        for j, idx in enumerate(self.numeric_index):
+            rows.append(np.arange(n))
+            cols.append(np.full(n, idx))
+            data.append(self.numeric[:, j])
+        for idx, values in self.passthrough.items():
+            nz = np.flatnonzero(values)
+            rows.append(nz)
+            cols.append(np.full(len(nz), idx))
+            data.append(values[nz].astype(np.float32))
+        return sparse.csr_matrix(
+            (np.concatenate(data), (np.concatenate(rows), np.concatenate(cols))),
+            shape=(n, self.num_features), dtype=np.float32,
+        )
+
+# KnnDefaultsIndex per raw frame (or per source version and fetched subset), most recent last
+_KNN_INDEXES = OrderedDict()
+_KNN_INDEX_LIMIT = 8
+
+
+def _knn_index(key, build, owner=None):
+    """Cached `KnnDefaultsIndex` for `key`, made by `build()` on first use."""
+    entry = _KNN_INDEXES.get(key)
+    # Frames are keyed by id(); the weak reference guards against a recycled id
+    if entry is None or (owner is not None and entry[0]() is not owner):
+        entry = (weakref.ref(owner) if owner is not None else None, build())
+        _KNN_INDEXES[key] = entry
+        while len(_KNN_INDEXES) > _KNN_INDEX_LIMIT:
+            _KNN_INDEXES.popitem(last=False)
+    _KNN_INDEXES.move_to_end(key)
+    return entry[1]
+
+
+def _fetch_knn_rows(source, products, stores):
+    rows = source.fetch(products=products, stores=stores)
+    return rows if not rows.empty else source.fetch()
+
+
+@timed()
 def get_knn_defaults(raw_df, categorical_inputs, n_neighbors=5):
     """Use KNN to find similar records in the raw data and return mean numerical values.
-    
+
+    Lookups go through a `KnnDefaultsIndex` cached per raw frame (per source version and
+    chosen Product ID / Store ID for a source), so the grouping is done once and repeated
+    choices are a dict hit; treat `raw_df` as read-only after the first call. Without an
+    exact match, the last chosen key in CAT_COLUMNS order is dropped until one matches.
+
     Args:
-      raw_df: raw dataframe with Date, Store ID, Product ID, etc.
+      raw_df: raw dataframe with Date, Store ID, Product ID, etc., or a
+        `datasources.DataSource`; a source is asked only for the rows of the chosen
+        Product ID / Store ID (and everything only if nothing matches)
       categorical_inputs: dict of {cat_col: chosen_value}
       n_neighbors: number of neighbors to average
-      
+
     Returns:
-      dict of numerical col -> mean value from similar records
+      dict of numerical col -> mean value from similar records ({} when there is no data)
     """
-    if raw_df is None or raw_df.empty:
+    if raw_df is None:
         return {}
-    
     try:
-        # Filter by exact categorical matches
-        filtered_df = raw_df.copy()
-        for cat_col, chosen in categorical_inputs.items():
-            if chosen is not None and cat_col in filtered_df.columns:
-                filtered_df = filtered_df[filtered_df[cat_col] == chosen]
-        
-        if filtered_df.empty:
-            # Fallback: if no exact match, use all data
-            filtered_df = raw_df.copy()
-        
-        # Build KNN on numerical columns
-        present_numerical = [c for c in NUMERICAL_COLS if c in filtered_df.columns]
-        if not present_numerical:
-            return {}
-        
-        X = filtered_df[present_numerical].values
-        if X.shape[0] == 0:
-            return {}
-        
-        n_neighbors = min(n_neighbors, X.shape[0])
-        knn = NearestNeighbors(n_neighbors=n_neighbors)
-        knn.fit(X)
-        
-        # Get the first neighbor (if X has 1 row, it will be itself)
-        _, indices = knn.kneighbors(X[0:1])
-        neighbors = filtered_df.iloc[indices[0]]
-        
-        # Return mean of neighbors
-        knn_defaults = {}
-        for col in present_numerical:
-            knn_defaults[col] = float(neighbors[col].mean())
-        
-        return knn_defaults
-    except Exception as e:
-        print(f"KNN error: {e}")
+        if hasattr(raw_df, 'fetch'):
+            products, stores = categorical_inputs.get('Product ID'), categorical_inputs.get('Store ID')
+            key = ('source', id(raw_df), raw_df.version(), str(products), str(stores), n_neighbors)
+            index = _knn_index(key, lambda: KnnDefaultsIndex(_fetch_knn_rows(raw_df, products, stores), n_neighbors))
+        else:
+            index = _knn_index(('frame', id(raw_df), n_neighbors), lambda: KnnDefaultsIndex(raw_df, n_neighbors),
+                               owner=raw_df)
+        return index.lookup(categorical_inputs)
+    except (TypeError, ValueError):
+        logger.exception('KNN defaults failed for %s', categorical_inputs)
         return {}
 
 
+@timed()
 def build_input_row(feature_columns, category_options, scaler, raw_numeric_inputs, categorical_inputs, holiday):
     """Construct a single-row input (scaled) matching `feature_columns` order.
 
@@ -157,3 +314,467 @@ def build_input_row(feature_columns, category_options, scaler, raw_numeric_input
     arr = np.array([input_data[c] for c in feature_columns], dtype=np.float32)
     arr = arr.reshape(1, 1, -1)
     return arr
+
+
+class BatchEncoder:
+    """Vectorized counterpart of `build_input_row` for whole DataFrames of raw inputs.
+
+    The column-index maps are computed once from `feature_columns`, so encoding N rows is
+    one scaler pass plus a handful of array assignments instead of N dict builds.
+    """
+
+    def __init__(self, feature_columns, scaler):
+        self.feature_columns = list(feature_columns)
+        self.num_features = len(self.feature_columns)
+        self.scaler = scaler
+        self.column_index = {c: i for i, c in enumerate(self.feature_columns)}
+
+        # Numeric columns in the order the scaler expects (NUMERICAL_COLS filtered to present)
+        self.numeric_order = [c for c in NUMERICAL_COLS if c in self.column_index]
+        self.numeric_index = np.array([self.column_index[c] for c in self.numeric_order], dtype=np.intp)
+
+        self.holiday_index = self.column_index.get('Holiday/Promotion')
+
+        # cat_col -> {value: one-hot column index}. The dropped/base category has no column,
+        # so values missing from the map (base or unseen) leave the row at zeros.
+        self.category_index = {}
+        for cat_col in CAT_COLUMNS:
+            prefix = f"{cat_col}_"
+            self.category_index[cat_col] = {
+                c[len(prefix):]: i for c, i in self.column_index.items() if c.startswith(prefix)
+            }
+
+    @timed()
+    def encode(self, df, holiday=None):
+        """Encode raw rows into a float32 tensor shaped (N, 1, num_features).
+
+        - df: DataFrame with raw NUMERICAL_COLS, CAT_COLUMNS and optionally 'Holiday/Promotion'.
+          Missing numeric columns are treated as 0.0, missing categoricals as the base category.
+        - holiday: optional bool/int overriding the 'Holiday/Promotion' column for every row
+        """
+        n = len(df)
+        X = np.zeros((n, self.num_features), dtype=np.float32)
+        if n == 0:
+            return X.reshape(0, 1, self.num_features)
+
+        rows = np.arange(n)
+        for cat_col, mapping in self.category_index.items():
+            if not mapping or cat_col not in df.columns:
+                continue
+            col = df[cat_col]
+            if isinstance(col.dtype, pd.CategoricalDtype):
+                # Map each category once, then gather by code (code -1 is a missing value)
+                per_category = col.cat.categories.astype(str).map(mapping).to_numpy(dtype=np.float64, na_value=np.nan)
+                idx = np.append(per_category, np.nan)[col.cat.codes.to_numpy()]
+            else:
+                idx = col.astype(str).map(mapping).to_numpy(dtype=np.float64, na_value=np.nan)
+            hit = ~np.isnan(idx)
+            X[rows[hit], idx[hit].astype(np.intp)] = 1.0
+
+        if self.holiday_index is not None:
+            if holiday is not None:
+                X[:, self.holiday_index] = 1.0 if holiday else 0.0
+            elif 'Holiday/Promotion' in df.columns:
+                X[:, self.holiday_index] = df['Holiday/Promotion'].to_numpy(dtype=np.float32) != 0
+
+        if self.numeric_order:
+            raw = df.reindex(columns=self.numeric_order, fill_value=0.0).astype(np.float64)
+            X[:, self.numeric_index] = self.scaler.transform(raw)
+
+        return X.reshape(n, 1, self.num_features)
+
+
+@timed()
+def predict_batch(model, X, batch_size=DEFAULT_BATCH_SIZE):
+    """Run `model` over X in chunks of `batch_size` rows.
+
+    Uses `predict_on_batch` per chunk, which skips the dataset/callback setup `model.predict`
+    pays on every call. Returns a flat float32 array with one prediction per row of X.
+    """
+    n = X.shape[0]
+    out = np.empty(n, dtype=np.float32)
+    for start in range(0, n, batch_size):
+        chunk = X[start:start + batch_size]
+        out[start:start + len(chunk)] = np.asarray(model.predict_on_batch(chunk)).reshape(-1)
+        incr('predict_calls_total')
+        observe('predict_batch_rows', len(chunk))
+    return out
+
+
+def stream_preprocessing_stats(csv_path='retail_store_inventory.csv', chunksize=500_000):
+    """Compute what `load_and_preprocess` derives from the data, one chunk at a time.
+
+    Means, category options and scaler statistics are accumulated incrementally (the scaler
+    via `partial_fit`), so memory is bounded by `chunksize` and files larger than RAM work.
+    Returns:
+      feature_columns, scaler, raw_means, scaled_means, category_options
+      (same values and column order as `load_and_preprocess`)
+    """
+    from sklearn.preprocessing import StandardScaler
+
+    columns = None
+    row_count = 0
+    sums = {col: 0.0 for col in NUMERICAL_COLS}
+    levels = {c: set() for c in CAT_COLUMNS}
+    scaler = StandardScaler()
+    present_numerical = []
+
+    for chunk in iter_inventory_chunks(csv_path, chunksize=chunksize):
+        if columns is None:
+            columns = chunk.columns.tolist()
+            present_numerical = [c for c in NUMERICAL_COLS if c in columns]
+        row_count += len(chunk)
+        for col in present_numerical:
+            sums[col] += float(chunk[col].sum())
+        for c in CAT_COLUMNS:
+            if c in columns:
+                levels[c].update(chunk[c].astype(str).unique().tolist())
+        if present_numerical:
+            scaler.partial_fit(chunk[present_numerical])
+
+    columns = columns or []
+    raw_means = {col: (sums[col] / row_count if col in columns and row_count else 0.0) for col in NUMERICAL_COLS}
+    category_options = {c: sorted(levels[c]) for c in CAT_COLUMNS}
+    feature_columns = _dummy_feature_columns(columns, category_options, present_numerical)
+
+    scaled_means = {}
+    for i, c in enumerate(present_numerical):
+        scaled_means[c] = float((raw_means[c] - scaler.mean_[i]) / scaler.scale_[i])
+
+    return feature_columns, scaler, raw_means, scaled_means, category_options
+
+# Bump when the artifact layout changes so stale files are rebuilt instead of misread
+ARTIFACT_VERSION = 2
+
+# The source CSV is fingerprinted per block so appends only rehash the tail
+DIGEST_BLOCK_SIZE = 4 << 20
+
+# How update_preprocessing_artifact treats categorical levels first seen in appended rows
+NEW_LEVEL_POLICIES = ('map_to_base', 'extend', 'error')
+
+
+def preprocessing_artifact_path(csv_path):
+    """Default artifact location: next to the CSV, e.g. data.csv -> data.preprocessing.json"""
+    return Path(csv_path).with_suffix('.preprocessing.json')
+
+
+def file_block_digests(path, start_block=0, block_size=DIGEST_BLOCK_SIZE):
+    """sha256 hex digests of consecutive `block_size` blocks of a file, from `start_block` on."""
+    digests = []
+    with open(path, 'rb') as f:
+        f.seek(start_block * block_size)
+        for block in iter(lambda: f.read(block_size), b''):
+            digests.append(hashlib.sha256(block).hexdigest())
+    return digests
+
+
+def combine_digests(block_digests):
+    """Whole-file fingerprint from its block digests."""
+    return hashlib.sha256(''.join(block_digests).encode()).hexdigest()
+
+
+def _source_stat(csv_path):
+    st = os.stat(csv_path)
+    return {'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+
+
+def _scaler_params(scaler):
+    return {
+        'columns': [str(c) for c in getattr(scaler, 'feature_names_in_', [])],
+        'mean': scaler.mean_.tolist() if hasattr(scaler, 'mean_') else [],
+        'scale': scaler.scale_.tolist() if hasattr(scaler, 'scale_') else [],
+        'var': scaler.var_.tolist() if hasattr(scaler, 'var_') else [],
+        'n_samples_seen': int(np.max(getattr(scaler, 'n_samples_seen_', 0))),
+    }
+
+
+def _write_artifact(artifact, artifact_path):
+    tmp_path = artifact_path.with_suffix(artifact_path.suffix + '.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(artifact, f)
+    os.replace(tmp_path, artifact_path)
+
+
+def _read_artifact(artifact_path):
+    if not artifact_path.exists():
+        return None
+    try:
+        with open(artifact_path) as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning("Preprocessing artifact %s unreadable, rebuilding: %s", artifact_path, e)
+        return None
+
+
+@timed()
+def compile_preprocessing_artifact(csv_path='retail_store_inventory.csv', artifact_path=None, chunksize=None):
+    """Run `load_and_preprocess` once and persist what inference needs as a small JSON file.
+
+    With `chunksize`, statistics come from `stream_preprocessing_stats` instead, so the CSV
+    never has to fit in memory.
+
+    The artifact stores feature_columns, the scaler parameters, raw_means, scaled_means and
+    category_options together with the size, mtime and block digests of the source CSV.
+    Returns the artifact dict.
+    """
+    artifact_path = Path(artifact_path) if artifact_path else preprocessing_artifact_path(csv_path)
+    if chunksize:
+        feature_columns, scaler, raw_means, scaled_means, category_options = stream_preprocessing_stats(
+            csv_path, chunksize)
+    else:
+        _, feature_columns, scaler, raw_means, scaled_means, category_options, _ = load_and_preprocess(csv_path)
+
+    source = _source_stat(csv_path)
+    source['blocks'] = file_block_digests(csv_path)
+    source['sha256'] = combine_digests(source['blocks'])
+
+    artifact = {
+        'version': ARTIFACT_VERSION,
+        'source': source,
+        'columns': pd.read_csv(csv_path, nrows=0).columns.tolist(),
+        'feature_columns': feature_columns,
+        'scaler': _scaler_params(scaler),
+        'raw_means': raw_means,
+        'scaled_means': scaled_means,
+        'category_options': category_options,
+    }
+    _write_artifact(artifact, artifact_path)
+    return artifact
+
+
+def scaler_from_artifact(params):
+    """Rebuild a fitted StandardScaler from the 'scaler' section of an artifact."""
+    from sklearn.preprocessing import StandardScaler
+
+    scaler = StandardScaler()
+    if not params['mean']:
+        return scaler
+    scaler.mean_ = np.asarray(params['mean'], dtype=np.float64)
+    scaler.scale_ = np.asarray(params['scale'], dtype=np.float64)
+    scaler.var_ = np.asarray(params['var'], dtype=np.float64)
+    scaler.n_samples_seen_ = np.int64(params['n_samples_seen'])
+    scaler.n_features_in_ = len(params['mean'])
+    if params['columns']:
+        scaler.feature_names_in_ = np.asarray(params['columns'], dtype=object)
+    return scaler
+
+
+def _artifact_is_current(artifact, csv_path):
+    if artifact.get('version') != ARTIFACT_VERSION:
+        return False
+    recorded = artifact.get('source', {})
+    current = _source_stat(csv_path)
+    if recorded.get('size') != current['size']:
+        return False
+    if recorded.get('mtime_ns') == current['mtime_ns']:
+        return True
+    # Touched but possibly unchanged (copy, checkout): fall back to the content hash
+    return recorded.get('sha256') == combine_digests(file_block_digests(csv_path))
+
+
+def load_preprocessing_artifact(csv_path='retail_store_inventory.csv', artifact_path=None):
+    """The preprocessing artifact of `csv_path` as a dict, current with the CSV.
+
+    The artifact is (re)compiled automatically when it is missing, was written by another
+    ARTIFACT_VERSION, or the CSV changed since it was built. Its 'source' section holds
+    the CSV's size, mtime and content hash ('sha256').
+    """
+    artifact_path = Path(artifact_path) if artifact_path else preprocessing_artifact_path(csv_path)
+    artifact = _read_artifact(artifact_path)
+    if artifact is None or not _artifact_is_current(artifact, csv_path):
+        artifact = compile_preprocessing_artifact(csv_path, artifact_path)
+    elif artifact['source'].get('mtime_ns') != _source_stat(csv_path)['mtime_ns']:
+        # Content verified by hash; record the new mtime so the next start skips hashing
+        artifact['source'].update(_source_stat(csv_path))
+        _write_artifact(artifact, artifact_path)
+    return artifact
+
+
+@timed()
+def load_preprocessing(csv_path='retail_store_inventory.csv', artifact_path=None):
+    """Fast path for inference processes: read the preprocessing artifact instead of the CSV.
+
+    See `load_preprocessing_artifact` for when the artifact is rebuilt.
+    Returns:
+      feature_columns, scaler, raw_means, scaled_means, category_options
+      (same meaning as in `load_and_preprocess`)
+    """
+    artifact = load_preprocessing_artifact(csv_path, artifact_path)
+
+    return (
+        artifact['feature_columns'],
+        scaler_from_artifact(artifact['scaler']),
+        artifact['raw_means'],
+        artifact['scaled_means'],
+        artifact['category_options'],
+    )
+
+
+def _appended_bytes(csv_path, source):
+    """Bytes appended to the CSV since `source` was recorded, or None if it was rewritten."""
+    old_size = source['size']
+    current = _source_stat(csv_path)
+    if current['size'] < old_size or not source.get('blocks'):
+        return None
+    last_block = len(source['blocks']) - 1
+    with open(csv_path, 'rb') as f:
+        # The last recorded (possibly partial) block must be unchanged and end a line
+        f.seek(last_block * DIGEST_BLOCK_SIZE)
+        tail = f.read(old_size - last_block * DIGEST_BLOCK_SIZE)
+        if hashlib.sha256(tail).hexdigest() != source['blocks'][-1] or not tail.endswith(b'\n'):
+            return None
+        return f.read()
+
+
+@timed()
+def update_preprocessing_artifact(csv_path='retail_store_inventory.csv', artifact_path=None,
+                                  new_level_policy='map_to_base'):
+    """Fold rows appended to the CSV since the last build into the stored artifact.
+
+    Only the appended bytes are parsed: scaler statistics are updated with `partial_fit`,
+    raw/scaled means are re-weighted and the fingerprint is extended from the last block,
+    so the cost tracks the size of the delta. Categorical levels not seen before are
+    handled per `new_level_policy`:
+      'map_to_base' - add to category_options only; encoders treat them as the dropped
+                      base level, so the model input width is unchanged (default)
+      'extend'      - also add a one-hot column to feature_columns (the model must be
+                      retrained for the new input width); the dropped base level is kept
+                      even if a new level sorts before it
+      'error'       - raise ValueError
+    Falls back to a full compile when there is no usable artifact or the CSV was rewritten
+    rather than appended to. Returns dict with 'rows_added' (None after a full compile)
+    and 'new_levels' (categorical col -> list of new values).
+    """
+    if new_level_policy not in NEW_LEVEL_POLICIES:
+        raise ValueError(f"new_level_policy must be one of {NEW_LEVEL_POLICIES}, got {new_level_policy!r}")
+    artifact_path = Path(artifact_path) if artifact_path else preprocessing_artifact_path(csv_path)
+    artifact = _read_artifact(artifact_path)
+    delta_bytes = None
+    if artifact is not None and artifact.get('version') == ARTIFACT_VERSION:
+        delta_bytes = _appended_bytes(csv_path, artifact['source'])
+    if delta_bytes is None:
+        compile_preprocessing_artifact(csv_path, artifact_path)
+        return {'rows_added': None, 'new_levels': {}}
+
+    new_levels = {}
+    rows_added = 0
+    if delta_bytes.strip():
+        columns = artifact['columns']
+        delta = pd.read_csv(
+            io.BytesIO(delta_bytes), header=None, names=columns,
+            dtype={c: t for c, t in STREAM_SCHEMA.items() if c in columns},
+        )
+        rows_added = len(delta)
+
+        for c in CAT_COLUMNS:
+            if c not in delta.columns:
+                continue
+            known = set(artifact['category_options'][c])
+            unseen = sorted(set(delta[c].astype(str).unique().tolist()) - known)
+            if unseen:
+                new_levels[c] = unseen
+        if new_levels and new_level_policy == 'error':
+            raise ValueError(f"Unseen categorical levels in appended rows: {new_levels}")
+
+        scaler = scaler_from_artifact(artifact['scaler'])
+        present_numerical = [c for c in NUMERICAL_COLS if c in delta.columns]
+        if present_numerical:
+            n_old = artifact['scaler']['n_samples_seen']
+            for col in present_numerical:
+                old_sum = artifact['raw_means'][col] * n_old
+                artifact['raw_means'][col] = float((old_sum + delta[col].sum()) / (n_old + rows_added))
+            scaler.partial_fit(delta[present_numerical])
+            artifact['scaler'] = _scaler_params(scaler)
+            for i, col in enumerate(present_numerical):
+                artifact['scaled_means'][col] = float(
+                    (artifact['raw_means'][col] - scaler.mean_[i]) / scaler.scale_[i])
+
+        feature_columns = artifact['feature_columns']
+        for c, values in new_levels.items():
+            artifact['category_options'][c] = sorted(artifact['category_options'][c] + values)
+            if new_level_policy == 'extend':
+                # Keep each categorical's one-hot block contiguous and sorted
+                prefix = f"{c}_"
+                block = [i for i, f in enumerate(feature_columns) if f.startswith(prefix)]
+                start = block[0] if block else len(feature_columns) - len(present_numerical)
+                stop = block[-1] + 1 if block else start
+                feature_columns[start:stop] = sorted(feature_columns[start:stop] + [prefix + v for v in values])
+
+    source = artifact['source']
+    last_block = len(source['blocks']) - 1
+    source['blocks'] = source['blocks'][:last_block] + file_block_digests(csv_path, start_block=last_block)
+    source['sha256'] = combine_digests(source['blocks'])
+    source.update(_source_stat(csv_path))
+    _write_artifact(artifact, artifact_path)
+    return {'rows_added': rows_added, 'new_levels': new_levels}
+
+
+class KnnDefaultsIndex:
+    """Pre-grouped KNN defaults for repeated lookups on the same raw_df (behind `get_knn_defaults`).
+
+    Row positions are grouped once per categorical key (CAT_COLUMNS order) and the neighbour
+    mean of every group is computed on first use and memoized, so repeated lookups are a dict
+    hit. When the exact combination has no rows, the last key in CAT_COLUMNS order is dropped
+    and the lookup retried (e.g. without Seasonality, then without Weather Condition, ...),
+    so the whole dataset is only used when not even the first key matches.
+    """
+
+    def __init__(self, raw_df, n_neighbors=5):
+        self.n_neighbors = n_neighbors
+        self.numerical_cols = [c for c in NUMERICAL_COLS if c in raw_df.columns]
+        self.cat_cols = [c for c in CAT_COLUMNS if c in raw_df.columns]
+        self.X = raw_df[self.numerical_cols].to_numpy(dtype=np.float64)
+        self._keys = {c: raw_df[c].astype(str) for c in self.cat_cols}
+        self._groups = {}
+        self._results = {}
+        # Build the hierarchy used for fallbacks up front; other key subsets are grouped lazily
+        for level in range(len(self.cat_cols) + 1):
+            self._group_positions(tuple(self.cat_cols[:level]))
+
+    def _group_positions(self, cols):
+        """Map of key tuple -> positional row indices for the grouping `cols`."""
+        groups = self._groups.get(cols)
+        if groups is None:
+            if cols:
+                frame = pd.DataFrame({c: self._keys[c] for c in cols})
+                groups = {
+                    (k if isinstance(k, tuple) else (k,)): v
+                    for k, v in frame.groupby(list(cols), sort=False).indices.items()
+                }
+            else:
+                groups = {(): np.arange(self.X.shape[0])}
+            self._groups[cols] = groups
+        return groups
+
+    def _neighbor_means(self, positions, n_neighbors):
+        # Same query as get_knn_defaults: neighbours of the group's first row within the group
+        X = self.X[positions]
+        k = min(n_neighbors, X.shape[0])
+        dist = ((X - X[0]) ** 2).sum(axis=1)
+        nearest = np.argsort(dist, kind='stable')[:k]
+        return X[nearest].mean(axis=0)
+
+    @timed()
+    def lookup(self, categorical_inputs, n_neighbors=None):
+        """Return dict of numerical col -> neighbour mean, like `get_knn_defaults`."""
+        if not self.numerical_cols or self.X.shape[0] == 0:
+            return {}
+        n_neighbors = n_neighbors or self.n_neighbors
+        chosen = {
+            c: str(categorical_inputs[c]) for c in self.cat_cols
+            if categorical_inputs.get(c) is not None
+        }
+        cols = tuple(chosen)
+        while True:
+            key = tuple(chosen[c] for c in cols)
+            memo_key = (cols, key, n_neighbors)
+            means = self._results.get(memo_key)
+            if means is not None:
+                break
+            positions = self._group_positions(cols).get(key)
+            if positions is not None:
+                means = self._neighbor_means(positions, n_neighbors)
+                self._results[memo_key] = means
+                break
+            cols = cols[:-1]
+        return {c: float(v) for c, v in zip(self.numerical_cols, means)}